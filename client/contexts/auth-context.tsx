@@ -4,8 +4,8 @@ import React, { createContext, useContext, useState, useEffect } from "react";
 import {
   login as apiLogin,
   register as apiRegister,
+  logout as apiLogout,
   getCurrentUser,
-  clearAuthToken,
   type User,
 } from "@/lib/api";
 
@@ -62,7 +62,7 @@ export function AuthProvider({ children }: { children: React.ReactNode }) {
   };
 
   const logout = () => {
-    clearAuthToken();
+    void apiLogout();
     setUser(null);
   };
 
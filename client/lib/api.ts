@@ -49,8 +49,13 @@ export interface User {
 export interface LoginResponse {
   access_token: string;
   token_type: string;
+  refresh_token: string;
+  expires_in: number;
 }
 
+// Refresh the access token this long before it expires
+const REFRESH_MARGIN_MS = 30_000;
+
 /**
  * Get authentication token from localStorage
  */
@@ -62,21 +67,115 @@ function getAuthToken(): string | null {
 }
 
 /**
- * Set authentication token in localStorage
+ * Set authentication tokens in localStorage
  */
-export function setAuthToken(token: string): void {
+export function setAuthToken(token: string, refreshToken?: string, expiresIn?: number): void {
   if (typeof window !== "undefined") {
     localStorage.setItem("auth_token", token);
+    if (refreshToken) {
+      localStorage.setItem("refresh_token", refreshToken);
+    }
+    if (expiresIn) {
+      localStorage.setItem("auth_token_expires_at", String(Date.now() + expiresIn * 1000));
+    }
   }
 }
 
 /**
- * Remove authentication token from localStorage
+ * Remove authentication tokens from localStorage
  */
 export function clearAuthToken(): void {
   if (typeof window !== "undefined") {
     localStorage.removeItem("auth_token");
+    localStorage.removeItem("refresh_token");
+    localStorage.removeItem("auth_token_expires_at");
+  }
+}
+
+let refreshInFlight: Promise<string | null> | null = null;
+
+/**
+ * Run fn while holding a lock shared by every tab of this origin
+ *
+ * Falls back to running fn directly where the Web Locks API is missing.
+ */
+function withRefreshLock(fn: () => Promise<string | null>): Promise<string | null> {
+  if (typeof navigator !== "undefined" && navigator.locks) {
+    return navigator.locks.request("auth-refresh", fn);
+  }
+  return fn();
+}
+
+/**
+ * Exchange the stored refresh token for a new token pair
+ *
+ * Refresh tokens are single use and reusing one revokes the whole session,
+ * so concurrent callers in a tab share one request and tabs take turns
+ * through a cross-tab lock. A tab that finds the stored refresh token
+ * changed while it waited uses the pair another tab just obtained.
+ * Returns the new access token, or null (and logs out) if refreshing fails.
+ */
+function refreshAccessToken(): Promise<string | null> {
+  if (!refreshInFlight) {
+    const seen = typeof window !== "undefined" ? localStorage.getItem("refresh_token") : null;
+    refreshInFlight = withRefreshLock(async () => {
+      const refreshToken = typeof window !== "undefined" ? localStorage.getItem("refresh_token") : null;
+      if (!refreshToken) {
+        return null;
+      }
+      if (refreshToken !== seen) {
+        return getAuthToken();
+      }
+      const response = await fetch(`${API_BASE_URL}/api/auth/refresh`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch(() => null);
+      if (!response || !response.ok) {
+        clearAuthToken();
+        return null;
+      }
+      const tokens: LoginResponse = await response.json();
+      setAuthToken(tokens.access_token, tokens.refresh_token, tokens.expires_in);
+      return tokens.access_token;
+    }).finally(() => {
+      refreshInFlight = null;
+    });
   }
+  return refreshInFlight;
+}
+
+/**
+ * Get an access token that is not about to expire, refreshing it if needed
+ */
+async function getFreshAuthToken(): Promise<string | null> {
+  const token = getAuthToken();
+  const expiresAt = typeof window !== "undefined" ? Number(localStorage.getItem("auth_token_expires_at")) : 0;
+  if (token && expiresAt && Date.now() > expiresAt - REFRESH_MARGIN_MS) {
+    return (await refreshAccessToken()) ?? token;
+  }
+  return token;
+}
+
+/**
+ * fetch with the Bearer token; on 401 the token is refreshed and the request retried once
+ */
+async function authorizedFetch(url: string, options: RequestInit = {}): Promise<Response> {
+  const send = (token: string | null) => {
+    const headers: Record<string, string> = { ...(options.headers as Record<string, string>) };
+    if (token) {
+      headers["Authorization"] = `Bearer ${token}`;
+    }
+    return fetch(url, { ...options, headers });
+  };
+
+  const token = await getFreshAuthToken();
+  const response = await send(token);
+  if (response.status !== 401 || !token) {
+    return response;
+  }
+  const refreshed = await refreshAccessToken();
+  return refreshed ? send(refreshed) : response;
 }
 
 /**
@@ -86,22 +185,17 @@ async function apiRequest<T>(
   endpoint: string,
   options: RequestInit = {}
 ): Promise<T> {
-  const token = getAuthToken();
   const headers: Record<string, string> = {
     ...(options.headers as Record<string, string>),
   };
 
-  // Add auth token if available
-  if (token) {
-    headers["Authorization"] = `Bearer ${token}`;
-  }
-
   // Don't set Content-Type for FormData (browser will set it with boundary)
   if (!(options.body instanceof FormData)) {
     headers["Content-Type"] = "application/json";
   }
 
-  const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+  // Adds the auth token if available, refreshing it when it expires
+  const response = await authorizedFetch(`${API_BASE_URL}${endpoint}`, {
     ...options,
     headers,
   });
@@ -136,10 +230,31 @@ export async function login(
     method: "POST",
     body: JSON.stringify({ username, password }),
   });
-  setAuthToken(response.access_token);
+  setAuthToken(response.access_token, response.refresh_token, response.expires_in);
   return response;
 }
 
+/**
+ * Forget the session's tokens and revoke them on the server
+ */
+export async function logout(): Promise<void> {
+  const token = getAuthToken();
+  const refreshToken = typeof window !== "undefined" ? localStorage.getItem("refresh_token") : null;
+  clearAuthToken();
+  if (!token) {
+    return;
+  }
+  // Best effort: the tokens are already gone locally
+  await fetch(`${API_BASE_URL}/api/auth/logout`, {
+    method: "POST",
+    headers: {
+      Authorization: `Bearer ${token}`,
+      "Content-Type": "application/json",
+    },
+    body: refreshToken ? JSON.stringify({ refresh_token: refreshToken }) : undefined,
+  }).catch(() => undefined);
+}
+
 export async function getCurrentUser(): Promise<User> {
   return apiRequest<User>("/api/auth/me");
 }
@@ -245,12 +360,7 @@ export async function downloadSignedDocument(
   signedDocId: number,
   filename: string
 ): Promise<void> {
-  const token = getAuthToken();
-  const response = await fetch(`${API_BASE_URL}/api/signed/${signedDocId}/download`, {
-    headers: {
-      Authorization: `Bearer ${token}`,
-    },
-  });
+  const response = await authorizedFetch(`${API_BASE_URL}/api/signed/${signedDocId}/download`);
 
   if (!response.ok) {
     throw new Error("Failed to download signed document");
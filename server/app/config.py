@@ -3,6 +3,7 @@ Configuration Settings
 """
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     """Application settings"""
@@ -19,12 +20,74 @@ class Settings(BaseSettings):
     # Security settings
     secret_key: str = "hackathon-secret-key-change-in-production"
     algorithm: str = "HS256"
-    access_token_expire_minutes: int = 60 * 24  # 24 hours
+    access_token_expire_minutes: int = 15  # Short-lived; clients renew with a refresh token
+    refresh_token_expire_days: int = 30
+    api_key_usage_flush_seconds: float = 10.0  # How often per-key usage counters are written
+    max_bulk_register_users: int = 1000
+    bulk_register_usernames: list = []  # Accounts allowed to provision users in bulk; empty disables it
+    password_hash_workers: int = 0  # Processes hashing bulk registrations; 0 = one per CPU
+    
+    # Rate limiting settings
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # "memory" (per worker) or "sqlite" (shared by workers on one host)
+    rate_limit_sqlite_path: str = ""  # Defaults to <data_dir>/rate_limits.db
+    rate_limit_ip_per_minute: int = 600  # All /api requests from one client IP
+    rate_limit_ip_burst: int = 100
+    rate_limit_auth_per_minute: int = 20  # Login/register/refresh attempts per client IP
+    rate_limit_login_per_username_per_minute: int = 10
+    rate_limit_trust_forwarded_for: bool = False  # Only behind a proxy that sets X-Forwarded-For
+    
+    # Change feed settings
+    change_feed_max_wait_seconds: float = 30.0  # Longest long-poll a client may request
+    change_feed_settle_seconds: Optional[float] = None  # Hold back entries this recent; defaults to 0 on SQLite, 5s elsewhere
+    
+    # Progress event settings
+    events_max_buffer: int = 256  # Events queued per stream before a slow client is evicted
+    events_heartbeat_seconds: float = 15.0  # Comment sent on idle streams to keep proxies from closing them
+    events_max_streams_per_user: int = 5
+    
+    # Load shedding settings
+    load_shed_enabled: bool = True
+    load_shed_max_lag_ms: float = 200.0  # Smoothed event-loop lag above which heavy requests are shed
+    load_shed_max_queue_depth: int = 32  # Heavy requests plus renders in flight or waiting for memory
+    load_shed_defer_seconds: float = 0.5  # How long a heavy request waits for load to clear before 503
+    token_denylist_bloom: bool = True  # Bloom filter in front of the revoked token set
+    token_denylist_sync_seconds: float = 1.0  # How quickly other workers see a logout
     
     # File upload settings
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
     allowed_document_types: list = [".pdf", ".png", ".jpg", ".jpeg"]
-    upload_dir: str = "uploads"
+    upload_dir: str = "uploads"  # Served publicly under /uploads
+    data_dir: str = "data"  # Internal state (rate limits, revoked tokens, Merkle log, render cache); never served
+    
+    # Typed signature settings
+    fonts_dir: str = "fonts"  # Extra .ttf/.otf fonts offered for typed signatures
+    typed_signature_font_size: int = 64  # Pixels at 72 DPI; scaled up for denser pages when stamping
+    
+    # Bulk upload settings
+    max_bulk_upload_files: int = 500
+    bulk_upload_concurrency: int = 8
+    max_archive_extracted_size: int = 200 * 1024 * 1024  # 200MB decompressed across one ZIP upload
+    
+    # Signed document rendering settings
+    lazy_signed_rendering: bool = False  # Store placement recipes and render on first download
+    render_cache_max_bytes: int = 512 * 1024 * 1024  # 512MB
+    batch_stamp_workers: int = 4  # Threads pipelining decode/blend/encode in batch stamping
+    max_batch_stamp_documents: int = 1000
+    
+    # Audit log batching
+    audit_batch_size: int = 500
+    audit_flush_interval_seconds: float = 2.0
+    audit_max_queue: int = 100000  # Oldest events are dropped beyond this if the database is unavailable
+    
+    # Merkle log anchoring of signed document hashes
+    merkle_anchor_interval_seconds: float = 5.0
+    merkle_anchor_batch_size: int = 10000
+    
+    # Image decoding limits
+    max_image_pixels: int = 50_000_000  # ~A4 at 700 DPI
+    max_signature_pixels: int = 4_000_000
+    render_memory_budget_bytes: int = 1024 * 1024 * 1024  # Decoded pixels held by concurrent renders per worker
     
     class Config:
         env_file = ".env"
@@ -1,18 +1,45 @@
 """
 FastAPI Main Application Entry Point
 """
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
 from app.database import engine, Base
-from app.routes import auth, documents, signatures, signed_documents
+from app.routes import auth, api_keys, documents, signatures, signed_documents, verify, audit, changes, events
+from app.utils import metrics
+from app.utils.anchoring import run_anchor_loop
+from app.utils.api_keys import api_key_usage
+from app.utils.audit import audit_log
+from app.utils.auth import shutdown_hash_pool
+from app.utils.rate_limit import RateLimitMiddleware
+from app.utils.load_shedding import LoadSheddingMiddleware, load_monitor
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background jobs for the lifetime of the app"""
+    tasks = [
+        asyncio.create_task(run_anchor_loop()),
+        # Cancelling the flusher writes out any queued audit events
+        asyncio.create_task(audit_log.run_flusher()),
+        asyncio.create_task(api_key_usage.run_flusher()),
+        asyncio.create_task(load_monitor.run())
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    shutdown_hash_pool()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Electronic Signature API",
@@ -40,6 +67,7 @@ app = FastAPI(
     6. Download the signed document at `/api/signed/{id}/download`
     """,
     version="0.1.0",
+    lifespan=lifespan,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_tags=[
@@ -47,6 +75,10 @@ app = FastAPI(
             "name": "Authentication",
             "description": "User registration, login, and authentication operations"
         },
+        {
+            "name": "API Keys",
+            "description": "Scoped keys for machine clients"
+        },
         {
             "name": "Documents",
             "description": "Upload, manage, and view documents"
@@ -58,6 +90,22 @@ app = FastAPI(
         {
             "name": "Signed Documents",
             "description": "Apply signatures to documents and download signed versions"
+        },
+        {
+            "name": "Verification",
+            "description": "Check whether a file matches a signed version"
+        },
+        {
+            "name": "Changes",
+            "description": "Incremental sync of documents, signatures and signed versions"
+        },
+        {
+            "name": "Events",
+            "description": "Server-sent progress events for uploads, signing and deletions"
+        },
+        {
+            "name": "Audit",
+            "description": "Query the audit trail of uploads, signing, downloads and deletions"
         }
     ],
     contact={
@@ -69,6 +117,10 @@ app = FastAPI(
     }
 )
 
+# Middleware added first runs innermost: CORS, then rate limits, then load shedding
+app.add_middleware(LoadSheddingMiddleware)
+app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS - Must be added before routes
 app.add_middleware(
     CORSMiddleware,
@@ -94,9 +146,14 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
+app.include_router(api_keys.router, prefix="/api/keys", tags=["API Keys"])
 app.include_router(documents.router, prefix="/api/documents", tags=["Documents"])
 app.include_router(signatures.router, prefix="/api/signatures", tags=["Signatures"])
 app.include_router(signed_documents.router, prefix="/api/signed", tags=["Signed Documents"])
+app.include_router(verify.router, prefix="/api/verify", tags=["Verification"])
+app.include_router(audit.router, prefix="/api/audit", tags=["Audit"])
+app.include_router(changes.router, prefix="/api/changes", tags=["Changes"])
+app.include_router(events.router, prefix="/api/events", tags=["Events"])
 
 @app.get("/")
 async def root():
@@ -112,10 +169,15 @@ async def root():
         },
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "authentication": "/api/auth",
+            "api_keys": "/api/keys",
             "documents": "/api/documents",
             "signatures": "/api/signatures",
-            "signed_documents": "/api/signed"
+            "signed_documents": "/api/signed",
+            "verify": "/api/verify",
+            "audit": "/api/audit",
+            "changes": "/api/changes"
         },
         "instructions": "Visit /docs for interactive API documentation (Swagger UI)"
     }
@@ -125,5 +187,10 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process counters and gauges (render coalescing, caches, ...)"""
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Database Models
 """
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -31,6 +31,13 @@ class Document(Base):
     file_path = Column(String(500), nullable=False)
     file_type = Column(String(50), nullable=False)
     file_size = Column(Integer, nullable=False)
+    mime_type = Column(String(100), nullable=True)
+    page_count = Column(Integer, default=1)
+    width = Column(Integer, nullable=True)  # Pixels for images, points for PDFs (first page)
+    height = Column(Integer, nullable=True)
+    page_sizes = Column(JSON, nullable=True)  # [[width, height], ...] for every page
+    dpi = Column(Integer, nullable=True)
+    sha256 = Column(String(64), index=True, nullable=True)  # Hex digest of the stored file
     is_signed = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -46,6 +53,8 @@ class Signature(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     signature_data = Column(Text, nullable=False)  # Base64 encoded signature image
     signature_type = Column(String(20), nullable=False)  # 'drawn' or 'typed'
+    typed_text = Column(String(200), nullable=True)  # Text of server-rendered typed signatures
+    font_name = Column(String(100), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -62,8 +71,142 @@ class SignedDocument(Base):
     signed_file_path = Column(String(500), nullable=False)
     signature_position_x = Column(Integer, default=0)
     signature_position_y = Column(Integer, default=0)
+    signature_page = Column(Integer, default=1)
+    # 'full' is a complete file, 'recipe' is rendered into the render cache on first
+    # download, and incremental versions build on a parent: 'overlay' is a stamp layer
+    # composited onto the parent chain, 'shared' reuses the parent's file
+    parent_id = Column(Integer, ForeignKey("signed_documents.id"), nullable=True)
+    storage_kind = Column(String(20), default="full")
+    # Hex digest of the complete signed file; set when the file is first rendered
+    sha256 = Column(String(64), index=True, nullable=True)
+    merkle_leaf_index = Column(Integer, index=True, nullable=True)  # Set when anchored in the Merkle log
+    # Detached Ed25519 signature (base64) over sha256 by the signer's key
+    signing_key_id = Column(Integer, ForeignKey("signing_keys.id"), nullable=True)
+    crypto_signature = Column(Text, nullable=True)
     signed_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     document = relationship("Document", back_populates="signed_documents")
     signature = relationship("Signature", back_populates="signed_documents")
+
+class SigningKey(Base):
+    """Per-user Ed25519 key pair used to sign document hashes"""
+    __tablename__ = "signing_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    public_key = Column(String(64), nullable=False)  # Raw 32-byte key, hex
+    private_key = Column(Text, nullable=False)  # PKCS8 PEM encrypted with the server secret
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    user = relationship("User")
+
+class RefreshToken(Base):
+    """Single-use refresh token; only a keyed hash of the token is stored"""
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)  # HMAC-SHA256, hex
+    family_id = Column(String(32), index=True, nullable=False)  # Shared by every rotation of one login
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True), nullable=True)  # Set when rotated
+    revoked = Column(Boolean, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    user = relationship("User")
+
+class ApiKey(Base):
+    """Scoped API key for machine clients; the secret is stored as a keyed hash"""
+    __tablename__ = "api_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    prefix = Column(String(16), unique=True, index=True, nullable=False)  # Public lookup part of the key
+    secret_hash = Column(String(64), nullable=False)  # HMAC-SHA256 of the secret part, hex
+    scopes = Column(JSON, nullable=False)  # e.g. ["read", "write"]
+    revoked = Column(Boolean, default=False)
+    usage_count = Column(Integer, default=0, nullable=False)  # Flushed from memory periodically
+    last_used_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    user = relationship("User")
+
+class AuditEvent(Base):
+    """Append-only audit record; ids are kept after the resources are deleted"""
+    __tablename__ = "audit_events"
+    __table_args__ = (
+        Index("ix_audit_events_user_time", "user_id", "created_at"),
+        Index("ix_audit_events_document_time", "document_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    action = Column(String(50), nullable=False)  # e.g. 'document.upload', 'signed.download'
+    user_id = Column(Integer, nullable=True)
+    document_id = Column(Integer, nullable=True)
+    signed_document_id = Column(Integer, nullable=True)
+    details = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Time of the action, not of the write
+
+class ChangeLogEntry(Base):
+    """One insert, update or delete of a user's document, signature or signed version"""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_user_seq", "user_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)  # Sequence number clients sync from
+    user_id = Column(Integer, nullable=False)
+    entity = Column(String(20), nullable=False)  # 'document', 'signature' or 'signed_document'
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)  # 'insert', 'update' or 'delete'
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+class MerkleTreeHead(Base):
+    """Merkle log root published after each anchoring batch"""
+    __tablename__ = "merkle_tree_heads"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tree_size = Column(Integer, nullable=False, index=True)
+    root_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class RenderMemo(Base):
+    """Rendered output reused for identical (document, signature, placement) applications"""
+    __tablename__ = "render_memos"
+    __table_args__ = (
+        UniqueConstraint(
+            "original_sha256", "signature_sha256", "page", "position_x", "position_y", "output_format",
+            name="uq_render_memo_key"
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    original_sha256 = Column(String(64), nullable=False)
+    signature_sha256 = Column(String(64), nullable=False)
+    page = Column(Integer, nullable=False, default=1)
+    position_x = Column(Integer, nullable=False)
+    position_y = Column(Integer, nullable=False)
+    output_format = Column(String(10), nullable=False)
+    file_path = Column(String(500), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class IdempotencyRecord(Base):
+    """Result of a request made with an Idempotency-Key header"""
+    __tablename__ = "idempotency_records"
+    __table_args__ = (
+        UniqueConstraint("user_id", "endpoint", "key", name="uq_idempotency_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    endpoint = Column(String(100), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    resource_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,81 @@
+"""
+API Key Routes
+"""
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import User, ApiKey
+from app.schemas import ApiKeyCreate, ApiKeyResponse, ApiKeyCreated, MessageResponse
+from app.utils.auth import get_current_user
+from app.utils.api_keys import generate_api_key, api_key_usage
+
+router = APIRouter()
+
+def _require_login(request: Request):
+    """Keys are managed with a user login, never with another key"""
+    if getattr(request.state, "api_key_id", None) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="API keys cannot manage API keys"
+        )
+
+@router.post("/", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_key(
+    key_data: ApiKeyCreate,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create an API key for a machine client
+    
+    - **name**: Label to recognise the key by
+    - **scopes**: "read" (GET requests) and/or "write"
+    
+    The full key is only returned in this response. Send it as
+    `X-API-Key: <key>` or `Authorization: Bearer <key>`.
+    """
+    _require_login(request)
+    
+    key, full_key = generate_api_key(db, current_user.id, key_data.name, key_data.scopes)
+    db.commit()
+    db.refresh(key)
+    
+    return {**ApiKeyResponse.model_validate(key).model_dump(), "key": full_key}
+
+@router.get("/", response_model=List[ApiKeyResponse])
+async def list_api_keys(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List the current user's API keys with their usage"""
+    _require_login(request)
+    
+    api_key_usage.flush(db)
+    return db.query(ApiKey).filter(ApiKey.user_id == current_user.id).order_by(ApiKey.id).all()
+
+@router.delete("/{key_id}", response_model=MessageResponse)
+async def revoke_api_key(
+    key_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Revoke an API key; requests using it are rejected immediately"""
+    _require_login(request)
+    
+    key = db.query(ApiKey).filter(ApiKey.id == key_id, ApiKey.user_id == current_user.id).first()
+    if not key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+    
+    key.revoked = True
+    db.commit()
+    
+    return {"message": "API key revoked"}
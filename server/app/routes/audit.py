@@ -0,0 +1,50 @@
+"""
+Audit Log Routes
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import User, AuditEvent
+from app.schemas import AuditEventResponse
+from app.utils.auth import get_current_user
+from app.utils.audit import audit_log
+
+router = APIRouter()
+
+@router.get("/", response_model=List[AuditEventResponse])
+async def list_audit_events(
+    document_id: Optional[int] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List the current user's audit events, newest first
+
+    Filters use the (user, time) and (document, time) indexes. Queued
+    events are flushed first so recent actions are included.
+    """
+    try:
+        audit_log.flush(db)
+    except Exception:
+        # Events stay queued for the flusher; answer from what is stored
+        pass
+
+    query = db.query(AuditEvent).filter(AuditEvent.user_id == current_user.id)
+    if document_id is not None:
+        query = query.filter(AuditEvent.document_id == document_id)
+    if action is not None:
+        query = query.filter(AuditEvent.action == action)
+    if since is not None:
+        query = query.filter(AuditEvent.created_at >= since)
+    if until is not None:
+        query = query.filter(AuditEvent.created_at < until)
+
+    return query.order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc()).limit(limit).all()
@@ -2,17 +2,38 @@
 Authentication Routes
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, or_
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import List, Optional
 
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, UserLogin, UserResponse, Token, MessageResponse
+from app.schemas import (
+    UserCreate,
+    UserBulkCreate,
+    UserLogin,
+    UserResponse,
+    BulkRegisterResult,
+    BulkRegisterResponse,
+    Token,
+    RefreshRequest,
+    MessageResponse
+)
 from app.utils.auth import (
     get_password_hash,
+    hash_passwords,
     verify_password,
     create_access_token,
-    get_current_user
+    get_current_user,
+    revoke_token,
+    oauth2_scheme
+)
+from app.utils.refresh_tokens import (
+    RefreshTokenError,
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token
 )
 from app.config import get_settings
 
@@ -20,7 +41,9 @@ router = APIRouter()
 settings = get_settings()
 
 @router.options("/register")
+@router.options("/register/bulk")
 @router.options("/login")
+@router.options("/refresh")
 @router.options("/me")
 @router.options("/logout")
 async def options_handler():
@@ -69,6 +92,82 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     return new_user
 
+@router.post("/register/bulk", response_model=BulkRegisterResponse)
+async def register_bulk(
+    bulk_data: UserBulkCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Provision many user accounts at once
+    
+    Usernames and emails are checked for the whole batch with one query,
+    passwords are hashed in parallel across worker processes, and all new
+    users are inserted in one transaction. Returns a result per user, in
+    request order; users that clash with existing accounts or with earlier
+    entries in the batch fail without affecting the others.
+    
+    Only accounts listed in the `bulk_register_usernames` setting may call it.
+    """
+    if current_user.username not in settings.bulk_register_usernames:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Bulk registration is restricted to provisioning accounts"
+        )
+    
+    users = bulk_data.users
+    if len(users) > settings.max_bulk_register_users:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many users. Max users per request: {settings.max_bulk_register_users}"
+        )
+    
+    existing = db.query(User.username, User.email).filter(or_(
+        User.username.in_({user.username for user in users}),
+        User.email.in_({user.email for user in users})
+    )).all()
+    taken_usernames = {username for username, _ in existing}
+    taken_emails = {email for _, email in existing}
+    
+    results: List[Optional[BulkRegisterResult]] = []
+    accepted = []
+    for user in users:
+        if user.username in taken_usernames:
+            results.append(BulkRegisterResult(username=user.username, success=False, error="Username already registered"))
+        elif user.email in taken_emails:
+            results.append(BulkRegisterResult(username=user.username, success=False, error="Email already registered"))
+        else:
+            taken_usernames.add(user.username)
+            taken_emails.add(user.email)
+            accepted.append((len(results), user))
+            results.append(None)
+    
+    if accepted:
+        password_hashes = await hash_passwords([user.password for _, user in accepted])
+        rows = [
+            {"username": user.username, "email": user.email, "password_hash": password_hash}
+            for (_, user), password_hash in zip(accepted, password_hashes)
+        ]
+        try:
+            created = db.scalars(
+                insert(User).returning(User, sort_by_parameter_order=True),
+                rows
+            ).all()
+            responses = [UserResponse.model_validate(user) for user in created]
+            db.commit()
+        except Exception:
+            # Lost a race with a concurrent registration; nothing was inserted
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Users changed during provisioning, please retry"
+            )
+        
+        for (index, user), response in zip(accepted, responses):
+            results[index] = BulkRegisterResult(username=user.username, success=True, user=response)
+    
+    return BulkRegisterResponse(created=len(accepted), failed=len(results) - len(accepted), results=results)
+
 @router.post("/login", response_model=Token)
 async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     """
@@ -80,7 +179,7 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     - **password**: Your password
     
     Returns an access token that should be used in the Authorization header:
-    `Authorization: Bearer <token>`
+    `Authorization: Bearer <token>`, and a refresh token for `/refresh`.
     """
     
     # Find user by username
@@ -93,14 +192,45 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access token
+    refresh_token = issue_refresh_token(db, user.id)
+    db.commit()
+    
+    return _token_response(user, refresh_token)
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token
+    
+    The refresh token is single-use: the response carries its replacement.
+    Reusing an old refresh token revokes every token from the same login.
+    No password check, so this stays cheap for clients renewing access tokens.
+    """
+    try:
+        user, refresh_token = rotate_refresh_token(db, request.refresh_token)
+    except RefreshTokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return _token_response(user, refresh_token)
+
+def _token_response(user: User, refresh_token: str) -> dict:
+    """Access token for user plus the given refresh token"""
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": user.username},
         expires_delta=access_token_expires
     )
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": int(access_token_expires.total_seconds())
+    }
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
@@ -113,6 +243,20 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.post("/logout", response_model=MessageResponse)
-async def logout(current_user: User = Depends(get_current_user)):
-    """Logout user (client-side token deletion)"""
+async def logout(
+    request: Optional[RefreshRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Logout user
+    
+    The access token is revoked server-side until it expires; the client
+    should still delete it. Send the refresh token in the body to revoke
+    it (and its rotations) too.
+    """
+    revoke_token(token)
+    if request is not None:
+        revoke_refresh_token(db, request.refresh_token, current_user.id)
     return {"message": "Successfully logged out"}
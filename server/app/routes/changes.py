@@ -0,0 +1,117 @@
+"""
+Change Feed Routes
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import get_db
+from app.models import User, ChangeLogEntry, Document, Signature, SignedDocument
+from app.schemas import ChangeResponse, ChangesResponse, DocumentResponse, SignatureResponse, SignedDocumentResponse
+from app.utils.auth import get_current_user
+from app.utils.change_feed import change_notifier
+
+router = APIRouter()
+settings = get_settings()
+
+# entity -> (model, response schema) used to attach current state
+ENTITY_SCHEMAS = {
+    "document": (Document, DocumentResponse),
+    "signature": (Signature, SignatureResponse),
+    "signed_document": (SignedDocument, SignedDocumentResponse),
+}
+
+# Commits in other worker processes do not wake this one, so waiting
+# requests also re-check at this interval
+RECHECK_SECONDS = 1.0
+
+# Entries younger than this are held back: with concurrent writers, a
+# transaction that flushed a lower id may not have committed yet, and a
+# client that moved past it would never see it. SQLite's single writer
+# commits in id order, so it needs no window.
+SETTLE_SECONDS = settings.change_feed_settle_seconds
+if SETTLE_SECONDS is None:
+    SETTLE_SECONDS = 0.0 if "sqlite" in settings.database_url else 5.0
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _fetch_changes(db: Session, user_id: int, since: int, limit: int) -> list:
+    entries = db.query(ChangeLogEntry).filter(
+        ChangeLogEntry.user_id == user_id,
+        ChangeLogEntry.id > since
+    ).order_by(ChangeLogEntry.id).limit(limit).all()
+
+    if SETTLE_SECONDS > 0:
+        # Stop at the first unsettled entry so next_since never passes it
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=SETTLE_SECONDS)
+        for index, entry in enumerate(entries):
+            if _as_utc(entry.created_at) > cutoff:
+                return entries[:index]
+    return entries
+
+@router.get("", response_model=ChangesResponse)
+async def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    wait: float = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Changes to the user's documents, signatures and signed versions after `since`
+
+    Entries for the same object are collapsed to the latest one, which
+    carries the object's current state (or none if it was deleted). Store
+    `next_since` and pass it back on the next call; call again at once
+    while `has_more` is true.
+
+    With `wait` > 0 and nothing new, the request is held open until a
+    change commits or `wait` seconds pass (long polling). Changes younger
+    than the settle window are not returned yet (see SETTLE_SECONDS).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(wait, settings.change_feed_max_wait_seconds)
+    user_id = current_user.id
+
+    entries = _fetch_changes(db, user_id, since, limit)
+    while not entries and loop.time() < deadline:
+        # Give the pooled connection back while waiting; each re-check checks one out briefly
+        db.close()
+        await change_notifier.wait(min(deadline - loop.time(), RECHECK_SECONDS))
+        entries = _fetch_changes(db, user_id, since, limit)
+
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.entity, entry.entity_id), None)
+        latest[(entry.entity, entry.entity_id)] = entry
+
+    # Load the current state of changed objects with one query per entity type
+    states = {}
+    for entity, (model, schema) in ENTITY_SCHEMAS.items():
+        ids = [entity_id for (kind, entity_id), entry in latest.items() if kind == entity and entry.operation != "delete"]
+        if ids:
+            for obj in db.query(model).filter(model.id.in_(ids)).all():
+                states[(entity, obj.id)] = schema.model_validate(obj).model_dump(mode="json")
+
+    changes = [
+        ChangeResponse(
+            seq=entry.id,
+            entity=entry.entity,
+            entity_id=entry.entity_id,
+            operation=entry.operation,
+            created_at=entry.created_at,
+            data=states.get(key)
+        )
+        for key, entry in latest.items()
+    ]
+
+    return ChangesResponse(
+        changes=changes,
+        next_since=entries[-1].id if entries else since,
+        has_more=len(entries) == limit
+    )
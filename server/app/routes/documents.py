@@ -1,16 +1,37 @@
 """
 Document Management Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Header
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Callable, List, Optional
+import io
 import os
+import zipfile
 
 from app.database import get_db
 from app.models import User, Document
-from app.schemas import DocumentResponse, MessageResponse
+from app.routes.signed_documents import discard_cached_renders
+from app.schemas import DocumentResponse, MessageResponse, BulkUploadResult, BulkUploadResponse
 from app.utils.auth import get_current_user
-from app.utils.file_handler import save_uploaded_file, delete_file, validate_file_type
+from app.utils.audit import audit_log
+from app.utils.change_feed import record_changes
+from app.utils.events import event_bus
+from app.utils.hashing import sha256_bytes
+from app.utils.idempotency import request_fingerprint, find_idempotent_result, remember_idempotent_result
+from app.utils.file_handler import (
+    save_uploaded_file,
+    delete_file,
+    validate_file_type,
+    build_upload_path,
+    save_streams_concurrently,
+    iter_zip_entries,
+    save_zip_entries,
+    inspect_file,
+    FileTooLargeError,
+    InvalidFileContentError,
+    ArchiveTooLargeError
+)
 from app.config import get_settings
 
 router = APIRouter()
@@ -28,10 +49,16 @@ async def list_documents(
 @router.post("/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_document(
     file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Upload a new document"""
+    """
+    Upload a new document
+
+    Retries sent with the same Idempotency-Key header return the original
+    document instead of storing the file again.
+    """
     
     # Validate file type
     if not validate_file_type(file.filename):
@@ -48,6 +75,26 @@ async def upload_document(
             detail=f"File too large. Max size: {settings.max_upload_size / (1024*1024)}MB"
         )
     
+    content_sha256 = sha256_bytes(contents)
+    fingerprint = request_fingerprint(file.filename, content_sha256)
+    existing_id = find_idempotent_result(db, current_user.id, "documents.upload", idempotency_key, fingerprint)
+    if existing_id is not None:
+        existing = db.query(Document).filter(
+            Document.id == existing_id,
+            Document.user_id == current_user.id
+        ).first()
+        if existing:
+            return existing
+    
+    # Check the content really is what the extension claims
+    try:
+        info = inspect_file(io.BytesIO(contents), file.filename)
+    except InvalidFileContentError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid file: {e}"
+        )
+    
     # Save file
     file_path, filename = await save_uploaded_file(file, contents, "documents")
     
@@ -61,15 +108,266 @@ async def upload_document(
         original_filename=file.filename,
         file_path=file_path,
         file_type=file_type,
-        file_size=len(contents)
+        file_size=len(contents),
+        mime_type=info.mime_type,
+        page_count=info.page_count,
+        width=info.width,
+        height=info.height,
+        page_sizes=[list(size) for size in info.page_sizes],
+        dpi=info.dpi,
+        sha256=content_sha256
     )
     
     db.add(new_document)
+    db.flush()
+    winner_id = remember_idempotent_result(
+        db, current_user.id, "documents.upload", idempotency_key, fingerprint, new_document.id, replaces=existing_id
+    )
+    if winner_id is not None:
+        # A concurrent retry with the same key stored the document first
+        db.rollback()
+        delete_file(file_path)
+        return _idempotent_document(db, current_user.id, idempotency_key, fingerprint)
     db.commit()
     db.refresh(new_document)
     
+    audit_log.record("document.upload", current_user.id, new_document.id, details={"filename": file.filename})
+    event_bus.publish(current_user.id, "upload.completed", {"uploaded": 1, "failed": 0, "document_ids": [new_document.id]})
+    
     return new_document
 
+def _idempotent_document(db: Session, user_id: int, idempotency_key: str, fingerprint: str) -> Document:
+    """The document recorded for a key by the request that won a race for it"""
+    existing_id = find_idempotent_result(db, user_id, "documents.upload", idempotency_key, fingerprint)
+    existing = db.query(Document).filter(Document.id == existing_id, Document.user_id == user_id).first()
+    if existing is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another request with this Idempotency-Key is in progress"
+        )
+    return existing
+
+def _upload_error(filename: str, size: Optional[int]) -> Optional[str]:
+    """Return the reason a file would be rejected, or None if it is acceptable"""
+    if not validate_file_type(filename):
+        return f"File type not allowed. Allowed types: {settings.allowed_document_types}"
+    if size is not None and size > settings.max_upload_size:
+        return f"File too large. Max size: {settings.max_upload_size / (1024*1024)}MB"
+    return None
+
+def _write_error(error: Exception) -> str:
+    """Turn an exception raised while writing a file into a client message"""
+    if isinstance(error, FileTooLargeError):
+        return f"File too large. Max size: {settings.max_upload_size / (1024*1024)}MB"
+    if isinstance(error, InvalidFileContentError):
+        return f"Invalid file: {error}"
+    return f"Could not store file: {error}"
+
+def _archive_too_large() -> HTTPException:
+    """Error for a ZIP upload that expands beyond max_archive_extracted_size"""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Archive too large. Max extracted size: {settings.max_archive_extracted_size / (1024*1024)}MB"
+    )
+
+def _progress_reporter(user_id: int, filenames: List[str]) -> Callable[[int, object], None]:
+    """Publish an upload.progress event as each accepted file is stored"""
+    stored = 0
+
+    def on_stored(index: int, outcome: object):
+        nonlocal stored
+        stored += 1
+        event_bus.publish(user_id, "upload.progress", {
+            "stored": stored,
+            "total": len(filenames),
+            "filename": filenames[index],
+            "success": not isinstance(outcome, Exception)
+        })
+
+    return on_stored
+
+def _persist_documents(
+    db: Session,
+    user_id: int,
+    saved: list,
+    results: List[Optional[BulkUploadResult]]
+) -> BulkUploadResponse:
+    """
+    Insert all stored files as Document rows in a single statement
+
+    Args:
+        saved: List of (result index, original_filename, file_path, unique_filename, (size, FileInfo, sha256))
+        results: Per-file results, with None placeholders at the indexes in `saved`
+    """
+    if saved:
+        rows = [
+            {
+                "user_id": user_id,
+                "filename": unique_filename,
+                "original_filename": original_filename,
+                "file_path": str(file_path),
+                "file_type": os.path.splitext(original_filename)[1],
+                "file_size": size,
+                "mime_type": info.mime_type,
+                "page_count": info.page_count,
+                "width": info.width,
+                "height": info.height,
+                "page_sizes": [list(size) for size in info.page_sizes],
+                "dpi": info.dpi,
+                "sha256": sha256
+            }
+            for _, original_filename, file_path, unique_filename, (size, info, sha256) in saved
+        ]
+        try:
+            documents = db.scalars(
+                insert(Document).returning(Document, sort_by_parameter_order=True),
+                rows
+            ).all()
+            responses = [DocumentResponse.model_validate(document) for document in documents]
+            # Bulk inserts bypass the session hooks that feed the change log
+            record_changes(db, [(user_id, "document", document.id, "insert") for document in documents])
+            db.commit()
+            for response in responses:
+                audit_log.record("document.upload", user_id, response.id, details={"filename": response.original_filename})
+        except Exception:
+            db.rollback()
+            for _, _, file_path, _, _ in saved:
+                delete_file(str(file_path))
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Could not save documents"
+            )
+
+        for (index, original_filename, _, _, _), response in zip(saved, responses):
+            results[index] = BulkUploadResult(filename=original_filename, success=True, document=response)
+
+    uploaded = len(saved)
+    event_bus.publish(user_id, "upload.completed", {
+        "uploaded": uploaded,
+        "failed": len(results) - uploaded,
+        "document_ids": [results[index].document.id for index, _, _, _, _ in saved]
+    })
+    return BulkUploadResponse(uploaded=uploaded, failed=len(results) - uploaded, results=results)
+
+@router.post("/upload/bulk", response_model=BulkUploadResponse)
+async def upload_documents_bulk(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload several documents at once
+
+    Each file is validated on its own; accepted files are written to disk
+    concurrently and inserted with a single bulk insert. Returns a result
+    entry per file in the order they were sent.
+    """
+    if len(files) > settings.max_bulk_upload_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many files. Max files per upload: {settings.max_bulk_upload_files}"
+        )
+
+    results: List[Optional[BulkUploadResult]] = []
+    accepted = []
+    for file in files:
+        error = _upload_error(file.filename, file.size)
+        if error:
+            results.append(BulkUploadResult(filename=file.filename, success=False, error=error))
+            continue
+        file_path, unique_filename = build_upload_path(file.filename, "documents")
+        accepted.append((len(results), file, file_path, unique_filename))
+        results.append(None)
+
+    # Inspect and write accepted files in parallel straight from the spooled uploads
+    written = await save_streams_concurrently(
+        [(file.file, file_path, file.filename) for _, file, file_path, _ in accepted],
+        settings.max_upload_size,
+        on_stored=_progress_reporter(current_user.id, [file.filename for _, file, _, _ in accepted])
+    )
+
+    saved = []
+    for (index, file, file_path, unique_filename), outcome in zip(accepted, written):
+        if isinstance(outcome, Exception):
+            results[index] = BulkUploadResult(filename=file.filename, success=False, error=_write_error(outcome))
+        else:
+            saved.append((index, file.filename, file_path, unique_filename, outcome))
+
+    return _persist_documents(db, current_user.id, saved, results)
+
+@router.post("/upload/archive", response_model=BulkUploadResponse)
+async def upload_documents_archive(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a ZIP archive of documents
+
+    Entries are streamed out of the archive one chunk at a time, validated
+    like regular uploads and stored as individual documents. Directories and
+    OS metadata entries are skipped.
+    """
+    if os.path.splitext(file.filename)[1].lower() != ".zip":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Archive must be a .zip file"
+        )
+
+    try:
+        archive = zipfile.ZipFile(file.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ZIP archive"
+        )
+
+    with archive:
+        entries = list(iter_zip_entries(archive))
+        if len(entries) > settings.max_bulk_upload_files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many files. Max files per upload: {settings.max_bulk_upload_files}"
+            )
+
+        results: List[Optional[BulkUploadResult]] = []
+        accepted = []
+        for info in entries:
+            filename = os.path.basename(info.filename)
+            error = _upload_error(filename, info.file_size)
+            if error:
+                results.append(BulkUploadResult(filename=filename, success=False, error=error))
+                continue
+            accepted.append((len(results), info))
+            results.append(None)
+
+        # Declared sizes bound what zipfile will decompress; the budget also caps it while streaming
+        if sum(info.file_size for _, info in accepted) > settings.max_archive_extracted_size:
+            raise _archive_too_large()
+
+        extracted = await save_zip_entries(
+            archive,
+            [info for _, info in accepted],
+            "documents",
+            on_stored=_progress_reporter(current_user.id, [os.path.basename(info.filename) for _, info in accepted])
+        )
+
+    if any(isinstance(outcome, ArchiveTooLargeError) for _, outcome, _, _ in extracted):
+        for _, outcome, file_path, _ in extracted:
+            if not isinstance(outcome, Exception):
+                delete_file(str(file_path))
+        raise _archive_too_large()
+
+    saved = []
+    for (index, _), (info, outcome, file_path, unique_filename) in zip(accepted, extracted):
+        filename = os.path.basename(info.filename)
+        if isinstance(outcome, Exception):
+            results[index] = BulkUploadResult(filename=filename, success=False, error=_write_error(outcome))
+        else:
+            saved.append((index, filename, file_path, unique_filename, outcome))
+
+    return _persist_documents(db, current_user.id, saved, results)
+
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: int,
@@ -112,9 +410,13 @@ async def delete_document(
     
     # Delete file from disk
     delete_file(document.file_path)
+    discard_cached_renders(db, document.signed_documents)
     
     # Delete from database
     db.delete(document)
     db.commit()
     
+    audit_log.record("document.delete", current_user.id, document_id)
+    event_bus.publish(current_user.id, "document.deleted", {"document_id": document_id})
+    
     return {"message": "Document deleted successfully"}
@@ -0,0 +1,66 @@
+"""
+Progress Event Routes
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import get_db
+from app.utils.auth import get_current_user, optional_oauth2_scheme, api_key_header
+from app.utils.events import event_bus, encode_event, Subscription
+
+router = APIRouter()
+settings = get_settings()
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+async def _stream(subscription: Subscription):
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode("ascii") + encode_event(None, "ready", {})
+        while True:
+            if not await subscription.wait(settings.events_heartbeat_seconds):
+                yield b": heartbeat\n\n"
+                continue
+            yield b"".join(subscription.drain())
+            if subscription.evicted:
+                return
+    finally:
+        event_bus.unsubscribe(subscription)
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    access_token: Optional[str] = Query(None, description="Token for clients that cannot send headers (EventSource)"),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    api_key: Optional[str] = Depends(api_key_header),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent event stream of the user's upload, render and deletion progress
+
+    Events carry an `id`, a type in `event` and a JSON object in `data`.
+    Streams are per worker and not replayed: after reconnecting, or after an
+    `evicted` event sent to clients that read too slowly, catch up through
+    `/api/changes`.
+    """
+    current_user = get_current_user(request, token or access_token, api_key, db)
+    user_id = current_user.id
+    # The stream may stay open for hours; do not hold a connection from the pool
+    db.close()
+
+    if event_bus.streams_for(user_id) >= settings.events_max_streams_per_user:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many open event streams. Max streams per user: {settings.events_max_streams_per_user}"
+        )
+
+    subscription = event_bus.subscribe(user_id)
+    return StreamingResponse(
+        _stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,18 +1,29 @@
 """
 Signature Management Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import base64
 import uuid
 from pathlib import Path
 
 from app.database import get_db
 from app.models import User, Signature
+from app.routes.signed_documents import discard_cached_renders, flatten_dependents
 from app.schemas import SignatureCreate, SignatureResponse, MessageResponse
 from app.utils.auth import get_current_user
 from app.utils.file_handler import delete_file
+from app.utils.imaging import inspect_image_header
+from app.utils.audit import audit_log
+from app.utils.events import event_bus
+from app.utils.typed_signature import (
+    available_fonts,
+    render_typed_signature,
+    TypedSignatureError,
+    DEFAULT_FONT
+)
 from app.config import get_settings
 
 router = APIRouter()
@@ -33,15 +44,42 @@ async def create_signature(
             detail="Signature type must be 'drawn' or 'typed'"
         )
     
-    # Decode base64 signature data and save as file
+    if signature_data.text is not None and signature_data.signature_type != "typed":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Signature text is only accepted for typed signatures"
+        )
+    
+    if signature_data.text is None and not signature_data.signature_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either signature_data or text is required"
+        )
+    
+    font_name = None
+    if signature_data.text is not None:
+        font_name = signature_data.font or DEFAULT_FONT
+        if font_name not in available_fonts():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown font. Available fonts: {', '.join(available_fonts())}"
+            )
+    
+    # Decode base64 signature data (or render typed text) and save as file
     try:
-        # Remove data URL prefix if present (e.g., "data:image/png;base64,")
-        signature_base64 = signature_data.signature_data
-        if "base64," in signature_base64:
-            signature_base64 = signature_base64.split("base64,")[1]
-        
-        # Decode base64 to bytes
-        signature_bytes = base64.b64decode(signature_base64)
+        if signature_data.text is not None:
+            signature_bytes = render_typed_signature(signature_data.text, font_name)
+        else:
+            # Remove data URL prefix if present (e.g., "data:image/png;base64,")
+            signature_base64 = signature_data.signature_data
+            if "base64," in signature_base64:
+                signature_base64 = signature_base64.split("base64,")[1]
+            
+            # Decode base64 to bytes
+            signature_bytes = base64.b64decode(signature_base64)
+            
+            # Reject non-images and oversized images from the header alone
+            inspect_image_header(signature_bytes, settings.max_signature_pixels)
         
         # Create upload directory if it doesn't exist
         upload_dir = Path(settings.upload_dir) / "signatures"
@@ -68,7 +106,9 @@ async def create_signature(
     new_signature = Signature(
         user_id=current_user.id,
         signature_data=relative_path,  # Store file path instead of base64
-        signature_type=signature_data.signature_type
+        signature_type=signature_data.signature_type,
+        typed_text=signature_data.text.strip() if signature_data.text is not None else None,
+        font_name=font_name
     )
     
     db.add(new_signature)
@@ -89,6 +129,11 @@ async def get_my_signatures(
     
     return signatures
 
+@router.get("/fonts", response_model=List[str])
+async def list_fonts(current_user: User = Depends(get_current_user)):
+    """List fonts available for typed signatures"""
+    return available_fonts()
+
 @router.get("/{signature_id}", response_model=SignatureResponse)
 async def get_signature(
     signature_id: int,
@@ -110,13 +155,62 @@ async def get_signature(
     
     return signature
 
+@router.get("/{signature_id}/image")
+async def get_signature_image(
+    signature_id: int,
+    size: Optional[int] = Query(None, ge=8, le=512),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a signature as a PNG image
+    
+    Typed signatures are re-rendered from their text, so `size` (font size
+    in pixels) gives a sharp image at any resolution. Drawn signatures are
+    returned as stored.
+    """
+    
+    signature = db.query(Signature).filter(
+        Signature.id == signature_id,
+        Signature.user_id == current_user.id
+    ).first()
+    
+    if not signature:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Signature not found"
+        )
+    
+    if signature.typed_text:
+        try:
+            content = render_typed_signature(signature.typed_text, signature.font_name, size)
+        except TypedSignatureError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e)
+            )
+        return Response(content=content, media_type="image/png")
+    
+    if not Path(signature.signature_data).exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Signature file not found"
+        )
+    
+    return FileResponse(path=signature.signature_data, media_type="image/png")
+
 @router.delete("/{signature_id}", response_model=MessageResponse)
 async def delete_signature(
     signature_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Delete a signature"""
+    """
+    Delete a signature
+
+    Its signed versions are deleted with it; versions signed with other
+    signatures that build on them are first stored as complete files.
+    """
     
     signature = db.query(Signature).filter(
         Signature.id == signature_id,
@@ -129,6 +223,10 @@ async def delete_signature(
             detail="Signature not found"
         )
     
+    # Versions signed with other signatures may build on this one's; they keep working
+    await flatten_dependents(db, signature.signed_documents)
+    discard_cached_renders(db, signature.signed_documents)
+    
     # Delete file from disk
     delete_file(signature.signature_data)
     
@@ -136,4 +234,7 @@ async def delete_signature(
     db.delete(signature)
     db.commit()
     
+    audit_log.record("signature.delete", current_user.id, details={"signature_id": signature_id})
+    event_bus.publish(current_user.id, "signature.deleted", {"signature_id": signature_id})
+    
     return {"message": "Signature deleted successfully"}
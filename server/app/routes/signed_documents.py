@@ -1,31 +1,67 @@
 """
 Signed Document Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import base64
+import hashlib
+import os
+import shutil
 
 from app.database import get_db
-from app.models import User, Document, Signature, SignedDocument
-from app.schemas import SignedDocumentCreate, SignedDocumentResponse, MessageResponse
+from app.models import User, Document, Signature, SignedDocument, MerkleTreeHead, RenderMemo
+from app.schemas import (
+    SignedDocumentCreate,
+    SignedDocumentBatchCreate,
+    SignedDocumentManyCreate,
+    SignedDocumentResponse,
+    InclusionProofResponse,
+    SignaturePlacement,
+    MessageResponse
+)
 from app.utils.auth import get_current_user
-from app.utils.signature_processor import apply_signature_to_document
+from app.utils import metrics
+from app.utils.audit import audit_log
+from app.utils.render_cache import render_cache
+from app.utils.render_memo import find_rendered, remember_rendered
+from app.utils.idempotency import request_fingerprint, find_idempotent_result, remember_idempotent_result
+from app.utils.hashing import sha256_file, sha256_bytes
+from app.utils.merkle_log import merkle_log, leaf_hash, signed_document_leaf
+from app.utils.crypto_signing import get_signing_key, sign_document_hash
+from app.utils.file_handler import delete_file
+from app.utils.cancellation import run_until_disconnect, ClientDisconnected
+from app.utils.events import event_bus
+from app.utils.typed_signature import typed_stamp_size, typed_signature_base64, TypedSignatureError, DEFAULT_FONT
+from app.utils.imaging import render_memory_budget, ImageTooLargeError
+from app.config import get_settings
+from app.utils.signature_processor import (
+    apply_signature_to_document,
+    apply_signatures_to_document,
+    create_signature_overlay,
+    new_signed_path,
+    render_signature_chain,
+    render_signed_document,
+    resolve_placement,
+    stamp_images,
+    PlacementError,
+    STAMP_MAX_WIDTH
+)
 
 router = APIRouter()
+settings = get_settings()
 
+# Non-standard status (nginx) for requests abandoned by the client
+CLIENT_CLOSED_REQUEST = 499
 
-@router.post("/apply", response_model=SignedDocumentResponse, status_code=status.HTTP_201_CREATED)
-async def apply_signature(
-        signed_doc_data: SignedDocumentCreate,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
-):
-    """Apply signature to a document"""
 
-    # Verify document exists and belongs to user
+def _get_user_document(db: Session, document_id: int, current_user: User) -> Document:
+    """Fetch a document owned by the current user or raise 404"""
     document = db.query(Document).filter(
-        Document.id == signed_doc_data.document_id,
+        Document.id == document_id,
         Document.user_id == current_user.id
     ).first()
 
@@ -35,6 +71,283 @@ async def apply_signature(
             detail="Document not found"
         )
 
+    return document
+
+
+def _resolve_placement(document: Document, placement: SignaturePlacement) -> tuple:
+    """Validate a placement against stored page geometry before any decoding"""
+    try:
+        return resolve_placement(
+            document,
+            placement.page,
+            placement.x,
+            placement.y,
+            placement.signature_position_x,
+            placement.signature_position_y
+        )
+    except PlacementError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def _load_signature_base64(signature: Signature) -> str:
+    """Read a stored signature file as base64 for processing"""
+    # Note: signature.signature_data contains the file path, not base64
+    signature_file_path = Path(signature.signature_data)
+
+    if not signature_file_path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Signature file not found"
+        )
+
+    with open(signature_file_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def _signature_stamp(signature: Signature, document: Document) -> Tuple[str, int]:
+    """
+    Signature image (base64) and stamp width limit for stamping onto a document
+
+    Typed signatures are re-rendered from their text at a size scaled to the
+    document's resolution, so they stay sharp on high DPI scans; the render
+    runs in a worker thread within the render memory budget. Drawn
+    signatures use the stored image at the default stamp width.
+    """
+    if signature.typed_text is None:
+        return _load_signature_base64(signature), STAMP_MAX_WIDTH
+
+    font_name = signature.font_name or DEFAULT_FONT
+    try:
+        size, max_width = await asyncio.to_thread(
+            typed_stamp_size, signature.typed_text, font_name, document.dpi, document.width
+        )
+        async with render_memory_budget.reserve(4 * min(max_width ** 2, settings.max_signature_pixels)):
+            signature_base64 = await asyncio.to_thread(typed_signature_base64, signature.typed_text, font_name, size)
+    except (TypedSignatureError, ImageTooLargeError, OSError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not render typed signature: {e}"
+        )
+    return signature_base64, max_width
+
+
+def _recipe_cache_path(document: Document, signature: Signature, page: int, position_x: int, position_y: int) -> str:
+    """Deterministic render cache path for a lazily rendered placement"""
+    recipe = f"{document.file_path}|{signature.signature_data}|{page}|{position_x}|{position_y}"
+    key = hashlib.sha256(recipe.encode("utf-8")).hexdigest()[:32]
+    return render_cache.path_for(f"recipe_{key}", os.path.splitext(document.file_path)[1])
+
+
+def _file_in_use(db: Session, file_path: str) -> bool:
+    """
+    Whether a committed version or render memo points at a signed file
+
+    Identical concurrent renders are coalesced into one output file, so a
+    file this request rendered may also belong to another request.
+    """
+    return (
+        db.query(SignedDocument.id).filter(SignedDocument.signed_file_path == file_path).first() is not None
+        or db.query(RenderMemo.id).filter(RenderMemo.file_path == file_path).first() is not None
+    )
+
+
+def _client_closed(db: Session) -> HTTPException:
+    """Roll back a request whose client went away mid-render; nobody sees the response"""
+    db.rollback()
+    return HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+
+
+def _publish_render(user_id: int, event: str, document_ids: List[int], **data):
+    """Publish a render.<event> progress event for the given documents"""
+    event_bus.publish(user_id, f"render.{event}", {"document_ids": document_ids, **data})
+
+
+def _attach_crypto_signatures(db: Session, signed_docs: List[SignedDocument], user_id: int):
+    """Sign each version's file hash with the signer's Ed25519 key, where the hash is known"""
+    unsigned = [signed_doc for signed_doc in signed_docs if signed_doc.sha256 and not signed_doc.crypto_signature]
+    if not unsigned:
+        return
+    key = get_signing_key(db, user_id)
+    for signed_doc in unsigned:
+        signed_doc.signing_key_id = key.id
+        signed_doc.crypto_signature = sign_document_hash(key, signed_doc.sha256)
+
+
+def _parent_of(db: Session, signed_doc: SignedDocument) -> SignedDocument:
+    """The version an incremental version builds on; 410 if it is gone"""
+    parent = None
+    if signed_doc.parent_id is not None:
+        parent = db.query(SignedDocument).filter(SignedDocument.id == signed_doc.parent_id).first()
+    if parent is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="A version this signed document builds on no longer exists"
+        )
+    return parent
+
+
+def _overlay_chain(db: Session, signed_doc: SignedDocument) -> Tuple[SignedDocument, List[Tuple[str, int, int]]]:
+    """The nearest ancestor that is not an overlay, and the overlays on top of it, oldest first"""
+    overlays = []
+    current = signed_doc
+    while current.storage_kind == "overlay":
+        overlays.append((current.signed_file_path, current.signature_position_x, current.signature_position_y))
+        current = _parent_of(db, current)
+    while current.storage_kind == "shared":
+        current = _parent_of(db, current)
+    overlays.reverse()
+    return current, overlays
+
+
+def _render_cache_path(db: Session, signed_doc: SignedDocument, document: Document) -> Optional[str]:
+    """
+    Render cache path of a recipe or overlay version; None for stored files
+
+    Paths are derived from what is rendered, never from the version id, so a
+    version that reuses a deleted version's id cannot be served its render.
+    """
+    if signed_doc.storage_kind == "recipe":
+        return _recipe_cache_path(
+            document, signed_doc.signature, signed_doc.signature_page,
+            signed_doc.signature_position_x, signed_doc.signature_position_y
+        )
+    if signed_doc.storage_kind != "overlay":
+        return None
+
+    base, overlays = _overlay_chain(db, signed_doc)
+    base_key = _render_cache_path(db, base, document) or base.signed_file_path
+    chain = "|".join([base_key] + [f"{path},{x},{y}" for path, x, y in overlays])
+    key = hashlib.sha256(chain.encode("utf-8")).hexdigest()[:32]
+    return render_cache.path_for(f"chain_{key}", os.path.splitext(document.file_path)[1])
+
+
+def discard_cached_renders(db: Session, signed_docs: List[SignedDocument]):
+    """Drop the cached renders of versions about to be deleted; call while their ancestors exist"""
+    for signed_doc in signed_docs:
+        try:
+            cache_path = _render_cache_path(db, signed_doc, signed_doc.document)
+        except HTTPException:
+            # Part of the chain is already gone, so the render cannot be looked up either
+            continue
+        if cache_path is not None:
+            render_cache.discard(cache_path)
+
+
+async def _materialize(db: Session, signed_doc: SignedDocument, document: Document) -> str:
+    """
+    Return the path of the complete signed file for a version
+
+    Full versions already have one. Recipe and overlay versions are rendered
+    into the render cache on first request and re-rendered if evicted. A
+    cached path is returned pinned so it cannot be evicted while in use;
+    pass it to render_cache.release() when done.
+    """
+    # Shared versions reuse an ancestor's file
+    while signed_doc.storage_kind == "shared":
+        signed_doc = _parent_of(db, signed_doc)
+
+    cache_path = _render_cache_path(db, signed_doc, document)
+    if cache_path is None:
+        return signed_doc.signed_file_path
+
+    cached = render_cache.get(cache_path, pin=True)
+    if cached:
+        return cached
+
+    if signed_doc.storage_kind == "recipe":
+        signature_base64, max_width = await _signature_stamp(signed_doc.signature, document)
+        content = await render_signed_document(
+            document.file_path,
+            [(signature_base64, signed_doc.signature_position_x, signed_doc.signature_position_y)],
+            {signature_base64: max_width}
+        )
+    else:
+        base, overlays = _overlay_chain(db, signed_doc)
+        base_path = await _materialize(db, base, document)
+        try:
+            content = await render_signature_chain(base_path, overlays)
+        finally:
+            render_cache.release(base_path)
+
+    # Rendering is deterministic, so the digest is recorded the first time only
+    if signed_doc.sha256 is None:
+        signed_doc.sha256 = sha256_bytes(content)
+        _attach_crypto_signatures(db, [signed_doc], signed_doc.signature.user_id)
+        db.commit()
+
+    return await asyncio.to_thread(render_cache.put, cache_path, content, True)
+
+
+class _CachedFileResponse(FileResponse):
+    """FileResponse for a materialized version; unpins the cache entry once sent"""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            render_cache.release(self.path)
+
+
+async def flatten_dependents(db: Session, signed_docs: List[SignedDocument]):
+    """
+    Make versions that build on the given ones self-contained
+
+    Call before deleting signed_docs: every other version whose parent is
+    among them is rendered in full, stored as its own file and detached
+    from the chain, so deleting its ancestors does not break it.
+    """
+    ids = [signed_doc.id for signed_doc in signed_docs]
+    if not ids:
+        return
+    dependents = db.query(SignedDocument).filter(
+        SignedDocument.parent_id.in_(ids),
+        SignedDocument.id.notin_(ids)
+    ).all()
+
+    for dependent in dependents:
+        source_path = await _materialize(db, dependent, dependent.document)
+        flattened_path = str(new_signed_path(os.path.splitext(source_path)[1]))
+        try:
+            await asyncio.to_thread(shutil.copyfile, source_path, flattened_path)
+        finally:
+            render_cache.release(source_path)
+        dependent.signed_file_path = flattened_path
+        dependent.storage_kind = "full"
+        dependent.parent_id = None
+        metrics.increment("signed.versions_flattened")
+
+
+@router.post("/apply", response_model=SignedDocumentResponse, status_code=status.HTTP_201_CREATED)
+async def apply_signature(
+        signed_doc_data: SignedDocumentCreate,
+        request: Request,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Apply signature to a document
+
+    Retries sent with the same Idempotency-Key header return the original
+    signed document without rendering again. If the client disconnects
+    during the render, the render is abandoned and nothing is stored.
+    """
+
+    fingerprint = request_fingerprint(signed_doc_data.model_dump_json())
+    existing_id = find_idempotent_result(db, current_user.id, "signed.apply", idempotency_key, fingerprint)
+    if existing_id is not None:
+        existing = db.query(SignedDocument).filter(SignedDocument.id == existing_id).first()
+        if existing:
+            return existing
+
+    # Verify document exists and belongs to user
+    document = _get_user_document(db, signed_doc_data.document_id, current_user)
+
+    page, position_x, position_y = _resolve_placement(document, signed_doc_data)
+
     # Verify signature exists and belongs to user
     signature = db.query(Signature).filter(
         Signature.id == signed_doc_data.signature_id,
@@ -48,50 +361,352 @@ async def apply_signature(
         )
 
     # Apply signature to document
-    # Note: signature.signature_data now contains file path, not base64
-    # We need to read the signature file
-    from pathlib import Path
-    signature_file_path = Path(signature.signature_data)
-    
-    if not signature_file_path.exists():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Signature file not found"
+    signature_base64, max_width = await _signature_stamp(signature, document)
+
+    # Incremental signing builds on the latest signed version, if any
+    parent = None
+    if signed_doc_data.incremental:
+        parent = db.query(SignedDocument).filter(
+            SignedDocument.document_id == document.id
+        ).order_by(SignedDocument.id.desc()).first()
+
+    lazy = settings.lazy_signed_rendering if signed_doc_data.lazy is None else signed_doc_data.lazy
+
+    # Versions rendered later get their digest when first materialized
+    signed_sha256 = None
+    # Whether signed_file_path was written by this request rather than reused
+    new_file_path = False
+
+    if parent is None and lazy:
+        # Only the recipe is stored; the file is rendered on first download
+        signed_file_path = _recipe_cache_path(document, signature, page, position_x, position_y)
+        storage_kind = "recipe"
+    elif parent is None:
+        # Identical applications reuse the existing rendered blob
+        memo_key = (
+            document.sha256 or sha256_file(document.file_path),
+            sha256_bytes(base64.b64decode(signature_base64)),
+            page,
+            position_x,
+            position_y,
+            os.path.splitext(document.file_path)[1].lower().lstrip(".")
         )
-    
-    # Read signature file as base64 for processing
-    import base64
-    with open(signature_file_path, "rb") as f:
-        signature_bytes = f.read()
-        signature_base64 = base64.b64encode(signature_bytes).decode('utf-8')
-    
-    signed_file_path = await apply_signature_to_document(
-        document.file_path,
-        signature_base64,
-        signed_doc_data.signature_position_x,
-        signed_doc_data.signature_position_y
-    )
+        signed_file_path = find_rendered(db, *memo_key)
+        if signed_file_path is None:
+            new_file_path = True
+            _publish_render(current_user.id, "started", [document.id])
+            try:
+                signed_file_path = await run_until_disconnect(request, apply_signature_to_document(
+                    document.file_path,
+                    signature_base64,
+                    position_x,
+                    position_y,
+                    max_width
+                ))
+            except ClientDisconnected:
+                _publish_render(current_user.id, "failed", [document.id], error="Client disconnected")
+                raise _client_closed(db)
+            remember_rendered(db, *memo_key, signed_file_path)
+        storage_kind = "full"
+        signed_sha256 = sha256_file(signed_file_path)
+    elif os.path.splitext(document.file_path)[1].lower() == ".pdf":
+        # PDF signing does not alter the bytes, so the parent's file is reused as is
+        signed_file_path = parent.signed_file_path
+        storage_kind = "shared"
+        signed_sha256 = parent.sha256
+    else:
+        # Only the stamp is stored; it is composited onto the parent chain on download
+        try:
+            signed_file_path = await run_until_disconnect(request, create_signature_overlay(signature_base64, max_width))
+        except ClientDisconnected:
+            raise _client_closed(db)
+        new_file_path = True
+        storage_kind = "overlay"
 
     # Create signed document record
     signed_document = SignedDocument(
         document_id=document.id,
         signature_id=signature.id,
         signed_file_path=signed_file_path,
-        signature_position_x=signed_doc_data.signature_position_x,
-        signature_position_y=signed_doc_data.signature_position_y
+        signature_position_x=position_x,
+        signature_position_y=position_y,
+        signature_page=page,
+        parent_id=parent.id if parent else None,
+        storage_kind=storage_kind,
+        sha256=signed_sha256
     )
 
+    _attach_crypto_signatures(db, [signed_document], current_user.id)
+
     db.add(signed_document)
 
     # Update document status
     document.is_signed = True
 
+    db.flush()
+    winner_id = remember_idempotent_result(
+        db, current_user.id, "signed.apply", idempotency_key, fingerprint, signed_document.id, replaces=existing_id
+    )
+    if winner_id is not None:
+        # A concurrent retry with the same key signed the document first
+        db.rollback()
+        if new_file_path and not _file_in_use(db, signed_file_path):
+            delete_file(signed_file_path)
+        existing_id = find_idempotent_result(db, current_user.id, "signed.apply", idempotency_key, fingerprint)
+        existing = db.query(SignedDocument).filter(SignedDocument.id == existing_id).first()
+        if existing is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another request with this Idempotency-Key is in progress"
+            )
+        return existing
+
     db.commit()
     db.refresh(signed_document)
 
+    audit_log.record("signed.apply", current_user.id, document.id, signed_document.id)
+    _publish_render(current_user.id, "completed", [document.id], signed_document_ids=[signed_document.id])
+
     return signed_document
 
 
+@router.post("/apply-batch", response_model=List[SignedDocumentResponse], status_code=status.HTTP_201_CREATED)
+async def apply_signatures_batch(
+        batch_data: SignedDocumentBatchCreate,
+        request: Request,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Apply several signatures to a document in one operation
+
+    The document is decoded once, all placements are composited and a single
+    signed file is written. One signed document record is created per
+    placement, all pointing at that file.
+    """
+
+    document = _get_user_document(db, batch_data.document_id, current_user)
+
+    resolved = [_resolve_placement(document, placement) for placement in batch_data.placements]
+
+    # Load every referenced signature with one query
+    signature_ids = {placement.signature_id for placement in batch_data.placements}
+    signatures = {
+        signature.id: signature
+        for signature in db.query(Signature).filter(
+            Signature.id.in_(signature_ids),
+            Signature.user_id == current_user.id
+        ).all()
+    }
+
+    if len(signatures) != len(signature_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Signature not found"
+        )
+
+    stamps = {
+        signature_id: await _signature_stamp(signature, document)
+        for signature_id, signature in signatures.items()
+    }
+
+    _publish_render(current_user.id, "started", [document.id])
+    try:
+        signed_file_path = await run_until_disconnect(request, apply_signatures_to_document(
+            document.file_path,
+            [
+                (stamps[placement.signature_id][0], position_x, position_y)
+                for placement, (_, position_x, position_y) in zip(batch_data.placements, resolved)
+            ],
+            dict(stamps.values())
+        ))
+    except ClientDisconnected:
+        _publish_render(current_user.id, "failed", [document.id], error="Client disconnected")
+        raise _client_closed(db)
+
+    signed_sha256 = sha256_file(signed_file_path)
+
+    signed_documents = [
+        SignedDocument(
+            document_id=document.id,
+            signature_id=placement.signature_id,
+            signed_file_path=signed_file_path,
+            signature_position_x=position_x,
+            signature_position_y=position_y,
+            signature_page=page,
+            sha256=signed_sha256
+        )
+        for placement, (page, position_x, position_y) in zip(batch_data.placements, resolved)
+    ]
+
+    _attach_crypto_signatures(db, signed_documents, current_user.id)
+
+    db.add_all(signed_documents)
+
+    document.is_signed = True
+
+    db.commit()
+    for signed_document in signed_documents:
+        db.refresh(signed_document)
+        audit_log.record("signed.apply", current_user.id, signed_document.document_id, signed_document.id)
+    _publish_render(
+        current_user.id, "completed", [document.id],
+        signed_document_ids=[signed_document.id for signed_document in signed_documents]
+    )
+
+    return signed_documents
+
+
+@router.post("/apply-many", response_model=List[SignedDocumentResponse], status_code=status.HTTP_201_CREATED)
+async def apply_signature_to_many(
+        batch_data: SignedDocumentManyCreate,
+        request: Request,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Apply one signature at the same placement to many documents
+
+    Image documents resolving to the same position are stamped by one batch
+    pipeline that prepares the signature mask once. Either every document is
+    signed or none is.
+    """
+
+    if len(batch_data.document_ids) > settings.max_batch_stamp_documents:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many documents. Max documents per request: {settings.max_batch_stamp_documents}"
+        )
+
+    # Load every document with one query, keeping the requested order
+    document_ids = list(dict.fromkeys(batch_data.document_ids))
+    documents = {
+        document.id: document
+        for document in db.query(Document).filter(
+            Document.id.in_(document_ids),
+            Document.user_id == current_user.id
+        ).all()
+    }
+
+    if len(documents) != len(document_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+
+    documents = [documents[document_id] for document_id in document_ids]
+    resolved = [_resolve_placement(document, batch_data) for document in documents]
+
+    signature = db.query(Signature).filter(
+        Signature.id == batch_data.signature_id,
+        Signature.user_id == current_user.id
+    ).first()
+
+    if not signature:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Signature not found"
+        )
+
+    def stamp_key(document: Document) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        # Typed signatures are rendered per page resolution and width; drawn ones are loaded once
+        return (document.dpi, document.width) if signature.typed_text is not None else None
+
+    stamps = {}
+    for document in documents:
+        if stamp_key(document) not in stamps:
+            stamps[stamp_key(document)] = await _signature_stamp(signature, document)
+
+    # Group image documents by resolved position and stamp; each group is one batch
+    signed_paths = {}
+    groups = {}
+    rendered = 0
+    user_id = current_user.id
+
+    def on_rendered(result=None):
+        # Runs on the loop for PDFs and in the stamping thread for images, never concurrently
+        nonlocal rendered
+        rendered += 1
+        _publish_render(user_id, "progress", document_ids, rendered=rendered, total=len(document_ids))
+
+    async def render_all():
+        failed = None
+        for document, (_, position_x, position_y) in zip(documents, resolved):
+            signature_base64, max_width = stamps[stamp_key(document)]
+            if os.path.splitext(document.file_path)[1].lower() == ".pdf":
+                signed_paths[document.id] = await apply_signature_to_document(
+                    document.file_path, signature_base64, position_x, position_y, max_width
+                )
+                on_rendered()
+            else:
+                groups.setdefault((position_x, position_y, signature_base64, max_width), []).append(document)
+
+        for (position_x, position_y, signature_base64, max_width), group in groups.items():
+            results = await stamp_images(
+                [document.file_path for document in group], signature_base64, position_x, position_y,
+                on_page=on_rendered, max_width=max_width
+            )
+            for document, result in zip(group, results):
+                if isinstance(result, Exception):
+                    failed = failed or (document, result)
+                else:
+                    signed_paths[document.id] = result
+        return failed
+
+    _publish_render(current_user.id, "started", document_ids, total=len(document_ids))
+    try:
+        failed = await run_until_disconnect(request, render_all())
+    except ClientDisconnected:
+        # Pages still rendering delete their own output when they finish
+        for signed_path in signed_paths.values():
+            if not _file_in_use(db, signed_path):
+                delete_file(signed_path)
+        _publish_render(current_user.id, "failed", document_ids, error="Client disconnected")
+        raise _client_closed(db)
+
+    if failed:
+        for signed_path in signed_paths.values():
+            if not _file_in_use(db, signed_path):
+                delete_file(signed_path)
+        document, error = failed
+        _publish_render(current_user.id, "failed", document_ids, error=f"Error signing {document.original_filename}: {error}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error signing {document.original_filename}: {error}"
+        )
+
+    signed_documents = [
+        SignedDocument(
+            document_id=document.id,
+            signature_id=signature.id,
+            signed_file_path=signed_paths[document.id],
+            signature_position_x=position_x,
+            signature_position_y=position_y,
+            signature_page=page,
+            sha256=sha256_file(signed_paths[document.id])
+        )
+        for document, (page, position_x, position_y) in zip(documents, resolved)
+    ]
+
+    _attach_crypto_signatures(db, signed_documents, current_user.id)
+
+    db.add_all(signed_documents)
+
+    for document in documents:
+        document.is_signed = True
+
+    db.commit()
+    for signed_document in signed_documents:
+        db.refresh(signed_document)
+        audit_log.record("signed.apply", current_user.id, signed_document.document_id, signed_document.id)
+    _publish_render(
+        current_user.id, "completed", document_ids,
+        signed_document_ids=[signed_document.id for signed_document in signed_documents]
+    )
+
+    return signed_documents
+
+
 @router.get("/{signed_document_id}", response_model=SignedDocumentResponse)
 async def get_signed_document(
         signed_document_id: int,
@@ -136,13 +751,64 @@ async def download_signed_document(
     # Get original document for filename
     document = db.query(Document).filter(Document.id == signed_doc.document_id).first()
 
-    return FileResponse(
-        path=signed_doc.signed_file_path,
+    signed_file_path = await _materialize(db, signed_doc, document)
+
+    audit_log.record("signed.download", current_user.id, document.id, signed_doc.id)
+
+    return _CachedFileResponse(
+        path=signed_file_path,
         filename=f"signed_{document.original_filename}",
         media_type="application/octet-stream"
     )
 
 
+@router.get("/{signed_document_id}/proof", response_model=InclusionProofResponse)
+async def get_inclusion_proof(
+        signed_document_id: int,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Prove a signed version's hash is in the append-only Merkle log
+
+    Returns the RFC 6962 audit path from the version's leaf to the latest
+    tree head. Hashes are anchored in periodic batches, so a version signed
+    moments ago answers 409 until the next batch.
+    """
+
+    signed_doc = db.query(SignedDocument).join(Document).filter(
+        SignedDocument.id == signed_document_id,
+        Document.user_id == current_user.id
+    ).first()
+
+    if not signed_doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Signed document not found"
+        )
+
+    head = db.query(MerkleTreeHead).order_by(MerkleTreeHead.id.desc()).first()
+
+    if signed_doc.merkle_leaf_index is None or head is None or head.tree_size <= signed_doc.merkle_leaf_index:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Signed document is not anchored yet; retry after the next batch"
+        )
+
+    audit_path = await asyncio.to_thread(merkle_log.inclusion_proof, signed_doc.merkle_leaf_index, head.tree_size)
+
+    return InclusionProofResponse(
+        signed_document_id=signed_doc.id,
+        sha256=signed_doc.sha256,
+        leaf_index=signed_doc.merkle_leaf_index,
+        leaf_hash=leaf_hash(signed_document_leaf(signed_doc.id, signed_doc.sha256)).hex(),
+        tree_size=head.tree_size,
+        root_hash=head.root_hash,
+        audit_path=[node.hex() for node in audit_path],
+        anchored_at=head.created_at
+    )
+
+
 @router.get("/document/{document_id}/list", response_model=List[SignedDocumentResponse])
 async def list_signed_versions(
         document_id: int,
@@ -0,0 +1,155 @@
+"""
+Verification Routes
+"""
+import asyncio
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+
+from app.database import get_db
+from app.models import User, Document, Signature, SignedDocument, SigningKey
+from app.schemas import (
+    VerifyResponse,
+    VerifyMatch,
+    SignatureCheckBatch,
+    SignatureCheckBatchResponse,
+    SignatureCheckResult,
+    PublicKeyResponse
+)
+from app.utils.crypto_signing import verify_document_hash, verify_batch
+from app.utils.file_handler import FileTooLargeError
+from app.utils.hashing import sha256_stream
+
+router = APIRouter()
+settings = get_settings()
+
+# Most recent signed versions returned for one file
+MAX_VERIFY_MATCHES = 20
+
+@router.post("", response_model=VerifyResponse)
+async def verify_document(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Check whether a file is a document signed through this service
+
+    The upload is hashed chunk by chunk and never stored. The digest is
+    looked up in the indexed sha256 column of signed versions, so the answer
+    does not depend on how many documents exist. No login is required:
+    anyone holding the file can verify it.
+
+    Signing some formats (PDF) leaves the bytes unchanged, so a version can
+    share its hash with the unsigned original. Such versions do not prove a
+    signature and are not reported; the file is reported as an original.
+    """
+    try:
+        digest, size = await asyncio.to_thread(sha256_stream, file.file, settings.max_upload_size)
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Max size: {settings.max_upload_size / (1024*1024)}MB"
+        )
+
+    is_original = db.query(Document.id).filter(Document.sha256 == digest).first() is not None
+
+    rows = db.query(SignedDocument, Document.original_filename, User.username, SigningKey.public_key).join(
+        Document, SignedDocument.document_id == Document.id
+    ).join(
+        Signature, SignedDocument.signature_id == Signature.id
+    ).join(
+        User, Signature.user_id == User.id
+    ).outerjoin(
+        SigningKey, SignedDocument.signing_key_id == SigningKey.id
+    ).filter(
+        SignedDocument.sha256 == digest,
+        or_(Document.sha256.is_(None), Document.sha256 != SignedDocument.sha256)
+    ).order_by(SignedDocument.signed_at.desc(), SignedDocument.id.desc()).limit(MAX_VERIFY_MATCHES).all()
+
+    matches = [
+        VerifyMatch(
+            signed_document_id=signed_doc.id,
+            document_id=signed_doc.document_id,
+            original_filename=original_filename,
+            signer=username,
+            signed_at=signed_doc.signed_at,
+            signing_key_id=signed_doc.signing_key_id,
+            signature_valid=(
+                verify_document_hash(public_key, digest, signed_doc.crypto_signature)
+                if public_key and signed_doc.crypto_signature else None
+            )
+        )
+        for signed_doc, original_filename, username, public_key in rows
+    ]
+
+    return VerifyResponse(
+        sha256=digest,
+        file_size=size,
+        verified=bool(matches),
+        is_original=is_original,
+        matches=matches
+    )
+
+@router.post("/signatures", response_model=SignatureCheckBatchResponse)
+async def verify_signatures(
+    batch: SignatureCheckBatch,
+    db: Session = Depends(get_db)
+):
+    """
+    Verify a batch of detached Ed25519 document signatures
+
+    Each item is a file hash, its base64 signature and the signing key id,
+    e.g. the manifest of a folder export. All keys are loaded with one query
+    and parsed public keys are cached between calls.
+    """
+    key_ids = {item.key_id for item in batch.items}
+    keys = {
+        key_id: (public_key, username)
+        for key_id, public_key, username in db.query(SigningKey.id, SigningKey.public_key, User.username).join(
+            User, SigningKey.user_id == User.id
+        ).filter(SigningKey.id.in_(key_ids)).all()
+    }
+
+    checks = [(keys.get(item.key_id, (None, None))[0], item.sha256, item.signature) for item in batch.items]
+    outcomes = await asyncio.to_thread(verify_batch, checks)
+
+    results = [
+        SignatureCheckResult(
+            sha256=item.sha256,
+            key_id=item.key_id,
+            valid=valid,
+            signer=keys[item.key_id][1] if item.key_id in keys else None
+        )
+        for item, valid in zip(batch.items, outcomes)
+    ]
+    valid_count = sum(outcomes)
+
+    return SignatureCheckBatchResponse(valid=valid_count, invalid=len(results) - valid_count, results=results)
+
+@router.get("/keys/{key_id}", response_model=PublicKeyResponse)
+async def get_public_key(
+    key_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a signing key's public half for offline verification"""
+    row = db.query(SigningKey, User.username).join(
+        User, SigningKey.user_id == User.id
+    ).filter(SigningKey.id == key_id).first()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Signing key not found"
+        )
+
+    key, username = row
+    return PublicKeyResponse(
+        id=key.id,
+        signer=username,
+        public_key=key.public_key,
+        is_active=key.is_active,
+        created_at=key.created_at
+    )
@@ -3,7 +3,7 @@ Pydantic Schemas for Request/Response Models
 """
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 # ===== User Schemas =====
 class UserBase(BaseModel):
@@ -24,12 +24,54 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserBulkCreate(BaseModel):
+    users: List[UserCreate] = Field(..., min_length=1)
+
+class BulkRegisterResult(BaseModel):
+    username: str
+    success: bool
+    user: Optional[UserResponse] = None
+    error: Optional[str] = None
+
+class BulkRegisterResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkRegisterResult]
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # Access token lifetime in seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+# ===== API Key Schemas =====
+class ApiKeyCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    scopes: List[Literal["read", "write"]] = Field(default_factory=lambda: ["read"], min_length=1)
+
+class ApiKeyResponse(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    scopes: List[str]
+    revoked: bool
+    usage_count: int
+    last_used_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class ApiKeyCreated(ApiKeyResponse):
+    key: str  # Full key; only returned once
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    jti: Optional[str] = None
+    exp: Optional[int] = None
 
 # ===== Document Schemas =====
 class DocumentBase(BaseModel):
@@ -45,34 +87,75 @@ class DocumentResponse(DocumentBase):
     original_filename: str
     file_path: str
     file_size: int
+    mime_type: Optional[str] = None
+    page_count: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    page_sizes: Optional[List[List[int]]] = None
+    dpi: Optional[int] = None
+    sha256: Optional[str] = None
     is_signed: bool
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class BulkUploadResult(BaseModel):
+    filename: str
+    success: bool
+    document: Optional[DocumentResponse] = None
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    uploaded: int
+    failed: int
+    results: List[BulkUploadResult]
+
 # ===== Signature Schemas =====
 class SignatureBase(BaseModel):
     signature_type: str = Field(..., pattern="^(drawn|typed)$")
 
 class SignatureCreate(SignatureBase):
-    signature_data: str  # Base64 encoded image
+    signature_data: Optional[str] = None  # Base64 encoded image
+    # Typed signatures may send text instead of an image; it is rendered server-side
+    text: Optional[str] = Field(None, min_length=1, max_length=200)
+    font: Optional[str] = None
 
 class SignatureResponse(SignatureBase):
     id: int
     user_id: int
     signature_data: str
+    typed_text: Optional[str] = None
+    font_name: Optional[str] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 # ===== Signed Document Schemas =====
-class SignedDocumentCreate(BaseModel):
-    document_id: int
+class SignaturePlacement(BaseModel):
     signature_id: int
     signature_position_x: int = 0
     signature_position_y: int = 0
+    page: int = Field(1, ge=1)
+    # Normalized coordinates (0-1 from the top-left corner of the page); override the pixel position
+    x: Optional[float] = Field(None, ge=0, le=1)
+    y: Optional[float] = Field(None, ge=0, le=1)
+
+class SignedDocumentCreate(SignaturePlacement):
+    document_id: int
+    # Build on the latest signed version of the document instead of the original
+    incremental: bool = False
+    # Store only the placement and render on first download (defaults to the server setting)
+    lazy: Optional[bool] = None
+
+class SignedDocumentBatchCreate(BaseModel):
+    document_id: int
+    placements: List[SignaturePlacement] = Field(..., min_length=1, max_length=100)
+
+class SignedDocumentManyCreate(SignaturePlacement):
+    # Same signature and placement applied to every listed document
+    document_ids: List[int] = Field(..., min_length=1)
 
 class SignedDocumentResponse(BaseModel):
     id: int
@@ -81,11 +164,102 @@ class SignedDocumentResponse(BaseModel):
     signed_file_path: str
     signature_position_x: int
     signature_position_y: int
+    signature_page: Optional[int] = 1
+    parent_id: Optional[int] = None
+    storage_kind: Optional[str] = "full"
+    sha256: Optional[str] = None
+    signing_key_id: Optional[int] = None
+    crypto_signature: Optional[str] = None
     signed_at: datetime
     
     class Config:
         from_attributes = True
 
+class InclusionProofResponse(BaseModel):
+    signed_document_id: int
+    sha256: str
+    leaf_index: int
+    leaf_hash: str
+    tree_size: int
+    root_hash: str
+    # Sibling hashes from the leaf up to the root (RFC 6962)
+    audit_path: List[str]
+    anchored_at: Optional[datetime] = None
+
+# ===== Verification Schemas =====
+class VerifyMatch(BaseModel):
+    signed_document_id: int
+    document_id: int
+    original_filename: str
+    signer: str
+    signed_at: datetime
+    signing_key_id: Optional[int] = None
+    # Whether the stored Ed25519 signature over the hash checks out (None if unsigned)
+    signature_valid: Optional[bool] = None
+
+class VerifyResponse(BaseModel):
+    sha256: str
+    file_size: int
+    verified: bool
+    # The file is an unsigned original that was uploaded for signing
+    is_original: bool = False
+    matches: List[VerifyMatch] = []
+
+class SignatureCheck(BaseModel):
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$")
+    signature: str  # Base64 Ed25519 signature
+    key_id: int
+
+class SignatureCheckBatch(BaseModel):
+    items: List[SignatureCheck] = Field(..., min_length=1, max_length=10000)
+
+class SignatureCheckResult(BaseModel):
+    sha256: str
+    key_id: int
+    valid: bool
+    signer: Optional[str] = None
+
+class SignatureCheckBatchResponse(BaseModel):
+    valid: int
+    invalid: int
+    results: List[SignatureCheckResult]
+
+class PublicKeyResponse(BaseModel):
+    id: int
+    signer: str
+    algorithm: str = "Ed25519"
+    public_key: str
+    is_active: bool
+    created_at: datetime
+
+# ===== Audit Schemas =====
+class AuditEventResponse(BaseModel):
+    id: int
+    action: str
+    user_id: Optional[int] = None
+    document_id: Optional[int] = None
+    signed_document_id: Optional[int] = None
+    details: Optional[dict] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+# ===== Change Feed Schemas =====
+class ChangeResponse(BaseModel):
+    seq: int
+    entity: str
+    entity_id: int
+    operation: str
+    created_at: datetime
+    # Current state for inserts and updates; None once deleted
+    data: Optional[dict] = None
+
+class ChangesResponse(BaseModel):
+    changes: List[ChangeResponse]
+    next_since: int  # Pass as `since` on the next call
+    has_more: bool
+
 # ===== Generic Response Schemas =====
 class MessageResponse(BaseModel):
     message: str
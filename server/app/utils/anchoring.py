@@ -0,0 +1,82 @@
+"""
+Merkle Anchoring Utilities
+"""
+import asyncio
+from typing import Optional
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import SignedDocument, MerkleTreeHead
+from app.utils import metrics
+from app.utils.merkle_log import MerkleLog, merkle_log, signed_document_leaf
+
+settings = get_settings()
+
+def anchor_pending(db: Session, log: MerkleLog = merkle_log) -> Optional[MerkleTreeHead]:
+    """
+    Append hashes of signed versions not yet in the log and publish one tree head
+
+    Versions whose file has not been rendered yet (no sha256) wait for a
+    later batch. The whole batch runs under the log's lock, so workers
+    anchoring at the same time take turns and never claim the same rows.
+    Leaves left behind by a batch whose commit failed are beyond the last
+    published head; they are dropped before the next append.
+
+    Returns:
+        MerkleTreeHead: New tree head, or None if nothing was pending
+    """
+    with log.locked():
+        published = db.query(func.max(MerkleTreeHead.tree_size)).scalar() or 0
+        if log.size > published:
+            log.truncate(published)
+
+        pending = db.query(SignedDocument.id, SignedDocument.sha256).filter(
+            SignedDocument.merkle_leaf_index.is_(None),
+            SignedDocument.sha256.isnot(None)
+        ).order_by(SignedDocument.id).limit(settings.merkle_anchor_batch_size).all()
+
+        if not pending:
+            db.rollback()
+            return None
+
+        first = log.append([signed_document_leaf(signed_doc_id, sha256) for signed_doc_id, sha256 in pending])
+        try:
+            # Claim only rows still unanchored; anything else means another writer got there first
+            claimed = db.connection().execute(
+                update(SignedDocument.__table__)
+                .where(SignedDocument.id == bindparam("b_id"), SignedDocument.merkle_leaf_index.is_(None))
+                .values(merkle_leaf_index=bindparam("b_index")),
+                [{"b_id": signed_doc_id, "b_index": first + offset} for offset, (signed_doc_id, _) in enumerate(pending)]
+            )
+            if claimed.supports_sane_multi_rowcount() and claimed.rowcount != len(pending):
+                raise RuntimeError("Signed versions were anchored concurrently")
+
+            tree_size = first + len(pending)
+            head = MerkleTreeHead(tree_size=tree_size, root_hash=log.root(tree_size).hex())
+            db.add(head)
+            db.commit()
+        except Exception:
+            db.rollback()
+            log.truncate(first)
+            raise
+
+    metrics.increment("merkle.batches")
+    return head
+
+async def run_anchor_loop(session_factory=SessionLocal, interval: Optional[float] = None):
+    """Anchor pending signed versions in batches until cancelled"""
+    interval = settings.merkle_anchor_interval_seconds if interval is None else interval
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            db = session_factory()
+            try:
+                await asyncio.to_thread(anchor_pending, db)
+            finally:
+                db.close()
+        except Exception as e:
+            metrics.increment("merkle.batch_errors")
+            print(f"Merkle anchoring failed: {e}")
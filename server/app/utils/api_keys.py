@@ -0,0 +1,157 @@
+"""
+API Key Utilities
+
+Keys look like esk_<prefix>_<secret>. The prefix is stored in clear and
+indexed, so a key is found with one lookup; only an HMAC of the secret is
+stored and it is compared in constant time.
+"""
+import asyncio
+import hashlib
+import hmac
+import secrets
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import ApiKey
+from app.utils import metrics
+
+settings = get_settings()
+
+KEY_PREFIX = "esk_"
+SCOPES = ("read", "write")
+
+def hash_api_key_secret(secret: str) -> str:
+    """Keyed hash of the secret part of a key"""
+    return hmac.new(settings.secret_key.encode("utf-8"), secret.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _split_key(api_key: str) -> Optional[Tuple[str, str]]:
+    if not api_key.startswith(KEY_PREFIX):
+        return None
+    prefix, _, secret = api_key[len(KEY_PREFIX):].partition("_")
+    if not prefix or not secret:
+        return None
+    return prefix, secret
+
+def generate_api_key(db: Session, user_id: int, name: str, scopes: List[str]) -> Tuple[ApiKey, str]:
+    """
+    Create an API key (the caller commits)
+
+    Returns:
+        Tuple[ApiKey, str]: The stored key and the full key, shown to the user only once
+    """
+    prefix = secrets.token_hex(6)
+    secret = secrets.token_urlsafe(32)
+    key = ApiKey(
+        user_id=user_id,
+        name=name,
+        prefix=prefix,
+        secret_hash=hash_api_key_secret(secret),
+        scopes=sorted(set(scopes))
+    )
+    db.add(key)
+    return key, f"{KEY_PREFIX}{prefix}_{secret}"
+
+def authenticate_api_key(db: Session, api_key: str) -> Optional[ApiKey]:
+    """Return the active key matching api_key, or None"""
+    parts = _split_key(api_key)
+    if parts is None:
+        return None
+    prefix, secret = parts
+
+    key = db.query(ApiKey).filter(ApiKey.prefix == prefix).first()
+    if key is None or key.revoked:
+        metrics.increment("auth.api_key_failures")
+        return None
+    if not hmac.compare_digest(key.secret_hash, hash_api_key_secret(secret)):
+        metrics.increment("auth.api_key_failures")
+        return None
+
+    api_key_usage.record(key.id)
+    return key
+
+class ApiKeyUsage:
+    """
+    Per-key request counters aggregated in memory
+
+    Authenticating with a key only bumps a counter here; run_flusher adds the
+    counts to api_keys.usage_count with one executemany per interval, so key
+    traffic causes no write per request.
+    """
+
+    def __init__(self, flush_interval: float, session_factory=SessionLocal):
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self._counts = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def record(self, key_id: int):
+        with self._lock:
+            self._counts[key_id] = self._counts.get(key_id, 0) + 1
+            self._last_used[key_id] = datetime.now(timezone.utc)
+
+    def pending(self, key_id: int) -> int:
+        """Uses counted but not yet written"""
+        return self._counts.get(key_id, 0)
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """
+        Add pending counts to the database
+
+        Returns:
+            int: Number of keys updated
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            last_used, self._last_used = self._last_used, {}
+        if not counts:
+            return 0
+
+        table = ApiKey.__table__
+        statement = update(table).where(table.c.id == bindparam("key_id")).values(
+            usage_count=table.c.usage_count + bindparam("uses"),
+            last_used_at=bindparam("used_at")
+        )
+        rows = [{"key_id": key_id, "uses": uses, "used_at": last_used[key_id]} for key_id, uses in counts.items()]
+
+        session = db if db is not None else self.session_factory()
+        try:
+            session.execute(statement, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            # Keep the counts for the next attempt
+            with self._lock:
+                for key_id, uses in counts.items():
+                    self._counts[key_id] = self._counts.get(key_id, 0) + uses
+                    self._last_used.setdefault(key_id, last_used[key_id])
+            raise
+        finally:
+            if db is None:
+                session.close()
+
+        metrics.increment("auth.api_key_usage_flushes")
+        return len(rows)
+
+    async def run_flusher(self):
+        """Flush every flush_interval seconds until cancelled, then flush the remainder"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"API key usage flush failed: {e}")
+        finally:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"API key usage flush on shutdown failed: {e}")
+
+api_key_usage = ApiKeyUsage(settings.api_key_usage_flush_seconds)
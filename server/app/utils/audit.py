@@ -0,0 +1,135 @@
+"""
+Audit Log Utilities
+"""
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import AuditEvent
+from app.utils import metrics
+
+settings = get_settings()
+
+class AuditLog:
+    """
+    Buffer audit events in memory and write them to the audit_events table in batches
+
+    record() only appends to a queue, so requests pay no extra commit. The
+    flusher task writes the queue with one multi-row insert once it holds
+    batch_size events or flush_interval seconds have passed, and the app
+    lifespan flushes whatever is left on shutdown. Events that fail to write
+    are put back at the front of the queue; beyond max_queue the oldest
+    events are dropped and counted.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int, session_factory=SessionLocal):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.session_factory = session_factory
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wake = None
+
+    def record(
+        self,
+        action: str,
+        user_id: Optional[int],
+        document_id: Optional[int] = None,
+        signed_document_id: Optional[int] = None,
+        details: Optional[dict] = None
+    ):
+        """Queue an audit event without touching the database"""
+        event = {
+            "action": action,
+            "user_id": user_id,
+            "document_id": document_id,
+            "signed_document_id": signed_document_id,
+            "details": details,
+            "created_at": datetime.now(timezone.utc)
+        }
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                metrics.increment("audit.dropped")
+            self._queue.append(event)
+            full = len(self._queue) >= self.batch_size
+
+        if full and self._wake is not None:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """
+        Write all queued events
+
+        Args:
+            db: Session to write with (a new one from session_factory otherwise)
+
+        Returns:
+            int: Number of events written
+        """
+        with self._lock:
+            events = list(self._queue)
+            self._queue.clear()
+        if not events:
+            return 0
+
+        session = db if db is not None else self.session_factory()
+        try:
+            session.execute(insert(AuditEvent), events)
+            session.commit()
+        except Exception:
+            session.rollback()
+            with self._lock:
+                self._queue.extendleft(reversed(events))
+                while len(self._queue) > self.max_queue:
+                    self._queue.popleft()
+                    metrics.increment("audit.dropped")
+            metrics.increment("audit.flush_errors")
+            raise
+        finally:
+            if db is None:
+                session.close()
+
+        metrics.increment("audit.events_written", len(events))
+        metrics.increment("audit.flushes")
+        return len(events)
+
+    async def run_flusher(self):
+        """Flush on size or time triggers until cancelled, then flush the remainder"""
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Audit flush failed: {e}")
+        finally:
+            self._wake = None
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Audit flush on shutdown failed: {e}")
+
+audit_log = AuditLog(
+    settings.audit_batch_size,
+    settings.audit_flush_interval_seconds,
+    settings.audit_max_queue
+)
+metrics.register_gauge("audit.pending", lambda: audit_log.pending)
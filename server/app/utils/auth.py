@@ -1,10 +1,17 @@
 """
 Authentication Utilities
 """
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from typing import List, Optional
+import time
+import uuid
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from jose import JWTError, jwt
 import bcrypt
 from sqlalchemy.orm import Session
@@ -13,11 +20,19 @@ from app.config import get_settings
 from app.database import get_db
 from app.models import User
 from app.schemas import TokenData
+from app.utils.api_keys import KEY_PREFIX, authenticate_api_key
+from app.utils.token_denylist import token_denylist
 
 settings = get_settings()
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# get_current_user also accepts API keys, so neither header is required on its own
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# Methods an API key with only the "read" scope may use
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -29,6 +44,40 @@ def get_password_hash(password: str) -> str:
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # Forking a threaded server can copy held locks into the child; start clean processes instead
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(start_method)
+            )
+        return _hash_pool
+
+def shutdown_hash_pool():
+    """Stop the password hashing worker processes, if started"""
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(cancel_futures=True)
+            _hash_pool = None
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash many passwords in parallel
+    
+    bcrypt is CPU bound, so the hashes run in a pool of worker processes
+    (started on first use) instead of one after another on the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_hash_pool()
+    return list(await asyncio.gather(*(loop.run_in_executor(pool, get_password_hash, password) for password in passwords)))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -38,7 +87,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     
-    to_encode.update({"exp": expire})
+    # jti identifies the token so it can be revoked on logout
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     
     return encoded_jwt
@@ -52,23 +102,65 @@ def verify_token(token: str, credentials_exception):
         if username is None:
             raise credentials_exception
         
-        token_data = TokenData(username=username)
+        # Revoked tokens are checked in memory, without a database query
+        if token_denylist.is_revoked(payload.get("jti")):
+            raise credentials_exception
+        
+        token_data = TokenData(username=username, jti=payload.get("jti"), exp=payload.get("exp"))
         return token_data
     
     except JWTError:
         raise credentials_exception
 
+def revoke_token(token: str):
+    """Deny an access token until it expires"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data = verify_token(token, credentials_exception)
+    if token_data.jti:
+        token_denylist.revoke(token_data.jti, token_data.exp or int(time.time()) + settings.access_token_expire_minutes * 60)
+
 def get_current_user(
-    token: str = Depends(oauth2_scheme),
+    request: Request,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    api_key: Optional[str] = Depends(api_key_header),
     db: Session = Depends(get_db)
 ) -> User:
-    """Get current authenticated user"""
+    """
+    Get current authenticated user
+    
+    Accepts a JWT access token, or an API key sent as `X-API-Key` or as the
+    Bearer token. Keys without the "write" scope may only read.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    if api_key is None and token is not None and token.startswith(KEY_PREFIX):
+        api_key = token
+    if api_key is not None:
+        key = authenticate_api_key(db, api_key)
+        if key is None:
+            raise credentials_exception
+        
+        required_scope = "read" if request.method in READ_METHODS else "write"
+        if required_scope not in key.scopes:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"API key lacks the '{required_scope}' scope"
+            )
+        
+        request.state.api_key_id = key.id
+        return key.user
+    
+    if token is None:
+        raise credentials_exception
+    
     token_data = verify_token(token, credentials_exception)
     
     user = db.query(User).filter(User.username == token_data.username).first()
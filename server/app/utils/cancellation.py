@@ -0,0 +1,106 @@
+"""
+Render Cancellation Utilities
+
+Renders started by a request are abandoned when the client goes away. A
+render waiting for memory budget is simply cancelled; one already running
+in a worker thread cannot be interrupted, so it checks a cancellation flag
+between stages and anything it still produces is deleted when it finishes.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from fastapi import Request
+
+from app.utils import metrics
+
+T = TypeVar("T")
+
+# Set inside worker threads running a cancellable render
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("render_cancel_event", default=None)
+
+class RenderCancelled(Exception):
+    """Raised inside a render whose caller has gone away"""
+    pass
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before the response was ready"""
+    pass
+
+def raise_if_cancelled():
+    """Stop a render between stages if it was cancelled; call from worker threads"""
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise RenderCancelled()
+
+def discard_outputs(result: Any):
+    """Delete output files returned by an abandoned render (a path or a list of paths)"""
+    paths = result if isinstance(result, list) else [result]
+    for path in paths:
+        if isinstance(path, str) and os.path.exists(path):
+            os.remove(path)
+            metrics.increment("render.outputs_discarded")
+
+async def to_thread_cancellable(func: Callable[..., T], *args, discard: Optional[Callable[[Any], None]] = None) -> T:
+    """
+    Run func in a worker thread, like asyncio.to_thread, but cancellable
+
+    When the awaiting task is cancelled the thread sees raise_if_cancelled()
+    fail at its next check, and once it finishes its result (if any) is
+    passed to discard so partial output can be removed.
+    """
+    event = threading.Event()
+    context = contextvars.copy_context()
+    context.run(_cancel_event.set, event)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, context.run, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        event.set()
+        metrics.increment("render.cancelled")
+        future.add_done_callback(lambda f: _after_abandoned(f, discard))
+        raise
+
+def _after_abandoned(future: asyncio.Future, discard: Optional[Callable[[Any], None]]):
+    # Retrieve the outcome so a late failure is not logged as unhandled
+    if future.cancelled() or future.exception() is not None:
+        return
+    if discard is not None:
+        discard(future.result())
+
+async def _wait_for_disconnect(request: Request):
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def run_until_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Await work for a request, cancelling it if the client disconnects first
+
+    Must be used after the request body has been read.
+
+    Raises:
+        ClientDisconnected: The client went away; the work was cancelled
+    """
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+
+    if work.cancelled() or not work.done():
+        try:
+            await work
+        except (asyncio.CancelledError, RenderCancelled):
+            pass
+        metrics.increment("requests.client_disconnected")
+        raise ClientDisconnected()
+    return work.result()
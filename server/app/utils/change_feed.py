@@ -0,0 +1,134 @@
+"""
+Change Feed Utilities
+
+Every insert, update and delete of a Document, Signature or SignedDocument
+made through the ORM is recorded as a ChangeLogEntry in the same flush, so
+the entry commits or rolls back with the change itself. Entry ids form a
+per-database increasing sequence that clients sync from.
+
+Ids are assigned at flush, not at commit. SQLite holds its write lock from
+the first flush to commit, so entries become visible in id order. Databases
+with concurrent writers (PostgreSQL) can commit a lower id after a higher one
+has been read, so the feed holds back entries younger than
+change_feed_settle_seconds; see app.routes.changes.
+"""
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import ChangeLogEntry, Document, Signature, SignedDocument
+from app.utils import metrics
+
+ENTITY_NAMES = {Document: "document", Signature: "signature", SignedDocument: "signed_document"}
+
+# Session.info key marking sessions whose transaction recorded changes
+_PENDING_KEY = "change_feed_pending"
+
+class ChangeNotifier:
+    """Wake long-poll requests, on any event loop, after changes commit"""
+
+    def __init__(self):
+        self._waiters = set()
+        self._lock = threading.Lock()
+
+    def notify(self):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, wake in waiters:
+            loop.call_soon_threadsafe(wake.set)
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for a commit; returns whether one happened"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+change_notifier = ChangeNotifier()
+
+def record_changes(db: Session, changes: Iterable[Tuple[int, str, int, str]]):
+    """
+    Record changes made outside the unit of work (e.g. bulk INSERT statements)
+
+    Args:
+        db: Session whose transaction made the changes
+        changes: (user_id, entity, entity_id, operation) tuples
+    """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"user_id": user_id, "entity": entity, "entity_id": entity_id, "operation": operation, "created_at": now}
+        for user_id, entity, entity_id, operation in changes
+    ]
+    if rows:
+        db.execute(insert(ChangeLogEntry), rows)
+        db.info[_PENDING_KEY] = True
+
+def _owner_ids(session: Session, signed_docs: List[SignedDocument]) -> dict:
+    """Document owner per signed version, with one query for the unloaded ones"""
+    owners = {}
+    missing = set()
+    for signed_doc in signed_docs:
+        document = signed_doc.__dict__.get("document")
+        if document is not None:
+            owners[signed_doc.document_id] = document.user_id
+        else:
+            missing.add(signed_doc.document_id)
+    if missing:
+        rows = session.connection().execute(
+            select(Document.id, Document.user_id).where(Document.id.in_(missing))
+        )
+        owners.update({document_id: user_id for document_id, user_id in rows})
+    return owners
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_changes(session: Session, flush_context):
+    changed = []
+    for operation, objects in (
+        ("insert", session.new),
+        ("update", [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]),
+        ("delete", session.deleted),
+    ):
+        changed.extend((operation, obj) for obj in objects if type(obj) in ENTITY_NAMES)
+    if not changed:
+        return
+
+    owners = _owner_ids(session, [obj for _, obj in changed if isinstance(obj, SignedDocument)])
+    now = datetime.now(timezone.utc)
+    rows = []
+    for operation, obj in changed:
+        user_id = owners.get(obj.document_id) if isinstance(obj, SignedDocument) else obj.user_id
+        if user_id is None:
+            continue
+        rows.append({
+            "user_id": user_id,
+            "entity": ENTITY_NAMES[type(obj)],
+            "entity_id": obj.id,
+            "operation": operation,
+            "created_at": now
+        })
+
+    if rows:
+        # Written on the flush's connection, inside the same transaction
+        session.connection().execute(insert(ChangeLogEntry), rows)
+        session.info[_PENDING_KEY] = True
+        metrics.increment("changes.recorded", len(rows))
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed_changes(session: Session):
+    if session.info.pop(_PENDING_KEY, False):
+        change_notifier.notify()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_changes(session: Session):
+    session.info.pop(_PENDING_KEY, None)
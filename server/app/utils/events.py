@@ -0,0 +1,156 @@
+"""
+Progress Event Utilities
+
+Uploads, renders and deletions publish small progress events to an
+in-process bus; every open event stream of the user receives a copy. Each
+event is serialized once and the same bytes are queued for every stream.
+Streams that stop reading are evicted once their buffer fills, so one slow
+client never holds memory for the rest.
+
+Events only reach streams connected to the same worker. Clients that need a
+complete history catch up through the change feed.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Set
+
+from app.config import get_settings
+from app.utils import metrics
+
+settings = get_settings()
+
+class Subscription:
+    """One open event stream: a bounded buffer of encoded events"""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, max_buffer: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.max_buffer = max_buffer
+        self.buffer = deque()
+        self.ready = asyncio.Event()
+        self.evicted = False
+
+    def push(self, frame: bytes) -> bool:
+        """Queue an encoded event; returns False if the buffer is full. Loop thread only"""
+        if self.evicted:
+            return True
+        if len(self.buffer) >= self.max_buffer:
+            return False
+        self.buffer.append(frame)
+        self.ready.set()
+        return True
+
+    def drain(self) -> list:
+        """Take every queued event"""
+        frames = list(self.buffer)
+        self.buffer.clear()
+        self.ready.clear()
+        return frames
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for events; returns whether any are queued"""
+        if not self.buffer:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+class EventBus:
+    """
+    Fan progress events out to each user's open streams
+
+    publish() may be called from the event loop or from worker threads;
+    deliveries to a stream always run on the loop that owns it.
+    """
+
+    def __init__(self, max_buffer: int):
+        self.max_buffer = max_buffer
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def streams_for(self, user_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Open a stream for a user; call from the loop that will read it"""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.max_buffer)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: int, event: str, data: Dict[str, Any]):
+        """Send an event to every open stream of a user"""
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        if not subscriptions:
+            return
+
+        frame = encode_event(next(self._ids), event, data)
+        metrics.increment("events.published")
+
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+
+        # One wake-up per foreign loop, however many of its streams receive the event
+        by_loop = {}
+        for subscription in subscriptions:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, targets in by_loop.items():
+            if loop is current:
+                self._deliver(targets, frame)
+            else:
+                try:
+                    loop.call_soon_threadsafe(self._deliver, targets, frame)
+                except RuntimeError:
+                    # The stream's loop has closed; it no longer reads
+                    for subscription in targets:
+                        self.unsubscribe(subscription)
+
+    def _deliver(self, subscriptions: list, frame: bytes):
+        for subscription in subscriptions:
+            if subscription.push(frame):
+                metrics.increment("events.delivered")
+            else:
+                self.evict(subscription)
+
+    def evict(self, subscription: Subscription):
+        """Drop a stream that is not keeping up; it is told once, then closed"""
+        self.unsubscribe(subscription)
+        subscription.buffer.clear()
+        subscription.buffer.append(encode_event(None, "evicted", {"reason": "slow consumer"}))
+        subscription.evicted = True
+        subscription.ready.set()
+        metrics.increment("events.evicted")
+
+def encode_event(event_id: Optional[int], event: str, data: Dict[str, Any]) -> bytes:
+    """Frame an event in the text/event-stream format"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+event_bus = EventBus(settings.events_max_buffer)
+metrics.register_gauge("events.subscribers", lambda: event_bus.subscriber_count)
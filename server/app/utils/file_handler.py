@@ -1,19 +1,250 @@
 """
 File Handling Utilities
 """
+import asyncio
+import hashlib
 import os
+import struct
+import threading
 import uuid
+import zipfile
+import zlib
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, List, NamedTuple, Optional, Tuple
 from fastapi import UploadFile
+from PyPDF2 import PdfReader
 from app.config import get_settings
+from app.utils.imaging import check_pixel_limit, ImageTooLargeError
 
 settings = get_settings()
 
+# Chunk size used when streaming uploads and archive entries to disk
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Bytes read from the start of an upload to detect its real type
+SNIFF_SIZE = 8 * 1024
+
+# Extensions that share a file format map to one canonical extension
+CANONICAL_EXTENSIONS = {".jpeg": ".jpg"}
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+# Resolution assumed when a file does not declare one (PDF user space is 72 pt/inch)
+DEFAULT_DPI = 72
+
+# Declared resolutions outside this range are treated as corrupt and ignored
+MIN_DPI = 20
+MAX_DPI = 2400
+
+# JPEG start-of-frame markers (C4, C8 and CC are DHT, JPG and DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+class FileTooLargeError(Exception):
+    """Raised when a streamed file exceeds the configured upload size"""
+    pass
+
+class InvalidFileContentError(Exception):
+    """Raised when file contents are corrupt or do not match the extension"""
+    pass
+
+class ArchiveTooLargeError(Exception):
+    """Raised when an archive's entries expand beyond the configured total size"""
+    pass
+
+class FileInfo(NamedTuple):
+    """Metadata detected from a file's content"""
+    file_type: str
+    mime_type: str
+    page_count: int
+    width: Optional[int]
+    height: Optional[int]
+    page_sizes: List[Tuple[int, int]]
+    dpi: int
+
 def validate_file_type(filename: str) -> bool:
     """Validate file type based on extension"""
     file_ext = os.path.splitext(filename)[1].lower()
     return file_ext in settings.allowed_document_types
 
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """Detect the file type from its leading bytes, returning a canonical extension"""
+    # PDF readers accept the header anywhere in the first 1024 bytes
+    if b"%PDF-" in head[:1024]:
+        return ".pdf"
+    if head.startswith(PNG_SIGNATURE):
+        return ".png"
+    if head.startswith(JPEG_SIGNATURE):
+        return ".jpg"
+    return None
+
+def _png_geometry(head: bytes) -> Tuple[int, int, int]:
+    """Read width, height and DPI from the PNG IHDR and pHYs chunks"""
+    if len(head) < 33 or head[12:16] != b"IHDR":
+        raise InvalidFileContentError("Corrupt PNG header")
+    if zlib.crc32(head[12:29]) != struct.unpack(">I", head[29:33])[0]:
+        raise InvalidFileContentError("Corrupt PNG header")
+    width, height = struct.unpack(">II", head[16:24])
+    if not width or not height:
+        raise InvalidFileContentError("Invalid PNG dimensions")
+
+    # pHYs must come before the first IDAT chunk
+    dpi = DEFAULT_DPI
+    offset = 33
+    while offset + 8 <= len(head):
+        length, chunk_type = struct.unpack(">I4s", head[offset:offset + 8])
+        if chunk_type == b"IDAT":
+            break
+        if chunk_type == b"pHYs" and length == 9 and offset + 17 <= len(head):
+            ppu_x, _, unit = struct.unpack(">IIB", head[offset + 8:offset + 17])
+            if unit == 1:
+                dpi = _plausible_dpi(round(ppu_x * 0.0254))
+            break
+        offset += length + 12
+    return width, height, dpi
+
+def _plausible_dpi(dpi: int) -> int:
+    """A declared resolution, or DEFAULT_DPI if it is outside MIN_DPI..MAX_DPI"""
+    return dpi if MIN_DPI <= dpi <= MAX_DPI else DEFAULT_DPI
+
+def _jpeg_geometry(stream: BinaryIO) -> Tuple[int, int, int]:
+    """Walk JPEG marker segments up to the start-of-frame header"""
+    dpi = DEFAULT_DPI
+    stream.read(2)  # SOI
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            break
+        if byte != b"\xff":
+            continue
+        marker = stream.read(1)
+        while marker == b"\xff":
+            marker = stream.read(1)
+        if not marker:
+            break
+        code = marker[0]
+        # Standalone markers carry no length field
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            continue
+        if code in (0xD9, 0xDA):
+            break
+        length_bytes = stream.read(2)
+        if len(length_bytes) < 2:
+            break
+        length = struct.unpack(">H", length_bytes)[0]
+        if length < 2:
+            break
+        if code in JPEG_SOF_MARKERS:
+            frame = stream.read(5)
+            if len(frame) < 5:
+                break
+            height, width = struct.unpack(">HH", frame[1:5])
+            if not width or not height:
+                raise InvalidFileContentError("Invalid JPEG dimensions")
+            return width, height, dpi
+        segment = stream.read(length - 2)
+        # JFIF APP0 density: units 1 = dots per inch, 2 = dots per cm
+        if code == 0xE0 and segment[:5] == b"JFIF\x00" and len(segment) >= 12:
+            units, density_x = struct.unpack(">BH", segment[7:10])
+            if units == 1:
+                dpi = _plausible_dpi(density_x)
+            elif units == 2:
+                dpi = _plausible_dpi(round(density_x * 2.54))
+    raise InvalidFileContentError("Corrupt JPEG header")
+
+def _pdf_geometry(stream: BinaryIO) -> List[Tuple[int, int]]:
+    """Return the size (in points) of every page of a PDF"""
+    try:
+        reader = PdfReader(stream, strict=False)
+        page_sizes = [
+            (round(float(page.mediabox.width)), round(float(page.mediabox.height)))
+            for page in reader.pages
+        ]
+    except Exception:
+        raise InvalidFileContentError("Corrupt PDF file")
+    if not page_sizes:
+        raise InvalidFileContentError("PDF has no pages")
+    return page_sizes
+
+def inspect_file(stream: BinaryIO, filename: str) -> FileInfo:
+    """
+    Check that a file's content matches its extension and read its geometry
+
+    Only the leading bytes are needed for images; PDFs are parsed for
+    their page tree. The stream is rewound before returning.
+
+    Args:
+        stream: Seekable binary stream positioned at the start of the file
+        filename: Client supplied filename
+
+    Returns:
+        FileInfo: Detected type, page count, per-page dimensions and DPI
+
+    Raises:
+        InvalidFileContentError: If the content is unrecognized, corrupt or mislabeled
+    """
+    file_ext = os.path.splitext(filename)[1].lower()
+    expected = CANONICAL_EXTENSIONS.get(file_ext, file_ext)
+
+    head = stream.read(SNIFF_SIZE)
+    stream.seek(0)
+    detected = sniff_file_type(head)
+
+    if detected is None:
+        raise InvalidFileContentError("Unrecognized file content")
+    if detected != expected:
+        raise InvalidFileContentError(f"File content does not match its extension (detected {detected})")
+
+    try:
+        if detected == ".pdf":
+            page_sizes = _pdf_geometry(stream)
+            dpi = DEFAULT_DPI
+        elif detected == ".png":
+            width, height, dpi = _png_geometry(head)
+            page_sizes = [(width, height)]
+        else:
+            width, height, dpi = _jpeg_geometry(stream)
+            page_sizes = [(width, height)]
+    finally:
+        stream.seek(0)
+
+    # Decompression bomb guard: reject from the header before anything decodes it
+    if detected != ".pdf":
+        try:
+            check_pixel_limit(width, height)
+        except ImageTooLargeError as e:
+            raise InvalidFileContentError(str(e))
+
+    width, height = page_sizes[0]
+    return FileInfo(detected, MIME_TYPES[detected], len(page_sizes), width, height, page_sizes, dpi)
+
+def build_upload_path(original_filename: str, subfolder: str) -> Tuple[Path, str]:
+    """
+    Reserve a unique path for a new upload
+
+    Args:
+        original_filename: Filename supplied by the client
+        subfolder: Subfolder name (e.g., 'documents' or 'signatures')
+
+    Returns:
+        tuple: (file_path, unique_filename)
+    """
+    # Create upload directory if it doesn't exist
+    upload_dir = Path(settings.upload_dir) / subfolder
+    upload_dir.mkdir(parents=True, exist_ok=True)
+
+    # Generate unique filename
+    file_ext = os.path.splitext(original_filename)[1]
+    unique_filename = f"{uuid.uuid4()}{file_ext}"
+
+    return upload_dir / unique_filename, unique_filename
+
 async def save_uploaded_file(file: UploadFile, contents: bytes, subfolder: str) -> tuple:
     """
     Save uploaded file to disk
@@ -26,14 +257,7 @@ async def save_uploaded_file(file: UploadFile, contents: bytes, subfolder: str)
     Returns:
         tuple: (file_path, unique_filename)
     """
-    # Create upload directory if it doesn't exist
-    upload_dir = Path(settings.upload_dir) / subfolder
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename
-    file_ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = upload_dir / unique_filename
+    file_path, unique_filename = build_upload_path(file.filename, subfolder)
     
     # Write file to disk
     with open(file_path, "wb") as f:
@@ -41,6 +265,180 @@ async def save_uploaded_file(file: UploadFile, contents: bytes, subfolder: str)
     
     return str(file_path), unique_filename
 
+def copy_stream(source: BinaryIO, file_path: Path, max_size: Optional[int] = None, hasher=None) -> int:
+    """
+    Stream a file object to disk in chunks
+
+    Args:
+        source: Readable binary stream
+        file_path: Destination path
+        max_size: Abort with FileTooLargeError once more bytes than this are read
+        hasher: Optional hashlib object updated with every chunk written
+
+    Returns:
+        int: Number of bytes written
+    """
+    written = 0
+    try:
+        with open(file_path, "wb") as f:
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_size is not None and written > max_size:
+                    raise FileTooLargeError(f"File exceeds {max_size} bytes")
+                if hasher is not None:
+                    hasher.update(chunk)
+                f.write(chunk)
+    except Exception:
+        delete_file(str(file_path))
+        raise
+    return written
+
+def store_stream(
+    source: BinaryIO,
+    file_path: Path,
+    filename: str,
+    max_size: Optional[int] = None
+) -> Tuple[int, FileInfo, str]:
+    """
+    Inspect a stream's content and, if it is valid, write it to disk
+
+    Returns:
+        tuple: (bytes written, FileInfo, SHA-256 hex digest computed while writing)
+    """
+    info = inspect_file(source, filename)
+    hasher = hashlib.sha256()
+    written = copy_stream(source, file_path, max_size, hasher)
+    return written, info, hasher.hexdigest()
+
+async def save_streams_concurrently(
+    jobs: List[Tuple[BinaryIO, Path, str]],
+    max_size: Optional[int] = None,
+    on_stored: Optional[Callable[[int, object], None]] = None
+) -> List[object]:
+    """
+    Inspect and write several streams to disk in parallel worker threads
+
+    Args:
+        jobs: List of (source stream, destination path, original filename)
+        max_size: Per-file size limit passed to copy_stream
+        on_stored: Called on the event loop with (job index, outcome) as each job finishes
+
+    Returns:
+        list: (bytes written, FileInfo, sha256) for each job, or the exception it raised
+    """
+    semaphore = asyncio.Semaphore(settings.bulk_upload_concurrency)
+
+    async def run(index: int, source: BinaryIO, file_path: Path, filename: str):
+        async with semaphore:
+            try:
+                outcome = await asyncio.to_thread(store_stream, source, file_path, filename, max_size)
+            except Exception as e:
+                outcome = e
+        if on_stored is not None:
+            on_stored(index, outcome)
+        return outcome
+
+    return await asyncio.gather(
+        *(run(index, source, file_path, filename) for index, (source, file_path, filename) in enumerate(jobs))
+    )
+
+def iter_zip_entries(archive: zipfile.ZipFile) -> Iterator[zipfile.ZipInfo]:
+    """Yield file entries of an archive, skipping directories and OS metadata"""
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = os.path.basename(info.filename)
+        if not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+            continue
+        yield info
+
+class ExtractionBudget:
+    """
+    Running total of bytes decompressed from one archive, shared by its entries
+
+    Charged from the worker threads extracting entries; every charge after the
+    total passes max_bytes raises, so all entries of a ZIP bomb stop early.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def charge(self, size: int):
+        with self._lock:
+            self.used += size
+            if self.used > self.max_bytes:
+                raise ArchiveTooLargeError(f"Archive expands beyond {self.max_bytes} bytes")
+
+class _MeteredStream:
+    """Archive entry stream that charges an ExtractionBudget for each new byte read"""
+
+    def __init__(self, source: BinaryIO, budget: ExtractionBudget):
+        self._source = source
+        self._budget = budget
+        self._charged = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._source.read(size)
+        # Rewinding and re-reading (content sniffing) is only charged once
+        position = self._source.tell()
+        if position > self._charged:
+            self._budget.charge(position - self._charged)
+            self._charged = position
+        return chunk
+
+    def __getattr__(self, name):
+        return getattr(self._source, name)
+
+async def save_zip_entries(
+    archive: zipfile.ZipFile,
+    entries: List[zipfile.ZipInfo],
+    subfolder: str,
+    on_stored: Optional[Callable[[int, object], None]] = None
+) -> List[Tuple[zipfile.ZipInfo, object, Path, str]]:
+    """
+    Extract archive entries straight to the upload folder
+
+    Entries are decompressed chunk by chunk in worker threads, so the archive
+    is never loaded into memory as a whole. Besides the per-file upload limit,
+    the bytes decompressed across all entries are capped at
+    max_archive_extracted_size; once it is reached every remaining entry fails
+    with ArchiveTooLargeError. on_stored is called on the event loop with
+    (entry index, outcome) as each entry finishes.
+
+    Returns:
+        list: (entry, (bytes written, FileInfo, sha256) or exception, file_path, unique_filename)
+    """
+    semaphore = asyncio.Semaphore(settings.bulk_upload_concurrency)
+    budget = ExtractionBudget(settings.max_archive_extracted_size)
+
+    async def run(index: int, info: zipfile.ZipInfo):
+        file_path, unique_filename = build_upload_path(info.filename, subfolder)
+        async with semaphore:
+            try:
+                written = await asyncio.to_thread(_extract_zip_entry, archive, info, file_path, budget)
+            except Exception as e:
+                written = e
+        if on_stored is not None:
+            on_stored(index, written)
+        return info, written, file_path, unique_filename
+
+    return await asyncio.gather(*(run(index, info) for index, info in enumerate(entries)))
+
+def _extract_zip_entry(
+    archive: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    file_path: Path,
+    budget: ExtractionBudget
+) -> Tuple[int, FileInfo, str]:
+    """Stream a single archive entry to disk, enforcing the upload size and archive budget"""
+    with archive.open(info) as source:
+        return store_stream(_MeteredStream(source, budget), file_path, info.filename, settings.max_upload_size)
+
 def delete_file(file_path: str) -> bool:
     """Delete file from disk"""
     try:
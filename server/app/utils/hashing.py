@@ -0,0 +1,56 @@
+"""
+Content Hashing Utilities
+"""
+import hashlib
+import os
+from functools import lru_cache
+from typing import BinaryIO, Optional, Tuple
+
+from app.utils.file_handler import FileTooLargeError
+
+# Chunk size used when hashing files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def sha256_bytes(data: bytes) -> str:
+    """SHA-256 hex digest of a byte string"""
+    return hashlib.sha256(data).hexdigest()
+
+def sha256_text(text: str) -> str:
+    """SHA-256 hex digest of a UTF-8 string"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def sha256_stream(stream: BinaryIO, max_size: Optional[int] = None) -> Tuple[str, int]:
+    """
+    SHA-256 hex digest of a binary stream, read in chunks
+
+    Raises FileTooLargeError as soon as more than max_size bytes are read.
+
+    Returns:
+        tuple: (hex digest, bytes read)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise FileTooLargeError(f"File exceeds {max_size} bytes")
+        hasher.update(chunk)
+    return hasher.hexdigest(), size
+
+def sha256_file(file_path: str) -> str:
+    """
+    SHA-256 hex digest of a file, streamed in chunks
+
+    Digests are memoized by path, size and modification time, so repeated
+    lookups of an unchanged file do not re-read it.
+    """
+    stat = os.stat(file_path)
+    return _sha256_file_cached(str(file_path), stat.st_size, stat.st_mtime_ns)
+
+@lru_cache(maxsize=4096)
+def _sha256_file_cached(file_path: str, size: int, mtime_ns: int) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
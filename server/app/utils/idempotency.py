@@ -0,0 +1,106 @@
+"""
+Idempotency-Key Utilities
+"""
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import IdempotencyRecord
+from app.utils.hashing import sha256_text
+
+def request_fingerprint(*parts: str) -> str:
+    """Hash the parts of a request that must match when a key is reused"""
+    return sha256_text("\x1f".join(parts))
+
+def find_idempotent_result(
+    db: Session,
+    user_id: int,
+    endpoint: str,
+    key: Optional[str],
+    fingerprint: str
+) -> Optional[int]:
+    """
+    Look up the resource created by an earlier request with the same key
+
+    Returns:
+        int: ID of the resource created by the original request, or None
+
+    Raises:
+        HTTPException: If the key was used for a different request
+    """
+    if not key:
+        return None
+
+    record = db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.endpoint == endpoint,
+        IdempotencyRecord.key == key
+    ).first()
+
+    if record is None:
+        return None
+
+    if record.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency-Key was already used with a different request"
+        )
+
+    return record.resource_id
+
+def _find_record(db: Session, user_id: int, endpoint: str, key: str) -> Optional[IdempotencyRecord]:
+    return db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.endpoint == endpoint,
+        IdempotencyRecord.key == key
+    ).first()
+
+def remember_idempotent_result(
+    db: Session,
+    user_id: int,
+    endpoint: str,
+    key: Optional[str],
+    fingerprint: str,
+    resource_id: int,
+    replaces: Optional[int] = None
+) -> Optional[int]:
+    """
+    Record the resource created for a key; committed with the caller's transaction
+
+    Args:
+        replaces: Resource the key pointed at that no longer exists; the
+            record is repointed at the new resource
+
+    Returns:
+        int: Resource recorded for the key by a concurrent request that got
+            there first. The caller should roll back, discard what it created
+            and return that resource instead. None once this result is recorded.
+    """
+    if not key:
+        return None
+
+    record = _find_record(db, user_id, endpoint, key)
+    if record is not None:
+        if replaces is None or record.resource_id != replaces:
+            return record.resource_id
+        record.resource_id = resource_id
+        db.flush()
+        return None
+
+    try:
+        with db.begin_nested():
+            db.add(IdempotencyRecord(
+                user_id=user_id,
+                endpoint=endpoint,
+                key=key,
+                request_hash=fingerprint,
+                resource_id=resource_id
+            ))
+    except IntegrityError:
+        # Another request with the same key committed first
+        record = _find_record(db, user_id, endpoint, key)
+        if record is None:
+            raise
+        return record.resource_id
+    return None
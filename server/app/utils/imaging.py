@@ -0,0 +1,118 @@
+"""
+Guarded Image Decoding Utilities
+"""
+import asyncio
+import io
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple, Union
+
+from PIL import Image
+
+from app.config import get_settings
+from app.utils import metrics
+
+settings = get_settings()
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image's declared dimensions exceed the configured limit"""
+    pass
+
+def check_pixel_limit(width: int, height: int, max_pixels: Optional[int] = None):
+    """Reject dimensions above the pixel limit (decompression bomb guard)"""
+    limit = settings.max_image_pixels if max_pixels is None else max_pixels
+    if width * height > limit:
+        metrics.increment("imaging.rejected_too_large")
+        raise ImageTooLargeError(f"Image of {width}x{height} pixels exceeds the limit of {limit} pixels")
+
+def open_image(
+    source: Union[str, bytes, io.BytesIO],
+    max_pixels: Optional[int] = None,
+    draft_size: Optional[Tuple[int, int]] = None
+) -> Image.Image:
+    """
+    Open an image, checking its header dimensions before any pixels are decoded
+
+    Args:
+        source: File path, raw bytes or binary stream
+        max_pixels: Pixel limit (defaults to settings.max_image_pixels)
+        draft_size: For JPEGs, decode at the smallest DCT scale that still
+            covers this size instead of full resolution
+
+    Raises:
+        ImageTooLargeError: If the declared size exceeds the limit
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    # Image.open only reads the header; pixel data is decoded on load()
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as e:
+        metrics.increment("imaging.rejected_too_large")
+        raise ImageTooLargeError(str(e))
+    check_pixel_limit(image.width, image.height, max_pixels)
+
+    if draft_size and image.format == "JPEG":
+        image.draft(image.mode, draft_size)
+
+    return image
+
+def inspect_image_header(data: bytes, max_pixels: Optional[int] = None) -> Tuple[str, Tuple[int, int]]:
+    """
+    Validate image bytes from the header alone
+
+    Returns:
+        tuple: (format, (width, height))
+    """
+    image = open_image(data, max_pixels)
+    return image.format, image.size
+
+def decoded_size(image_path: str) -> int:
+    """Estimate the bytes a full decode of an image will hold, from its header"""
+    with open_image(image_path) as image:
+        return image.width * image.height * max(len(image.getbands()), 3)
+
+class MemoryBudget:
+    """
+    Cap the decoded pixel memory held by concurrent renders in this worker
+
+    Renders reserve their estimated size before decoding and wait while the
+    budget is exhausted. A reservation larger than the whole budget is
+    admitted once nothing else is running.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.waiting = 0
+        self._condition = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        nbytes = min(nbytes, self.max_bytes)
+        condition = self._get_condition()
+        async with condition:
+            if self.in_use + nbytes > self.max_bytes:
+                metrics.increment("imaging.budget_waits")
+                self.waiting += 1
+                try:
+                    await condition.wait_for(lambda: self.in_use + nbytes <= self.max_bytes)
+                finally:
+                    self.waiting -= 1
+            self.in_use += nbytes
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_use -= nbytes
+                condition.notify_all()
+
+render_memory_budget = MemoryBudget(settings.render_memory_budget_bytes)
+metrics.register_gauge("imaging.budget_bytes_in_use", lambda: render_memory_budget.in_use)
+metrics.register_gauge("imaging.budget_waiting", lambda: render_memory_budget.waiting)
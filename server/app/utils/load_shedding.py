@@ -0,0 +1,127 @@
+"""
+Load Shedding Utilities
+
+Renders, uploads and hashing share the event loop and CPU with every other
+request. When the loop falls behind or render work piles up, heavy requests
+are briefly deferred and then refused with 503, so cheap reads keep
+answering quickly.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import Optional
+
+from app.config import get_settings
+from app.utils import metrics
+from app.utils.imaging import render_memory_budget
+from app.utils.signature_processor import render_flight
+
+settings = get_settings()
+
+# (method, path) of requests that render, hash or bcrypt; everything else is cheap
+HEAVY_ROUTES = [
+    ("POST", re.compile(r"^/api/documents/upload(/bulk|/archive)?/?$")),
+    ("POST", re.compile(r"^/api/signed/apply(-batch|-many)?/?$")),
+    ("GET", re.compile(r"^/api/signed/\d+/download/?$")),
+    ("GET", re.compile(r"^/api/signatures/\d+/image/?$")),
+    ("POST", re.compile(r"^/api/verify/?$")),
+    ("POST", re.compile(r"^/api/verify/signatures/?$")),
+    ("POST", re.compile(r"^/api/auth/register/bulk/?$")),
+]
+
+RETRY_AFTER_SECONDS = 2
+
+def is_heavy(method: str, path: str) -> bool:
+    """Whether a request is CPU or render heavy"""
+    return any(method == heavy_method and pattern.match(path) for heavy_method, pattern in HEAVY_ROUTES)
+
+class LoadMonitor:
+    """
+    Track event-loop lag and the depth of heavy work
+
+    run() sleeps for a fixed interval and measures how late it wakes up;
+    the lag is smoothed with an exponentially weighted moving average.
+    Queue depth counts heavy requests in progress, renders in flight and
+    renders waiting for memory budget.
+    """
+
+    def __init__(self, max_lag_ms: float, max_queue_depth: int, interval: float = 0.1, alpha: float = 0.3):
+        self.max_lag_ms = max_lag_ms
+        self.max_queue_depth = max_queue_depth
+        self.interval = interval
+        self.alpha = alpha
+        self.lag_ms = 0.0
+        self.heavy_in_progress = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self.heavy_in_progress + render_flight.in_flight + render_memory_budget.waiting
+
+    def overloaded(self) -> bool:
+        return self.lag_ms > self.max_lag_ms or self.queue_depth > self.max_queue_depth
+
+    def sample(self, lag_ms: float):
+        self.lag_ms = self.alpha * lag_ms + (1 - self.alpha) * self.lag_ms
+
+    async def run(self):
+        """Measure loop lag until cancelled"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.sample(max(0.0, (time.perf_counter() - start - self.interval) * 1000))
+
+load_monitor = LoadMonitor(settings.load_shed_max_lag_ms, settings.load_shed_max_queue_depth)
+metrics.register_gauge("load.loop_lag_ms", lambda: round(load_monitor.lag_ms, 2))
+metrics.register_gauge("load.queue_depth", lambda: load_monitor.queue_depth)
+
+class LoadSheddingMiddleware:
+    """
+    Defer, then refuse heavy requests while the worker is overloaded
+
+    A heavy request arriving under overload waits up to the defer window for
+    the load to clear; if it does not, it gets 503 with Retry-After. Cheap
+    requests always pass.
+    """
+
+    def __init__(self, app, monitor: Optional[LoadMonitor] = None):
+        self.app = app
+        self.monitor = monitor or load_monitor
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.load_shed_enabled
+            or not is_heavy(scope["method"], scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if self.monitor.overloaded():
+            metrics.increment("load.deferred")
+            deadline = time.monotonic() + settings.load_shed_defer_seconds
+            while self.monitor.overloaded() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            if self.monitor.overloaded():
+                metrics.increment("load.shed")
+                await _send_unavailable(send)
+                return
+
+        self.monitor.heavy_in_progress += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.heavy_in_progress -= 1
+
+async def _send_unavailable(send):
+    body = json.dumps({"detail": "Server is busy, please retry"}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(RETRY_AFTER_SECONDS).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
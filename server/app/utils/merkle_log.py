@@ -0,0 +1,247 @@
+"""
+Append-Only Merkle Log Utilities
+
+Hashes follow RFC 6962 (Certificate Transparency): leaves are
+SHA-256(0x00 || data) and interior nodes SHA-256(0x01 || left || right).
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker deployments only
+    fcntl = None
+
+from app.config import get_settings
+from app.utils import metrics
+
+settings = get_settings()
+
+HASH_SIZE = 32
+
+def leaf_hash(data: bytes) -> bytes:
+    """RFC 6962 leaf hash"""
+    return hashlib.sha256(b"\x00" + data).digest()
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """RFC 6962 interior node hash"""
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+def _split(size: int) -> int:
+    """Largest power of two strictly smaller than size"""
+    return 1 << ((size - 1).bit_length() - 1)
+
+class MerkleLog:
+    """
+    Append-only Merkle tree stored as one flat file per tree level
+
+    level_0 holds the leaf hashes and level_k holds the roots of every
+    complete, aligned subtree of 2**k leaves, each as a fixed 32-byte record.
+    A node is therefore read with a single seek. Appends keep the pending
+    left siblings (the frontier) in memory, so an append only writes the leaf
+    plus the subtrees it completes (two records on average). Tree heads and
+    inclusion proofs read O(log n) records regardless of history.
+
+    Every operation holds an exclusive lock on the directory, so several
+    worker processes may share a log; the frontier is reloaded from the
+    files each time the lock is taken, since another process may have
+    appended in between.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.RLock()
+        self._held = False
+        # Left children still waiting for a right sibling, by level
+        self._frontier = {}
+
+    def _level_path(self, level: int) -> Path:
+        return self.directory / f"level_{level}.bin"
+
+    def _count(self, level: int) -> int:
+        path = self._level_path(level)
+        return path.stat().st_size // HASH_SIZE if path.exists() else 0
+
+    def _read(self, level: int, index: int) -> bytes:
+        with open(self._level_path(level), "rb") as f:
+            f.seek(index * HASH_SIZE)
+            return f.read(HASH_SIZE)
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the log exclusively, across threads and worker processes
+
+        Log operations called inside reuse the lock, so a caller can keep
+        other processes out between reading the log and appending to it.
+        """
+        with self._lock:
+            if self._held:
+                yield
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / "lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._held = True
+                try:
+                    self._open()
+                    yield
+                finally:
+                    self._held = False
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open(self):
+        """Repair the level files after an interrupted append and reload the frontier"""
+        # Drop partially written trailing records
+        levels = 0
+        while self._level_path(levels).exists():
+            path = self._level_path(levels)
+            size = path.stat().st_size
+            if size % HASH_SIZE:
+                os.truncate(path, size - size % HASH_SIZE)
+            levels += 1
+
+        # Rebuild interior nodes whose write was lost, drop any left by an interrupted truncate
+        self._frontier = {}
+        level = 0
+        while self._level_path(level).exists():
+            below = self._count(level)
+            if self._count(level + 1) > below // 2:
+                os.truncate(self._level_path(level + 1), below // 2 * HASH_SIZE)
+            while self._count(level + 1) < below // 2:
+                index = self._count(level + 1)
+                with open(self._level_path(level + 1), "ab") as f:
+                    f.write(node_hash(self._read(level, index * 2), self._read(level, index * 2 + 1)))
+            if below % 2:
+                self._frontier[level] = self._read(level, below - 1)
+            level += 1
+
+    @property
+    def size(self) -> int:
+        """Number of leaves in the log"""
+        with self.locked():
+            return self._count(0)
+
+    def truncate(self, size: int):
+        """
+        Drop leaves from index size on
+
+        Only for leaves that were never part of a published tree head, e.g.
+        appended by a batch whose database commit failed.
+        """
+        with self.locked():
+            if size >= self._count(0):
+                return
+            level = 0
+            while self._level_path(level).exists():
+                os.truncate(self._level_path(level), min(self._count(level), size >> level) * HASH_SIZE)
+                level += 1
+            self._open()
+            metrics.increment("merkle.leaves_truncated")
+
+    def append(self, entries: List[bytes]) -> int:
+        """
+        Append leaf entries
+
+        Returns:
+            int: Leaf index of the first appended entry
+        """
+        with self.locked():
+            first = self._count(0)
+            handles = {}
+            try:
+                for offset, data in enumerate(entries):
+                    index = first + offset
+                    level = 0
+                    value = leaf_hash(data)
+                    self._write(handles, level, value)
+
+                    # Every right child completes a subtree one level up
+                    while index % 2 == 1:
+                        value = node_hash(self._frontier.pop(level), value)
+                        level += 1
+                        index //= 2
+                        self._write(handles, level, value)
+                    self._frontier[level] = value
+            finally:
+                for handle in handles.values():
+                    handle.close()
+
+            metrics.increment("merkle.leaves_appended", len(entries))
+            return first
+
+    def _write(self, handles: dict, level: int, value: bytes):
+        if level not in handles:
+            handles[level] = open(self._level_path(level), "ab")
+        handles[level].write(value)
+
+    def _subtree_hash(self, start: int, size: int) -> bytes:
+        """Hash of leaves [start, start + size)"""
+        if size & (size - 1) == 0 and start % size == 0:
+            return self._read(size.bit_length() - 1, start // size)
+        k = _split(size)
+        return node_hash(self._subtree_hash(start, k), self._subtree_hash(start + k, size - k))
+
+    def root(self, tree_size: int) -> bytes:
+        """Tree head over the first tree_size leaves"""
+        with self.locked():
+            if tree_size == 0:
+                return hashlib.sha256(b"").digest()
+            if tree_size > self._count(0):
+                raise ValueError(f"Tree has only {self._count(0)} leaves")
+            return self._subtree_hash(0, tree_size)
+
+    def inclusion_proof(self, index: int, tree_size: int) -> List[bytes]:
+        """
+        Audit path for a leaf in the tree of the first tree_size leaves
+
+        Returns sibling hashes from the leaf upwards (RFC 6962 PATH).
+        """
+        with self.locked():
+            if not 0 <= index < tree_size <= self._count(0):
+                raise ValueError("Leaf index outside the tree")
+
+            path = []
+            start, size = 0, tree_size
+            while size > 1:
+                k = _split(size)
+                if index - start < k:
+                    path.append(self._subtree_hash(start + k, size - k))
+                    size = k
+                else:
+                    path.append(self._subtree_hash(start, k))
+                    start, size = start + k, size - k
+            path.reverse()
+            return path
+
+def verify_inclusion(leaf: bytes, index: int, tree_size: int, path: List[bytes], root: bytes) -> bool:
+    """Check an inclusion proof against a tree head (RFC 9162, section 2.1.3.2)"""
+    if index >= tree_size:
+        return False
+    fn, sn = index, tree_size - 1
+    result = leaf
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn % 2 == 1 or fn == sn:
+            result = node_hash(sibling, result)
+            while fn % 2 == 0 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            result = node_hash(result, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and result == root
+
+def signed_document_leaf(signed_document_id: int, sha256: str) -> bytes:
+    """Leaf entry binding a signed version to its file hash"""
+    return f"{signed_document_id}:{sha256}".encode("utf-8")
+
+merkle_log = MerkleLog(str(Path(settings.data_dir) / "merkle_log"))
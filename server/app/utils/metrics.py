@@ -0,0 +1,31 @@
+"""
+In-Process Metrics Utilities
+"""
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = defaultdict(int)
+_gauges: Dict[str, Callable[[], float]] = {}
+
+def increment(name: str, value: int = 1):
+    """Increase a named counter"""
+    with _lock:
+        _counters[name] += value
+
+def register_gauge(name: str, read: Callable[[], float]):
+    """Register a callable that reports a current value when metrics are read"""
+    _gauges[name] = read
+
+def snapshot() -> dict:
+    """Return current counter and gauge values"""
+    with _lock:
+        counters = dict(_counters)
+    gauges = {}
+    for name, read in list(_gauges.items()):
+        try:
+            gauges[name] = read()
+        except Exception:
+            gauges[name] = None
+    return {"counters": counters, "gauges": gauges}
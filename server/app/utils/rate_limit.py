@@ -0,0 +1,258 @@
+"""
+Rate Limiting Utilities
+
+Token buckets checked by an ASGI middleware before a request reaches any
+route, so throttled requests never touch the database or bcrypt.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.utils import metrics
+
+settings = get_settings()
+
+# Routes where each attempt can cost a bcrypt hash or mint credentials
+AUTH_ROUTES = {"/api/auth/login", "/api/auth/register", "/api/auth/register/bulk", "/api/auth/refresh"}
+LOGIN_ROUTE = "/api/auth/login"
+# Login bodies are tiny; anything larger is not parsed for a username
+MAX_LOGIN_BODY = 4096
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + (now - updated) * rate)
+
+class MemoryBucketStore:
+    """
+    Token buckets in process memory
+
+    Idle buckets that have refilled completely carry no state, so they are
+    pruned once the store grows past max_buckets.
+    """
+
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        self._buckets: Dict[str, Tuple[float, float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available"""
+        with self._lock:
+            tokens, updated, _, _ = self._buckets.get(key, (burst, now, rate, burst))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now, rate, burst)
+                if len(self._buckets) > self.max_buckets:
+                    self._prune(now)
+                return 0.0
+            self._buckets[key] = (tokens, now, rate, burst)
+            return (1 - tokens) / rate
+
+    def _prune(self, now: float):
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if _refill(bucket[0], bucket[1], now, bucket[2], bucket[3]) < bucket[3]
+        }
+        metrics.increment("rate_limit.prunes")
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+class SqliteBucketStore:
+    """
+    Token buckets in a local SQLite file shared by every worker on the host
+
+    Each take is one short write transaction, so workers see each other's
+    consumption immediately. Meant for a few workers on one machine, not as
+    a cross-host limiter.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take one token; return 0 if allowed, else seconds until one is available"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, burst) if row else burst
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            connection.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def reset(self):
+        self._connection().execute("DELETE FROM buckets")
+
+class RateLimiter:
+    """Named per-minute limits applied to request keys"""
+
+    def __init__(self, store, enabled: bool = True):
+        self.store = store
+        self.enabled = enabled
+        # name -> (tokens per second, burst)
+        self.limits: Dict[str, Tuple[float, float]] = {
+            "ip": (settings.rate_limit_ip_per_minute / 60, settings.rate_limit_ip_burst),
+            "route": (settings.rate_limit_auth_per_minute / 60, settings.rate_limit_auth_per_minute),
+            "username": (settings.rate_limit_login_per_username_per_minute / 60, settings.rate_limit_login_per_username_per_minute),
+        }
+
+    def check(self, keys: List[Tuple[str, str]]) -> float:
+        """
+        Take a token from every (limit name, key) bucket
+
+        Returns:
+            float: 0 if the request may proceed, else seconds to wait
+        """
+        # Wall-clock time so buckets in a shared store agree across workers
+        now = time.time()
+        retry_after = 0.0
+        for name, key in keys:
+            rate, burst = self.limits[name]
+            wait = self.store.take(f"{name}:{key}", rate, burst, now)
+            if wait:
+                metrics.increment(f"rate_limit.rejected.{name}")
+                retry_after = max(retry_after, wait)
+        if not retry_after:
+            metrics.increment("rate_limit.allowed")
+        return retry_after
+
+    def reset(self):
+        self.store.reset()
+
+def _client_ip(scope) -> str:
+    if settings.rate_limit_trust_forwarded_for:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _login_username(body: bytes) -> Optional[str]:
+    try:
+        username = json.loads(body).get("username")
+    except (ValueError, AttributeError):
+        return None
+    return username.lower() if isinstance(username, str) else None
+
+class RateLimitMiddleware:
+    """
+    Reject requests over their limits with 429 and Retry-After
+
+    Every /api request counts against its client IP; authentication routes
+    also count against (route, IP), and logins against the username in the
+    body, which is read here and replayed to the route.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.limiter.enabled
+            or scope["method"] == "OPTIONS"
+            or not scope["path"].startswith("/api/")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"].rstrip("/") or "/"
+        ip = _client_ip(scope)
+        keys = [("ip", ip)]
+        if scope["method"] == "POST" and path in AUTH_ROUTES:
+            keys.append(("route", f"{path}:{ip}"))
+            if path == LOGIN_ROUTE:
+                body, receive = await _buffer_body(receive)
+                username = _login_username(body) if body is not None else None
+                if username:
+                    keys.append(("username", username))
+
+        retry_after = self.limiter.check(keys)
+        if retry_after:
+            await _send_too_many_requests(send, retry_after)
+            return
+        await self.app(scope, receive, send)
+
+async def _buffer_body(receive):
+    """
+    Read a small request body and return it with a receive that replays it
+
+    Returns (None, receive) without consuming more than MAX_LOGIN_BODY bytes
+    if the body is larger.
+    """
+    messages = []
+    body = b""
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        if len(body) > MAX_LOGIN_BODY or not message.get("more_body", False):
+            break
+
+    complete = len(body) <= MAX_LOGIN_BODY
+
+    async def replay():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    return (body if complete else None), replay
+
+async def _send_too_many_requests(send, retry_after: float):
+    body = json.dumps({"detail": "Too many requests"}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+def _make_store():
+    if settings.rate_limit_backend == "sqlite":
+        return SqliteBucketStore(settings.rate_limit_sqlite_path or str(Path(settings.data_dir) / "rate_limits.db"))
+    return MemoryBucketStore()
+
+rate_limiter = RateLimiter(_make_store(), enabled=settings.rate_limit_enabled)
+metrics.register_gauge("rate_limit.buckets", lambda: len(rate_limiter.store))
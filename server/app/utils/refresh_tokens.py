@@ -0,0 +1,112 @@
+"""
+Refresh Token Utilities
+"""
+import hashlib
+import hmac
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import RefreshToken, User
+from app.utils import metrics
+
+settings = get_settings()
+
+class RefreshTokenError(Exception):
+    """Refresh token is unknown, expired, revoked or already used"""
+    pass
+
+def hash_refresh_token(token: str) -> str:
+    """
+    Keyed hash stored instead of the token
+
+    Tokens are 256 random bits, so a single HMAC is enough; there is nothing
+    for a slow password hash to protect and lookups stay one index probe.
+    """
+    return hmac.new(settings.secret_key.encode("utf-8"), token.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def issue_refresh_token(db: Session, user_id: int, family_id: Optional[str] = None) -> str:
+    """
+    Create a refresh token for a user
+
+    Args:
+        db: Database session (the caller commits)
+        user_id: Token owner
+        family_id: Family of the token being rotated; a new login starts a family
+
+    Returns:
+        str: The token, returned to the client only once
+    """
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days)
+    ))
+    metrics.increment("auth.refresh_tokens_issued")
+    return token
+
+def revoke_family(db: Session, family_id: str):
+    """Revoke every token descended from one login"""
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked == False)
+        .values(revoked=True)
+    )
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[User, str]:
+    """
+    Exchange a refresh token for its replacement
+
+    Each token can be used once. Presenting a token that was already
+    rotated means it leaked (or the legitimate client lost a race with an
+    attacker), so its whole family is revoked and both parties must log in
+    again.
+
+    Raises:
+        RefreshTokenError: Token cannot be used
+    """
+    record = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_refresh_token(token)).first()
+    if record is None or record.revoked:
+        raise RefreshTokenError("Invalid refresh token")
+
+    now = datetime.now(timezone.utc)
+    if _as_utc(record.expires_at) <= now:
+        raise RefreshTokenError("Refresh token expired")
+
+    # Conditional update so two concurrent refreshes cannot both succeed
+    claimed = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == record.id, RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+    ).rowcount
+    if not claimed:
+        revoke_family(db, record.family_id)
+        db.commit()
+        metrics.increment("auth.refresh_token_reuse")
+        raise RefreshTokenError("Refresh token already used")
+
+    new_token = issue_refresh_token(db, record.user_id, record.family_id)
+    db.commit()
+    metrics.increment("auth.refresh_tokens_rotated")
+    return record.user, new_token
+
+def revoke_refresh_token(db: Session, token: str, user_id: int):
+    """Revoke the family of a refresh token owned by user_id, if it exists"""
+    record = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(token),
+        RefreshToken.user_id == user_id
+    ).first()
+    if record is not None:
+        revoke_family(db, record.family_id)
+        db.commit()
@@ -0,0 +1,162 @@
+"""
+Render Cache Utilities
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app.config import get_settings
+from app.utils import metrics
+
+settings = get_settings()
+
+class RenderCache:
+    """
+    Disk cache for lazily rendered signed documents
+
+    Files live in a single directory and are evicted least recently used
+    first once their total size exceeds the byte quota. Entries are
+    re-rendered from their recipe when requested after eviction. Pinned
+    entries are being read or served and are skipped by eviction, so the
+    cache can run over quota until they are released.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> size in bytes
+        self._pins = {}  # path -> number of readers still using the file
+        self._discarded = set()  # pinned paths to delete once released
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Index files left on disk by previous runs, oldest access first"""
+        if self._loaded:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = [entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.startswith(".")]
+        for entry in sorted(files, key=lambda e: e.stat().st_atime):
+            size = entry.stat().st_size
+            self._entries[str(Path(entry.path))] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def path_for(self, key: str, file_ext: str) -> str:
+        """Return the cache path for a render key"""
+        return str(self.directory / f"{key}{file_ext}")
+
+    def get(self, path: str, pin: bool = False) -> Optional[str]:
+        """
+        Return the path if it is cached, marking it as recently used
+
+        With pin=True the file is not evicted until release() is called,
+        so it can be read or served after the lock is dropped.
+        """
+        with self._lock:
+            self._load()
+            if path not in self._entries:
+                metrics.increment("render_cache.misses")
+                return None
+            if not os.path.exists(path):
+                self._total_bytes -= self._entries.pop(path)
+                metrics.increment("render_cache.misses")
+                return None
+            self._entries.move_to_end(path)
+            if pin:
+                self._pins[path] = self._pins.get(path, 0) + 1
+            metrics.increment("render_cache.hits")
+            return path
+
+    def put(self, path: str, content: bytes, pin: bool = False) -> str:
+        """
+        Store rendered content at a cache path and enforce the quota
+
+        The file is written outside the lock; renders can be large, so call
+        this from a worker thread. pin works as in get().
+        """
+        with self._lock:
+            self._load()
+        # Write to a temporary name first so readers never see partial files
+        tmp_path = self.directory / f".{uuid.uuid4()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            os.replace(tmp_path, path)
+            if path in self._entries:
+                self._total_bytes -= self._entries.pop(path)
+            self._entries[path] = len(content)
+            self._total_bytes += len(content)
+            if pin:
+                self._pins[path] = self._pins.get(path, 0) + 1
+            self._evict(keep=path)
+            return path
+
+    def release(self, path: str):
+        """Unpin a path returned by get() or put() with pin=True; other paths are ignored"""
+        with self._lock:
+            count = self._pins.get(path)
+            if count is None:
+                return
+            if count > 1:
+                self._pins[path] = count - 1
+                return
+            del self._pins[path]
+            if path in self._discarded:
+                self._discarded.discard(path)
+                self._remove(path)
+            self._evict(keep=None)
+
+    def discard(self, path: str):
+        """Drop a cached render that must not be served again; pinned files go once released"""
+        with self._lock:
+            self._load()
+            if path in self._entries:
+                self._total_bytes -= self._entries.pop(path)
+            if path in self._pins:
+                self._discarded.add(path)
+            else:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self, keep: Optional[str]):
+        """Drop least recently used unpinned files until the cache fits its quota"""
+        for path in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path == keep or path in self._pins:
+                continue
+            self._total_bytes -= self._entries.pop(path)
+            metrics.increment("render_cache.evictions")
+            self._remove(path)
+
+    @property
+    def pinned(self) -> int:
+        with self._lock:
+            return len(self._pins)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+# Renders are served only through authenticated downloads, never from the public uploads tree
+render_cache = RenderCache(
+    str(Path(settings.data_dir) / "render_cache"),
+    settings.render_cache_max_bytes
+)
+metrics.register_gauge("render_cache.bytes", lambda: render_cache.total_bytes)
@@ -0,0 +1,68 @@
+"""
+Render Memoization Utilities
+"""
+import os
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import RenderMemo
+from app.utils import metrics
+
+def find_rendered(
+    db: Session,
+    original_sha256: str,
+    signature_sha256: str,
+    page: int,
+    position_x: int,
+    position_y: int,
+    output_format: str
+) -> Optional[str]:
+    """Return the path of an existing render for identical inputs, if still on disk"""
+    memo = db.query(RenderMemo).filter(
+        RenderMemo.original_sha256 == original_sha256,
+        RenderMemo.signature_sha256 == signature_sha256,
+        RenderMemo.page == page,
+        RenderMemo.position_x == position_x,
+        RenderMemo.position_y == position_y,
+        RenderMemo.output_format == output_format
+    ).first()
+
+    if memo is None:
+        metrics.increment("render_memo.misses")
+        return None
+
+    if not os.path.exists(memo.file_path):
+        # The blob is gone; drop the memo so the next render replaces it
+        db.delete(memo)
+        db.flush()
+        metrics.increment("render_memo.misses")
+        return None
+
+    metrics.increment("render_memo.hits")
+    return memo.file_path
+
+def remember_rendered(
+    db: Session,
+    original_sha256: str,
+    signature_sha256: str,
+    page: int,
+    position_x: int,
+    position_y: int,
+    output_format: str,
+    file_path: str
+):
+    """Record a render; a concurrent insert of the same key is silently ignored"""
+    try:
+        with db.begin_nested():
+            db.add(RenderMemo(
+                original_sha256=original_sha256,
+                signature_sha256=signature_sha256,
+                page=page,
+                position_x=position_x,
+                position_y=position_y,
+                output_format=output_format,
+                file_path=file_path
+            ))
+    except IntegrityError:
+        pass
@@ -1,24 +1,99 @@
 """
 Signature Processing Utilities
 """
+import asyncio
 import base64
 import io
 import os
 from pathlib import Path
-from PIL import Image
+import numpy as np
+from PIL import Image, JpegImagePlugin
 from PyPDF2 import PdfReader, PdfWriter
 # from pdf2image import convert_from_path  # Commented out - requires poppler
 import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from app.config import get_settings
+from app.utils.hashing import sha256_file, sha256_text
+from app.utils import metrics
+from app.utils.imaging import open_image, inspect_image_header, decoded_size, render_memory_budget
+from app.utils.single_flight import SingleFlight
+from app.utils.cancellation import to_thread_cancellable, raise_if_cancelled, discard_outputs
 
 settings = get_settings()
 
+# Coalesces concurrent identical renders
+render_flight = SingleFlight("render")
+
+# Page modes that can be blended region by region and written back unchanged
+REGION_BLEND_MODES = {'RGB', 'RGBA', 'L', 'LA', 'CMYK'}
+
+# Widest a signature is stamped, in page pixels, unless the caller allows more
+STAMP_MAX_WIDTH = 200
+
+class PlacementError(ValueError):
+    """Raised when a signature placement does not fit the document"""
+    pass
+
+def resolve_placement(
+    document,
+    page: int = 1,
+    x: Optional[float] = None,
+    y: Optional[float] = None,
+    position_x: int = 0,
+    position_y: int = 0
+) -> Tuple[int, int, int]:
+    """
+    Resolve a placement to page coordinates using the document's stored geometry
+
+    The file itself is never opened; page sizes recorded at upload are used.
+
+    Args:
+        document: Document row with page_count/page_sizes metadata
+        page: 1-based page number
+        x: Normalized horizontal position (0-1), overrides position_x
+        y: Normalized vertical position (0-1), overrides position_y
+        position_x: Absolute X coordinate (pixels for images, points for PDFs)
+        position_y: Absolute Y coordinate
+
+    Returns:
+        tuple: (page, position_x, position_y)
+
+    Raises:
+        PlacementError: If the page or position is outside the document
+    """
+    page_sizes = document.page_sizes
+    if not page_sizes and document.width and document.height:
+        page_sizes = [[document.width, document.height]]
+
+    # Documents uploaded before geometry was recorded cannot be checked
+    if not page_sizes:
+        if page != 1 or x is not None or y is not None:
+            raise PlacementError("Document has no page geometry; use pixel coordinates on page 1")
+        return page, position_x, position_y
+
+    if page > len(page_sizes):
+        raise PlacementError(f"Page {page} out of range (document has {len(page_sizes)} pages)")
+
+    width, height = page_sizes[page - 1]
+    if x is not None:
+        position_x = int(x * width)
+    if y is not None:
+        position_y = int(y * height)
+
+    if not (0 <= position_x < width and 0 <= position_y < height):
+        raise PlacementError(f"Position ({position_x}, {position_y}) is outside page {page} ({width}x{height})")
+
+    return page, position_x, position_y
+
 async def apply_signature_to_document(
     document_path: str,
     signature_data: str,
     position_x: int,
-    position_y: int
+    position_y: int,
+    max_width: int = STAMP_MAX_WIDTH
 ) -> str:
     """
     Apply signature to document
@@ -28,75 +103,475 @@ async def apply_signature_to_document(
         signature_data: Base64 encoded signature image
         position_x: X coordinate for signature placement
         position_y: Y coordinate for signature placement
+        max_width: Widest the signature is stamped, in page pixels
+
+    Returns:
+        str: Path to signed document
+    """
+    return await apply_signatures_to_document(
+        document_path, [(signature_data, position_x, position_y)], {signature_data: max_width}
+    )
+
+async def apply_signatures_to_document(
+    document_path: str,
+    placements: List[Tuple[str, int, int]],
+    max_widths: Optional[Dict[str, int]] = None
+) -> str:
+    """
+    Apply several signatures to a document in a single render
+
+    Args:
+        document_path: Path to original document
+        placements: List of (base64 signature image, position_x, position_y)
+        max_widths: Stamp width limit per signature image (default STAMP_MAX_WIDTH)
 
     Returns:
         str: Path to signed document
     """
     file_ext = os.path.splitext(document_path)[1].lower()
 
+    # Identical concurrent applies share one render and its output file
+    key = render_key("apply", document_path, placements, max_widths)
+
     if file_ext == '.pdf':
-        return await apply_signature_to_pdf(document_path, signature_data, position_x, position_y)
+        return await render_flight.do(key, lambda: apply_signatures_to_pdf(document_path, placements))
     elif file_ext in ['.png', '.jpg', '.jpeg']:
-        return await apply_signature_to_image(document_path, signature_data, position_x, position_y)
+        return await render_flight.do(key, lambda: apply_signatures_to_image(document_path, placements, max_widths))
     else:
         raise ValueError(f"Unsupported file type: {file_ext}")
 
-async def apply_signature_to_image(
-    image_path: str,
-    signature_data: str,
-    position_x: int,
-    position_y: int
-) -> str:
-    """Apply signature to image document"""
+def render_key(
+    kind: str,
+    document_path: str,
+    placements: List[Tuple[str, int, int]],
+    max_widths: Optional[Dict[str, int]] = None
+) -> tuple:
+    """Content-addressed key for a render: document hash, signature hashes, stamp widths and placements"""
+    max_widths = max_widths or {}
+    return (
+        kind,
+        sha256_file(document_path),
+        tuple(
+            (sha256_text(signature_data), max_widths.get(signature_data, STAMP_MAX_WIDTH), x, y)
+            for signature_data, x, y in placements
+        )
+    )
 
-    # Decode base64 signature
+def decode_signature_image(signature_data: str, max_width: int = STAMP_MAX_WIDTH) -> Image.Image:
+    """Decode a base64 signature into an RGBA image scaled to the stamp width"""
     signature_bytes = base64.b64decode(signature_data.split(',')[1] if ',' in signature_data else signature_data)
-    signature_image = Image.open(io.BytesIO(signature_bytes))
 
-    # Open original image
-    original_image = Image.open(image_path)
-
-    # Convert to RGBA if needed
-    if original_image.mode != 'RGBA':
-        original_image = original_image.convert('RGBA')
+    # Resize signature if wider than max_width; JPEGs are decoded at a reduced scale
+    signature_image = open_image(signature_bytes, settings.max_signature_pixels, draft_size=(max_width, 1))
 
     if signature_image.mode != 'RGBA':
         signature_image = signature_image.convert('RGBA')
 
-    # Resize signature if needed (max 200px width)
-    max_width = 200
     if signature_image.width > max_width:
         ratio = max_width / signature_image.width
         new_height = int(signature_image.height * ratio)
         signature_image = signature_image.resize((max_width, new_height), Image.Resampling.LANCZOS)
 
-    # Paste signature onto image
-    original_image.paste(signature_image, (position_x, position_y), signature_image)
+    return signature_image
+
+async def apply_signature_to_image(
+    image_path: str,
+    signature_data: str,
+    position_x: int,
+    position_y: int
+) -> str:
+    """Apply signature to image document"""
+    return await apply_signatures_to_image(image_path, [(signature_data, position_x, position_y)])
+
+async def apply_signatures_to_image(
+    image_path: str,
+    placements: List[Tuple[str, int, int]],
+    max_widths: Optional[Dict[str, int]] = None
+) -> str:
+    """
+    Apply signatures to an image document
+
+    The page is decoded once, every signature is composited onto it and a
+    single output file is encoded. Identical signature data is only decoded
+    once. The work runs in a worker thread.
+    """
+    return await _run_render(image_path, _apply_signatures_to_image, image_path, placements, max_widths)
+
+async def _run_render(image_path: str, render, *args):
+    """
+    Run a blocking image render in a worker thread within the memory budget
+
+    Cancelling the caller abandons the render: while queued for budget it
+    never starts, and once running any file it writes is deleted.
+    """
+    async with render_memory_budget.reserve(decoded_size(image_path)):
+        return await to_thread_cancellable(render, *args, discard=discard_outputs)
+
+def _apply_signatures_to_image(
+    image_path: str,
+    placements: List[Tuple[str, int, int]],
+    max_widths: Optional[Dict[str, int]] = None
+) -> str:
+    stamps = _decode_stamps(placements, max_widths)
+    raise_if_cancelled()
+    signed_image = composite_stamps(image_path, stamps)
+    raise_if_cancelled()
 
     # Save signed image
+    signed_path = new_signed_path(os.path.splitext(image_path)[1])
+    signed_image.save(signed_path, **encoder_settings(signed_image))
+
+    return str(signed_path)
+
+def _decode_stamps(
+    placements: List[Tuple[str, int, int]],
+    max_widths: Optional[Dict[str, int]] = None
+) -> List[Tuple[Image.Image, int, int]]:
+    """Decode placement signatures, decoding repeated signature data only once"""
+    max_widths = max_widths or {}
+    signature_images = {}
+    for signature_data, _, _ in placements:
+        if signature_data not in signature_images:
+            signature_images[signature_data] = decode_signature_image(
+                signature_data, max_widths.get(signature_data, STAMP_MAX_WIDTH)
+            )
+    return [(signature_images[signature_data], x, y) for signature_data, x, y in placements]
+
+def new_signed_path(file_ext: str, prefix: str = "signed") -> Path:
+    """Reserve a unique path under the signed documents folder"""
     signed_dir = Path(settings.upload_dir) / "signed_documents"
     signed_dir.mkdir(parents=True, exist_ok=True)
+    return signed_dir / f"{prefix}_{uuid.uuid4()}{file_ext}"
 
-    file_ext = os.path.splitext(image_path)[1]
-    signed_filename = f"signed_{uuid.uuid4()}{file_ext}"
-    signed_path = signed_dir / signed_filename
+def composite_stamps(image_path: str, stamps: List[Tuple[Image.Image, int, int]]) -> Image.Image:
+    """
+    Paste RGBA stamps onto an image in one pass
 
-    # Convert back to RGB for JPEG
-    if file_ext.lower() in ['.jpg', '.jpeg']:
-        original_image = original_image.convert('RGB')
+    Only the pixels under each stamp are converted and blended; the rest of
+    the page keeps its original mode, so JPEG and PNG sources can be
+    re-encoded with their original settings.
 
-    original_image.save(signed_path)
+    Args:
+        image_path: Path to the page image
+        stamps: List of (RGBA image, position_x, position_y)
 
-    return str(signed_path)
+    Returns:
+        Image: Composited page
+    """
+    # Open original image (dimensions are checked before decoding)
+    original_image = open_image(image_path)
+    original_image.load()
+
+    # Palette and high bit depth pages cannot be blended region by region
+    if original_image.mode not in REGION_BLEND_MODES:
+        original_image = original_image.convert('RGBA')
+
+    for stamp, position_x, position_y in stamps:
+        blend_region(original_image, stamp, position_x, position_y)
+
+    return original_image
+
+def _stamp_layers(stamp: Image.Image, mode: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split an RGBA stamp into premultiplied colour and inverse alpha for a page mode
+
+    Only the stamp's colour is converted to the page's mode; the page itself
+    is blended in its own channels, so pixels under fully transparent parts
+    of the stamp keep their exact values. Alpha channels of RGBA and LA pages
+    are blended like any other channel.
+    """
+    alpha = np.asarray(stamp.getchannel('A'), dtype=np.float32)[..., np.newaxis] / 255.0
+    colour = stamp.convert(mode) if mode in ('RGBA', 'LA') else stamp.convert('RGB').convert(mode)
+    colour = np.asarray(colour, dtype=np.float32).reshape(stamp.height, stamp.width, -1)
+    return colour * alpha, 1.0 - alpha
+
+def _blend_layers(region: Image.Image, premultiplied: np.ndarray, inverse_alpha: np.ndarray) -> Image.Image:
+    """Blend stamp layers from _stamp_layers over a page region of the same size"""
+    base = np.asarray(region, dtype=np.float32).reshape(premultiplied.shape)
+    blended = np.rint(premultiplied + base * inverse_alpha).astype(np.uint8)
+    if blended.shape[2] == 1:
+        blended = blended[..., 0]
+    return Image.fromarray(blended, region.mode)
+
+def blend_region(image: Image.Image, stamp: Image.Image, position_x: int, position_y: int):
+    """
+    Alpha blend an RGBA stamp into the matching region of an image in place
+
+    Matches Image.paste(stamp, position, stamp) in the page's own mode: every
+    channel, including alpha, is blended with the stamp's alpha as weight.
+    """
+    # Clip the stamp's bounding box to the page
+    left, top = max(position_x, 0), max(position_y, 0)
+    right = min(position_x + stamp.width, image.width)
+    bottom = min(position_y + stamp.height, image.height)
+    if left >= right or top >= bottom:
+        return
+
+    box = (left, top, right, bottom)
+    overlay = stamp.crop((left - position_x, top - position_y, right - position_x, bottom - position_y))
+    premultiplied, inverse_alpha = _stamp_layers(overlay, image.mode)
+
+    image.paste(_blend_layers(image.crop(box), premultiplied, inverse_alpha), box)
+
+class BatchStamper:
+    """
+    Stamp one signature at one position onto many page images
+
+    The signature is decoded once and turned into premultiplied colour and
+    inverse alpha arrays, once per page mode and clipped once per page size,
+    so each page costs a single vectorized multiply-add over the stamp's
+    footprint. Output pixels match blend_region exactly.
+
+    Pages are processed by a pool of worker threads, each running decode,
+    blend and encode for one page. Pillow and NumPy release the GIL, so the
+    stages of consecutive pages overlap.
+    """
+
+    def __init__(
+        self,
+        signature_data: str,
+        position_x: int,
+        position_y: int,
+        workers: Optional[int] = None,
+        max_width: int = STAMP_MAX_WIDTH
+    ):
+        self.signature = decode_signature_image(signature_data, max_width)
+        self.position_x = position_x
+        self.position_y = position_y
+        self.workers = workers or settings.batch_stamp_workers
+        self._layers = {}
+        self._masks = {}
+
+    def _mask_for(self, size: Tuple[int, int], mode: str) -> tuple:
+        """Return (box, premultiplied, inverse alpha) for a page mode, clipped to a page size"""
+        mask = self._masks.get((size, mode))
+        if mask is None:
+            layers = self._layers.get(mode)
+            if layers is None:
+                layers = self._layers[mode] = _stamp_layers(self.signature, mode)
+            premultiplied, inverse_alpha = layers
+
+            width, height = size
+            stamp_height, stamp_width = premultiplied.shape[:2]
+            left, top = max(self.position_x, 0), max(self.position_y, 0)
+            right = min(self.position_x + stamp_width, width)
+            bottom = min(self.position_y + stamp_height, height)
+
+            if left >= right or top >= bottom:
+                mask = (None, None, None)
+            else:
+                rows = slice(top - self.position_y, bottom - self.position_y)
+                cols = slice(left - self.position_x, right - self.position_x)
+                mask = ((left, top, right, bottom), premultiplied[rows, cols], inverse_alpha[rows, cols])
+
+            self._masks[(size, mode)] = mask
+        return mask
+
+    def stamp(self, image: Image.Image) -> Image.Image:
+        """Blend the signature into a decoded page in place"""
+        box, premultiplied, inverse_alpha = self._mask_for(image.size, image.mode)
+        if box is None:
+            return image
+
+        image.paste(_blend_layers(image.crop(box), premultiplied, inverse_alpha), box)
+        return image
+
+    def stamp_file(self, image_path: str) -> str:
+        """Decode, stamp and encode one page; returns the signed file path"""
+        raise_if_cancelled()
+        image = open_image(image_path)
+        image.load()
+        if image.mode not in REGION_BLEND_MODES:
+            image = image.convert('RGBA')
+
+        self.stamp(image)
+
+        signed_path = new_signed_path(os.path.splitext(image_path)[1])
+        image.save(signed_path, **encoder_settings(image))
+        return str(signed_path)
+
+    def stamp_files(self, image_paths: Iterable[str]) -> Iterator[Union[str, Exception]]:
+        """
+        Stamp a stream of pages across the worker pool
+
+        Results are yielded in input order: the signed path, or the exception
+        raised for that page. At most two pages per worker are in flight.
+        """
+        window = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stamp") as executor:
+            pending = []
+            for image_path in image_paths:
+                # Each page runs in a copy of the caller's context, so it sees cancellation
+                pending.append(executor.submit(contextvars.copy_context().run, self.stamp_file, image_path))
+                if len(pending) >= window:
+                    yield self._result(pending.pop(0))
+            for future in pending:
+                yield self._result(future)
+
+    @staticmethod
+    def _result(future) -> Union[str, Exception]:
+        try:
+            result = future.result()
+        except Exception as e:
+            metrics.increment("render.batch_pages_failed")
+            return e
+        metrics.increment("render.batch_pages")
+        return result
+
+async def stamp_images(
+    image_paths: List[str],
+    signature_data: str,
+    position_x: int,
+    position_y: int,
+    on_page: Optional[Callable[[Union[str, Exception]], None]] = None,
+    max_width: int = STAMP_MAX_WIDTH
+) -> List[Union[str, Exception]]:
+    """
+    Apply one signature at one position to many image documents
+
+    The batch reserves room in the render memory budget for one decoded page
+    per worker and runs the stamping pipeline off the event loop. on_page is
+    called from the worker thread with each page's result as it completes.
+
+    Returns:
+        list: Signed path or exception per input, in input order
+    """
+    if not image_paths:
+        return []
+
+    stamper = BatchStamper(signature_data, position_x, position_y, max_width=max_width)
+    page_bytes = max(decoded_size(image_path) for image_path in image_paths)
+    in_flight = min(stamper.workers * 2, len(image_paths))
+
+    def run() -> List[Union[str, Exception]]:
+        results = []
+        for result in stamper.stamp_files(image_paths):
+            results.append(result)
+            if on_page is not None:
+                on_page(result)
+        return results
+
+    async with render_memory_budget.reserve(page_bytes * in_flight):
+        return await to_thread_cancellable(run, discard=discard_outputs)
+
+def encoder_settings(image: Image.Image) -> dict:
+    """Save options that keep the source file's encoding (quality, subsampling, ICC, DPI)"""
+    options = {}
+    for key in ('icc_profile', 'dpi', 'exif'):
+        if image.info.get(key):
+            options[key] = image.info[key]
+
+    # "keep" reuses the source quantization tables and chroma subsampling
+    if isinstance(image, JpegImagePlugin.JpegImageFile):
+        options['quality'] = 'keep'
+        options['subsampling'] = 'keep'
+
+    return options
+
+async def create_signature_overlay(signature_data: str, max_width: int = STAMP_MAX_WIDTH) -> str:
+    """
+    Store a signature as a compressed overlay layer
+
+    Used for incremental signing: instead of re-encoding the whole page, a
+    new version only stores the stamp, which is composited onto its parent
+    version when the file is downloaded.
+
+    Returns:
+        str: Path to the overlay PNG
+    """
+    return await to_thread_cancellable(_create_signature_overlay, signature_data, max_width, discard=discard_outputs)
+
+def _create_signature_overlay(signature_data: str, max_width: int) -> str:
+    image = decode_signature_image(signature_data, max_width)
+    raise_if_cancelled()
+    overlay_path = new_signed_path(".png", prefix="overlay")
+    image.save(overlay_path, optimize=True)
+    return str(overlay_path)
+
+async def render_signature_chain(base_path: str, overlays: List[Tuple[str, int, int]]) -> bytes:
+    """
+    Materialize an incremental version by compositing its overlay chain
+
+    Args:
+        base_path: Path to the nearest fully rendered ancestor
+        overlays: List of (overlay path, position_x, position_y), oldest first
+
+    Returns:
+        bytes: Encoded image in the base file's format
+    """
+    key = (
+        "chain",
+        sha256_file(base_path),
+        tuple((sha256_file(overlay_path), x, y) for overlay_path, x, y in overlays)
+    )
+    return await render_flight.do(key, lambda: _run_render(base_path, _render_signature_chain, base_path, overlays))
+
+def _render_signature_chain(base_path: str, overlays: List[Tuple[str, int, int]]) -> bytes:
+    stamps = []
+    for overlay_path, position_x, position_y in overlays:
+        stamps.append((open_image(overlay_path).convert('RGBA'), position_x, position_y))
+
+    return encode_image(composite_stamps(base_path, stamps), base_path)
+
+async def render_signed_document(
+    document_path: str,
+    placements: List[Tuple[str, int, int]],
+    max_widths: Optional[Dict[str, int]] = None
+) -> bytes:
+    """
+    Render a signed document in memory
+
+    Produces the same bytes as apply_signatures_to_document would write, so
+    lazily materialized versions can be re-rendered deterministically.
+    Concurrent identical renders are coalesced into one.
+    """
+    key = render_key("render", document_path, placements, max_widths)
+
+    if os.path.splitext(document_path)[1].lower() == '.pdf':
+        return await render_flight.do(
+            key, lambda: asyncio.to_thread(_render_signed_document, document_path, placements, max_widths)
+        )
+    return await render_flight.do(
+        key, lambda: _run_render(document_path, _render_signed_document, document_path, placements, max_widths)
+    )
+
+def _render_signed_document(
+    document_path: str,
+    placements: List[Tuple[str, int, int]],
+    max_widths: Optional[Dict[str, int]] = None
+) -> bytes:
+    file_ext = os.path.splitext(document_path)[1].lower()
+
+    if file_ext == '.pdf':
+        with open(document_path, "rb") as f:
+            return f.read()
+    elif file_ext in ['.png', '.jpg', '.jpeg']:
+        return encode_image(composite_stamps(document_path, _decode_stamps(placements, max_widths)), document_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+def encode_image(image: Image.Image, source_path: str) -> bytes:
+    """Encode an image in the format of its source file"""
+    buffer = io.BytesIO()
+    file_ext = os.path.splitext(source_path)[1].lower()
+    image.save(buffer, format="JPEG" if file_ext in ['.jpg', '.jpeg'] else "PNG", **encoder_settings(image))
+    return buffer.getvalue()
 
 async def apply_signature_to_pdf(
     pdf_path: str,
     signature_data: str,
     position_x: int,
     position_y: int
+) -> str:
+    """Apply signature to PDF document"""
+    return await apply_signatures_to_pdf(pdf_path, [(signature_data, position_x, position_y)])
+
+async def apply_signatures_to_pdf(
+    pdf_path: str,
+    placements: List[Tuple[str, int, int]]
 ) -> str:
     """
-    Apply signature to PDF document
+    Apply signatures to PDF document
 
     Note: This is a simplified implementation for hackathon.
     For production, use reportlab or pdf-lib for proper PDF manipulation.
@@ -105,23 +580,19 @@ async def apply_signature_to_pdf(
     # For hackathon prototype: Skip complex PDF processing
     # Just copy the original PDF and mark it as signed
     
-    signed_dir = Path(settings.upload_dir) / "signed_documents"
-    signed_dir.mkdir(parents=True, exist_ok=True)
-    
-    signed_filename = f"signed_{uuid.uuid4()}.pdf"
-    signed_path = signed_dir / signed_filename
+    signed_path = new_signed_path(".pdf")
     
     # For hackathon: just copy the file
     # In production, use proper PDF manipulation library like PyMuPDF or reportlab
     import shutil
-    shutil.copy(pdf_path, signed_path)
+    await to_thread_cancellable(shutil.copy, pdf_path, str(signed_path), discard=discard_outputs)
     
     print(f"PDF signing: Using fallback method (copying file). Original: {pdf_path}, Signed: {signed_path}")
     
     return str(signed_path)
 
 def validate_signature_data(signature_data: str) -> bool:
-    """Validate base64 signature data"""
+    """Validate base64 signature data from the image header, without decoding pixels"""
     try:
         # Remove data URL prefix if present
         if ',' in signature_data:
@@ -130,8 +601,8 @@ def validate_signature_data(signature_data: str) -> bool:
         # Try to decode
         decoded = base64.b64decode(signature_data)
         
-        # Try to open as image
-        Image.open(io.BytesIO(decoded))
+        # Check format and dimensions from the header
+        inspect_image_header(decoded, settings.max_signature_pixels)
         
         return True
     except Exception:
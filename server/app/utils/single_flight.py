@@ -0,0 +1,63 @@
+"""
+Request Coalescing Utilities
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.utils import metrics
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Share one in-flight computation between concurrent callers with the same key
+
+    The first caller for a key starts the work as a separate task; callers
+    arriving while it runs await the same task instead of repeating it. The
+    task is shielded, so a caller that goes away does not cancel the work for
+    the others; only when the last caller has gone is the work cancelled.
+    Once the task finishes the key is released.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        metrics.register_gauge(f"{name}.in_flight", lambda: len(self._in_flight))
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() for key unless an identical call is already running"""
+        metrics.increment(f"{self.name}.requests")
+        task = self._in_flight.get(key)
+
+        if task is None:
+            metrics.increment(f"{self.name}.executions")
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+        else:
+            metrics.increment(f"{self.name}.coalesced")
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+                metrics.increment(f"{self.name}.abandoned")
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
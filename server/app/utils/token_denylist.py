@@ -0,0 +1,185 @@
+"""
+Access Token Denylist Utilities
+"""
+import hashlib
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker deployments only
+    fcntl = None
+
+from app.config import get_settings
+from app.utils import metrics
+
+settings = get_settings()
+
+# Record: 16-byte token id digest + 8-byte expiry (unix seconds)
+RECORD = struct.Struct(">16sQ")
+
+def _token_key(jti: str) -> bytes:
+    return hashlib.blake2b(jti.encode("utf-8"), digest_size=16).digest()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte keys"""
+
+    def __init__(self, size_bits: int, hash_count: int = 7):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, key: bytes):
+        # Keys are already uniform digests; split one into two hashes (double hashing)
+        h1, h2 = struct.unpack(">QQ", key)
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, key: bytes):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class TokenDenylist:
+    """
+    Revoked token ids until their tokens expire
+
+    Lookups are served from memory, behind an optional Bloom filter so the
+    common "not revoked" answer is a few bit tests. Revocations are appended
+    to a compact file of fixed 24-byte records. Every worker on the host
+    tails that file, checking it at most once per sync interval, so a
+    logout in one worker reaches the others within that interval. Expired
+    records are dropped by rewriting the file once they dominate it.
+    """
+
+    def __init__(self, path: str, use_bloom: bool = True, sync_interval: float = 1.0, bloom_bits: int = 8 * 1024 * 1024):
+        self.path = Path(path)
+        self.use_bloom = use_bloom
+        self.sync_interval = sync_interval
+        self.bloom_bits = bloom_bits
+        self._entries: Dict[bytes, int] = {}
+        self._bloom: Optional[BloomFilter] = None
+        self._file_id = None
+        self._offset = 0
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._entries = {}
+        self._bloom = BloomFilter(self.bloom_bits) if self.use_bloom else None
+        self._offset = 0
+
+    def _remember(self, key: bytes, expires_at: int):
+        self._entries[key] = max(expires_at, self._entries.get(key, 0))
+        if self._bloom is not None:
+            self._bloom.add(key)
+
+    def _sync(self):
+        """Read records appended by any worker since the last sync"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self._reset()
+                self._file_id = None
+            return
+
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            # First load, or the file was compacted by another worker
+            self._reset()
+            self._file_id = file_id
+
+        if stat.st_size - self._offset >= RECORD.size:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read((stat.st_size - self._offset) // RECORD.size * RECORD.size)
+            for key, expires_at in RECORD.iter_unpack(data):
+                self._remember(key, expires_at)
+            self._offset += len(data)
+            metrics.increment("auth.denylist_syncs")
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if now >= self._next_sync:
+            with self._lock:
+                self._sync()
+                self._next_sync = now + self.sync_interval
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Check a token id; no database access"""
+        if not jti:
+            return False
+        self._maybe_sync()
+        key = _token_key(jti)
+        if self._bloom is not None and key not in self._bloom:
+            return False
+        expires_at = self._entries.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    @contextmanager
+    def _writer_lock(self):
+        """Serialize appends and compaction across worker processes"""
+        if fcntl is None:
+            yield
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(f"{self.path.name}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def revoke(self, jti: str, expires_at: int):
+        """Deny a token id until its expiry, here and in other workers"""
+        key = _token_key(jti)
+        with self._lock, self._writer_lock():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, RECORD.pack(key, int(expires_at)))
+            finally:
+                os.close(fd)
+            self._sync()
+            self._compact_if_needed()
+        metrics.increment("auth.tokens_revoked")
+
+    def _compact_if_needed(self):
+        """Rewrite the file without expired records once they are the majority"""
+        total = self._offset // RECORD.size
+        # Counting live records is O(n), so only look every 1024 appends
+        if total < 1024 or total % 1024:
+            return
+        now = time.time()
+        live = {key: expires_at for key, expires_at in self._entries.items() if expires_at > now}
+        if len(live) * 2 > total:
+            return
+
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(RECORD.pack(key, expires_at) for key, expires_at in live.items()))
+        os.replace(temp_path, self.path)
+
+        # Reload from the new file so offsets and the Bloom filter match it
+        self._file_id = None
+        self._sync()
+        metrics.increment("auth.denylist_compactions")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+token_denylist = TokenDenylist(
+    str(Path(settings.data_dir) / "token_denylist.bin"),
+    use_bloom=settings.token_denylist_bloom,
+    sync_interval=settings.token_denylist_sync_seconds
+)
+metrics.register_gauge("auth.denylist_entries", lambda: len(token_denylist))
@@ -0,0 +1,141 @@
+"""
+Typed Signature Rendering Utilities
+"""
+import base64
+import io
+import math
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.config import get_settings
+from app.utils.imaging import inspect_image_header
+from app.utils.signature_processor import STAMP_MAX_WIDTH
+
+settings = get_settings()
+
+DEFAULT_FONT = "default"
+INK_COLOR = (20, 20, 80, 255)
+
+# Resolution typed_signature_font_size is meant for; denser pages get larger glyphs
+BASE_DPI = 72
+
+# Largest font size whose renders are kept in the LRU cache; larger ones are one-off stamps
+MAX_CACHED_SIZE = 512
+
+class TypedSignatureError(ValueError):
+    """Raised when a typed signature cannot be rendered"""
+    pass
+
+def available_fonts() -> List[str]:
+    """Font names accepted for typed signatures: the built-in font plus fonts_dir"""
+    fonts_dir = Path(settings.fonts_dir)
+    names = [DEFAULT_FONT]
+    if fonts_dir.is_dir():
+        names += sorted(path.stem for path in fonts_dir.iterdir() if path.suffix.lower() in (".ttf", ".otf"))
+    return names
+
+def _font_path(font_name: str) -> Optional[Path]:
+    for suffix in (".ttf", ".otf"):
+        path = Path(settings.fonts_dir) / f"{font_name}{suffix}"
+        if path.is_file():
+            return path
+    return None
+
+@lru_cache(maxsize=64)
+def load_font(font_name: str, size: int) -> ImageFont.FreeTypeFont:
+    """
+    Load a scalable font at a pixel size
+
+    Font files are parsed once per (name, size) and kept in an LRU cache.
+    """
+    if font_name == DEFAULT_FONT:
+        return ImageFont.load_default(size)
+
+    # Names map to files directly inside fonts_dir, never to arbitrary paths
+    font_path = _font_path(font_name) if Path(font_name).name == font_name else None
+    if font_path is None:
+        raise TypedSignatureError(f"Unknown font: {font_name}")
+    return ImageFont.truetype(str(font_path), size)
+
+@lru_cache(maxsize=256)
+def _render_run(text: str, font_name: str, size: int) -> bytes:
+    """Render a text run to PNG bytes (cached; the bytes are immutable)"""
+    return _draw_run(text, font_name, size)
+
+def _draw_run(text: str, font_name: str, size: int) -> bytes:
+    font = load_font(font_name, size)
+    left, top, right, bottom = font.getbbox(text)
+    padding = max(size // 8, 1)
+
+    image = Image.new("RGBA", (right - left + padding * 2, bottom - top + padding * 2), (0, 0, 0, 0))
+    ImageDraw.Draw(image).text((padding - left, padding - top), text, font=font, fill=INK_COLOR)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+def render_typed_signature(text: str, font_name: str = DEFAULT_FONT, size: Optional[int] = None) -> bytes:
+    """
+    Render typed signature text as a transparent PNG
+
+    Rendering is deterministic, so the same text, font and size always give
+    the same bytes. Pass a larger size for high resolution output.
+
+    Args:
+        text: Signature text
+        font_name: Name from available_fonts()
+        size: Font size in pixels (defaults to settings.typed_signature_font_size)
+
+    Returns:
+        bytes: PNG image
+    """
+    text = text.strip()
+    if not text:
+        raise TypedSignatureError("Signature text is empty")
+    size = size or settings.typed_signature_font_size
+    if size > MAX_CACHED_SIZE:
+        return _draw_run(text, font_name, size)
+    return _render_run(text, font_name, size)
+
+def dpi_scale(dpi: Optional[int]) -> float:
+    """How much larger than at BASE_DPI a typed signature is drawn on a page of this resolution"""
+    return max(dpi or BASE_DPI, BASE_DPI) / BASE_DPI
+
+def typed_stamp_size(text: str, font_name: str, dpi: Optional[int], page_width: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Font size and stamp width limit for stamping typed text onto a page
+
+    Both grow with the page's resolution, but the stamp is never wider than
+    the page or larger than max_signature_pixels, and the text is never drawn
+    larger than the stamp it will be shrunk to. Pages at BASE_DPI get the
+    stored render's size and STAMP_MAX_WIDTH.
+
+    Returns:
+        tuple: (font size in pixels, stamp width limit in pixels)
+    """
+    base_size = settings.typed_signature_font_size
+    _, (base_width, base_height) = inspect_image_header(render_typed_signature(text, font_name))
+    scale = dpi_scale(dpi)
+
+    max_width = round(STAMP_MAX_WIDTH * scale)
+    if page_width:
+        max_width = min(max_width, page_width)
+    # Leave room for glyph metrics that do not scale exactly linearly
+    max_width = min(max_width, math.isqrt(int(settings.max_signature_pixels * 0.9 * base_width / base_height)))
+    max_width = max(max_width, STAMP_MAX_WIDTH)
+
+    size = min(round(base_size * scale), base_size * max_width // base_width)
+    return max(size, base_size), max_width
+
+def typed_signature_base64(text: str, font_name: str = DEFAULT_FONT, size: Optional[int] = None) -> str:
+    """
+    Render typed signature text as base64 PNG for the stamping pipeline
+
+    Raises ImageTooLargeError if the render exceeds max_signature_pixels.
+    """
+    content = render_typed_signature(text, font_name, size)
+    inspect_image_header(content, settings.max_signature_pixels)
+    return base64.b64encode(content).decode("utf-8")
@@ -0,0 +1,67 @@
+"""
+Benchmark: batch stamping throughput (pages/sec)
+
+Stamps the same signature at the same position onto a set of identically
+sized invoice pages, comparing one `apply_signatures_to_image` call per page
+with the `BatchStamper` pipeline at several worker counts.
+
+Run from the server directory:
+    python -m benchmarks.bench_batch_stamping
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from app.utils import signature_processor
+from app.utils.signature_processor import BatchStamper, apply_signatures_to_image
+from benchmarks.bench_multi_signature import make_page, make_signature
+
+PAGE_COUNT = 64
+WORKER_COUNTS = [1, 2, 4, 8]
+POSITION = (1800, 3100)
+
+
+async def run_per_page(page_paths: list, signature_data: str) -> float:
+    start = time.perf_counter()
+    for page_path in page_paths:
+        await apply_signatures_to_image(page_path, [(signature_data, *POSITION)])
+    return time.perf_counter() - start
+
+
+def run_batch(page_paths: list, signature_data: str, workers: int) -> float:
+    start = time.perf_counter()
+    stamper = BatchStamper(signature_data, *POSITION, workers=workers)
+    for result in stamper.stamp_files(page_paths):
+        if isinstance(result, Exception):
+            raise result
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        signature_processor.settings.upload_dir = tmp
+        template = os.path.join(tmp, "template.jpg")
+        make_page(template)
+        page_paths = []
+        for i in range(PAGE_COUNT):
+            # Distinct files so neither the OS nor the render layer can share work
+            page_path = os.path.join(tmp, f"invoice_{i}.jpg")
+            with open(template, "rb") as src, open(page_path, "wb") as dst:
+                dst.write(src.read() + i.to_bytes(4, "big"))
+            page_paths.append(page_path)
+        signature_data = make_signature()
+
+        print(f"{PAGE_COUNT} pages, A4 at 300 DPI JPEG, one signature at {POSITION}")
+        per_page = asyncio.run(run_per_page(page_paths, signature_data))
+        print(f"{'per-page apply':>16} | {per_page:>7.2f}s | {PAGE_COUNT / per_page:>7.1f} pages/s")
+        for workers in WORKER_COUNTS:
+            elapsed = run_batch(page_paths, signature_data, workers)
+            print(
+                f"{f'batch x{workers}':>16} | {elapsed:>7.2f}s | {PAGE_COUNT / elapsed:>7.1f} pages/s"
+                f" | {per_page / elapsed:>5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
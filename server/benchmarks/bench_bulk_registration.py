@@ -0,0 +1,80 @@
+"""
+Benchmark: provisioning users one by one vs in bulk
+
+Registers an organization's worth of users against an in-memory database,
+first the way POST /api/auth/register does it (two uniqueness queries, a
+bcrypt hash and a commit per user), then the way POST
+/api/auth/register/bulk does (one uniqueness query, hashes spread over a
+process pool, one insert and commit). Hashing dominates both, so the gain
+scales with the number of CPUs.
+
+Run from the server directory:
+    python -m benchmarks.bench_bulk_registration
+"""
+import asyncio
+import os
+import time
+
+from sqlalchemy import create_engine, insert, or_
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import User
+from app.utils.auth import get_password_hash, hash_passwords, shutdown_hash_pool
+
+USER_COUNT = 32
+
+
+def make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def make_users(count: int) -> list:
+    return [(f"member{i}", f"member{i}@example.com", f"password{i}") for i in range(count)]
+
+
+def run_serial(users: list) -> float:
+    db = make_session()
+    start = time.perf_counter()
+    for username, email, password in users:
+        assert db.query(User).filter(User.username == username).first() is None
+        assert db.query(User).filter(User.email == email).first() is None
+        db.add(User(username=username, email=email, password_hash=get_password_hash(password)))
+        db.commit()
+    return time.perf_counter() - start
+
+
+def run_bulk(users: list) -> float:
+    db = make_session()
+    start = time.perf_counter()
+    existing = db.query(User.username, User.email).filter(or_(
+        User.username.in_([username for username, _, _ in users]),
+        User.email.in_([email for _, email, _ in users])
+    )).all()
+    assert not existing
+    password_hashes = asyncio.run(hash_passwords([password for _, _, password in users]))
+    db.execute(insert(User), [
+        {"username": username, "email": email, "password_hash": password_hash}
+        for (username, email, _), password_hash in zip(users, password_hashes)
+    ])
+    db.commit()
+    return time.perf_counter() - start
+
+
+def main():
+    users = make_users(USER_COUNT)
+    print(f"{USER_COUNT} users, {os.cpu_count()} CPUs")
+    serial = run_serial(users)
+    # Start the worker processes outside the timed run
+    asyncio.run(hash_passwords(["warm-up"]))
+    bulk = run_bulk(users)
+    shutdown_hash_pool()
+    print(f"{'one by one':>12} | {serial:>6.2f}s | {USER_COUNT / serial:>6.1f} users/s")
+    print(f"{'bulk':>12} | {bulk:>6.2f}s | {USER_COUNT / bulk:>6.1f} users/s | {serial / bulk:>4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: sequential vs. single-pass multi-signature compositing
+
+Compares applying N signatures one `apply_signature_to_image` call at a
+time (each call decodes the page and writes a full signed copy) with a
+single `apply_signatures_to_image` call.
+
+Run from the server directory:
+    python -m benchmarks.bench_multi_signature
+"""
+import asyncio
+import base64
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from app.utils import signature_processor
+from app.utils.signature_processor import apply_signature_to_image, apply_signatures_to_image
+
+PAGE_SIZE = (2480, 3508)  # A4 at 300 DPI
+PLACEMENT_COUNTS = [1, 4, 8, 16]
+REPEATS = 3
+
+
+def make_page(path: str):
+    """Write a synthetic scanned page"""
+    page = Image.new("RGB", PAGE_SIZE, "white")
+    draw = ImageDraw.Draw(page)
+    for y in range(200, PAGE_SIZE[1] - 200, 60):
+        draw.line((200, y, PAGE_SIZE[0] - 200, y), fill=(40, 40, 40), width=3)
+    page.save(path, "JPEG", quality=90)
+
+
+def make_signature() -> str:
+    """Return a base64 encoded RGBA signature stroke"""
+    signature = Image.new("RGBA", (400, 150), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(signature)
+    draw.line((10, 120, 120, 20, 220, 130, 390, 30), fill=(20, 20, 120, 255), width=6)
+    buffer = io.BytesIO()
+    signature.save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def placements_for(signature_data: str, count: int) -> list:
+    return [(signature_data, 200 + (i % 4) * 500, 300 + (i // 4) * 700) for i in range(count)]
+
+
+async def run_sequential(page_path: str, placements: list) -> tuple:
+    start = time.perf_counter()
+    written = 0
+    for signature_data, x, y in placements:
+        output = await apply_signature_to_image(page_path, signature_data, x, y)
+        written += os.path.getsize(output)
+    return time.perf_counter() - start, written
+
+
+async def run_single_pass(page_path: str, placements: list) -> tuple:
+    start = time.perf_counter()
+    output = await apply_signatures_to_image(page_path, placements)
+    return time.perf_counter() - start, os.path.getsize(output)
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        signature_processor.settings.upload_dir = tmp
+        page_path = os.path.join(tmp, "page.jpg")
+        make_page(page_path)
+        signature_data = make_signature()
+
+        print(f"Page {PAGE_SIZE[0]}x{PAGE_SIZE[1]} JPEG, best of {REPEATS} runs")
+        print(f"{'placements':>10} | {'sequential':>12} {'written':>10} | {'single pass':>12} {'written':>10} | {'speedup':>7}")
+        for count in PLACEMENT_COUNTS:
+            placements = placements_for(signature_data, count)
+            sequential = min([await run_sequential(page_path, placements) for _ in range(REPEATS)])
+            single = min([await run_single_pass(page_path, placements) for _ in range(REPEATS)])
+            print(
+                f"{count:>10} | {sequential[0] * 1000:>10.1f}ms {sequential[1] / 1024:>8.0f}KB"
+                f" | {single[0] * 1000:>10.1f}ms {single[1] / 1024:>8.0f}KB"
+                f" | {sequential[0] / single[0]:>6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark: full-page RGBA conversion vs. region-local compositing
+
+The legacy path converted the whole page to RGBA, pasted the signature and
+converted the page back to RGB for JPEG output. `composite_stamps` now only
+converts and blends the pixels under the signature. Each variant runs in a
+forked child process so its peak RSS can be measured in isolation.
+
+Run from the server directory:
+    python -m benchmarks.bench_region_compositing
+"""
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from app.utils.signature_processor import composite_stamps, encoder_settings
+
+PAGES = [
+    ("A4 300 DPI", (2480, 3508)),
+    ("A4 600 DPI", (4960, 7016)),
+]
+REPEATS = 3
+
+
+def make_page(path: str, size: tuple):
+    page = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(page)
+    for y in range(100, size[1] - 100, 80):
+        draw.line((100, y, size[0] - 100, y), fill=(30, 30, 30), width=4)
+    page.save(path, "JPEG", quality=90)
+
+
+def make_stamp() -> Image.Image:
+    stamp = Image.new("RGBA", (200, 75), (0, 0, 0, 0))
+    ImageDraw.Draw(stamp).line((5, 60, 60, 10, 110, 65, 195, 15), fill=(20, 20, 120, 255), width=4)
+    return stamp
+
+
+def legacy_composite(page_path: str, stamp: Image.Image) -> bytes:
+    page = Image.open(page_path)
+    page = page.convert("RGBA")
+    page.paste(stamp, (1000, 2000), stamp)
+    page = page.convert("RGB")
+    buffer = io.BytesIO()
+    page.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def region_composite(page_path: str, stamp: Image.Image) -> bytes:
+    page = composite_stamps(page_path, [(stamp, 1000, 2000)])
+    buffer = io.BytesIO()
+    page.save(buffer, "JPEG", **encoder_settings(page))
+    return buffer.getvalue()
+
+
+def measure(variant, page_path: str, queue):
+    """Run one variant in this (child) process and report time and peak RSS growth"""
+    stamp = make_stamp()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        variant(page_path, stamp)
+        timings.append(time.perf_counter() - start)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((min(timings), (after - before) / 1024))
+
+
+def run(variant, page_path: str) -> tuple:
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(variant, page_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Best of {REPEATS} runs; memory is peak RSS growth of the worker process")
+        print(f"{'page':>12} | {'legacy':>9} {'peak':>8} | {'region':>9} {'peak':>8} | {'speedup':>7}")
+        for label, size in PAGES:
+            page_path = os.path.join(tmp, f"{size[0]}x{size[1]}.jpg")
+            make_page(page_path, size)
+            legacy_time, legacy_mem = run(legacy_composite, page_path)
+            region_time, region_mem = run(region_composite, page_path)
+            print(
+                f"{label:>12} | {legacy_time * 1000:>7.0f}ms {legacy_mem:>6.0f}MB"
+                f" | {region_time * 1000:>7.0f}ms {region_mem:>6.0f}MB"
+                f" | {legacy_time / region_time:>6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: batch verification of detached document signatures
+
+Verifies a folder export's worth of Ed25519 signatures spread over a few
+signer keys, comparing parsing the public key for every item with
+`verify_batch`, which reuses parsed keys.
+
+Run from the server directory:
+    python -m benchmarks.bench_signature_verification
+"""
+import base64
+import hashlib
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+
+from app.utils.crypto_signing import load_public_key, signing_message, verify_batch
+
+SIGNATURE_COUNT = 20000
+SIGNER_COUNT = 10
+REPEATS = 3
+
+
+def make_items() -> list:
+    """Return (public key hex, sha256, signature) triples"""
+    keys = [Ed25519PrivateKey.generate() for _ in range(SIGNER_COUNT)]
+    public_keys = [
+        key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+        for key in keys
+    ]
+    items = []
+    for i in range(SIGNATURE_COUNT):
+        sha256 = hashlib.sha256(f"document {i}".encode()).hexdigest()
+        signature = base64.b64encode(keys[i % SIGNER_COUNT].sign(signing_message(sha256))).decode()
+        items.append((public_keys[i % SIGNER_COUNT], sha256, signature))
+    return items
+
+
+def run_uncached(items: list) -> float:
+    start = time.perf_counter()
+    for public_key_hex, sha256, signature in items:
+        Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_key_hex)).verify(
+            base64.b64decode(signature), signing_message(sha256)
+        )
+    return time.perf_counter() - start
+
+
+def run_batch(items: list) -> float:
+    load_public_key.cache_clear()
+    start = time.perf_counter()
+    results = verify_batch(items)
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    return elapsed
+
+
+def main():
+    items = make_items()
+    print(f"{SIGNATURE_COUNT} signatures from {SIGNER_COUNT} signers, best of {REPEATS} runs")
+    uncached = min(run_uncached(items) for _ in range(REPEATS))
+    batch = min(run_batch(items) for _ in range(REPEATS))
+    print(f"{'key per item':>14} | {uncached:>6.2f}s | {SIGNATURE_COUNT / uncached:>8.0f} sig/s")
+    print(f"{'verify_batch':>14} | {batch:>6.2f}s | {SIGNATURE_COUNT / batch:>8.0f} sig/s | {uncached / batch:>4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: access token verification with a populated revocation denylist
+
+Verifies the same token repeatedly with an empty denylist and with one
+holding many revoked tokens, with and without the Bloom filter, to show the
+per-request cost of the revocation check stays well under a millisecond.
+
+Run from the server directory:
+    python -m benchmarks.bench_token_verification
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from app.utils import auth
+from app.utils.token_denylist import TokenDenylist
+
+REVOKED_COUNT = 100000
+VERIFICATIONS = 20000
+
+
+def run(token: str, denylist: TokenDenylist) -> float:
+    auth.token_denylist = denylist
+    error = HTTPException(status_code=401)
+    start = time.perf_counter()
+    for _ in range(VERIFICATIONS):
+        auth.verify_token(token, error)
+    return (time.perf_counter() - start) / VERIFICATIONS
+
+
+def main():
+    original = auth.token_denylist
+    token = auth.create_access_token({"sub": "benchmark"})
+    expires_at = int(time.time()) + 3600
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = [("empty", run(token, TokenDenylist(str(Path(directory) / "empty.bin"))))]
+
+        path = str(Path(directory) / "populated.bin")
+        writer = TokenDenylist(path, sync_interval=3600)
+        start = time.perf_counter()
+        for i in range(REVOKED_COUNT):
+            writer.revoke(f"revoked-{i}", expires_at)
+        print(f"revoked {REVOKED_COUNT} tokens in {time.perf_counter() - start:.2f}s")
+
+        for use_bloom in (True, False):
+            denylist = TokenDenylist(path, use_bloom=use_bloom)
+            start = time.perf_counter()
+            denylist.is_revoked("warm-up")
+            load = time.perf_counter() - start
+            label = f"{REVOKED_COUNT} {'bloom' if use_bloom else 'dict'}"
+            print(f"{label:>14} load | {load * 1000:>8.1f}ms")
+            results.append((label, run(token, denylist)))
+
+    auth.token_denylist = original
+    print(f"{VERIFICATIONS} verifications per case")
+    for label, per_call in results:
+        print(f"{label:>14} | {per_call * 1e6:>8.1f}us per verify_token")
+
+
+if __name__ == "__main__":
+    main()
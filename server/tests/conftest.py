@@ -10,6 +10,9 @@ from sqlalchemy.pool import StaticPool
 from app.main import app
 from app.database import Base, get_db
 from app.models import User, Document, Signature, SignedDocument
+from app.utils.audit import audit_log
+from app.utils.api_keys import api_key_usage
+from app.utils.rate_limit import rate_limiter
 
 # Create in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -22,6 +25,10 @@ engine = create_engine(
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Background writers use the test database too
+audit_log.session_factory = TestingSessionLocal
+api_key_usage.session_factory = TestingSessionLocal
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database session for each test"""
@@ -43,6 +50,7 @@ def client(db_session):
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    rate_limiter.reset()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -82,12 +90,41 @@ def auth_headers(test_user):
     """Get authorization headers for authenticated requests"""
     return {"Authorization": f"Bearer {test_user['token']}"}
 
+def make_pdf_bytes(pages=1, width=612, height=792):
+    """Build a minimal valid PDF with blank pages"""
+    from io import BytesIO
+    from PyPDF2 import PdfWriter
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=width, height=height)
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def make_oversized_png(width, height):
+    """Build a tiny PNG whose header declares the given dimensions (decompression bomb)"""
+    import struct
+    import zlib
+    from io import BytesIO
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new("L", (1, 1)).save(buffer, "PNG")
+    data = bytearray(buffer.getvalue())
+    # IHDR payload sits at bytes 16-29, followed by its CRC
+    data[16:24] = struct.pack(">II", width, height)
+    data[29:33] = struct.pack(">I", zlib.crc32(bytes(data[12:29])))
+    return bytes(data)
+
+@pytest.fixture
+def test_pdf_content():
+    """Valid single page PDF content"""
+    return make_pdf_bytes()
+
 @pytest.fixture
-def test_document_file():
+def test_document_file(test_pdf_content):
     """Create a test document file"""
     from io import BytesIO
-    content = b"Test PDF content"
-    return ("test_document.pdf", BytesIO(content), "application/pdf")
+    return ("test_document.pdf", BytesIO(test_pdf_content), "application/pdf")
 
 @pytest.fixture
 def test_signature_data():
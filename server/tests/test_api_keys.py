@@ -0,0 +1,99 @@
+"""
+Tests for API Keys
+"""
+from io import BytesIO
+
+from app.models import ApiKey
+from app.utils.api_keys import api_key_usage
+from tests.test_signed_documents import make_png_bytes
+
+
+def create_key(client, auth_headers, scopes=("read",)):
+    response = client.post(
+        "/api/keys/", headers=auth_headers, json={"name": "integration", "scopes": list(scopes)}
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+class TestApiKeyAuthentication:
+    """Test API keys accepted by get_current_user"""
+    
+    def test_key_in_header_and_bearer(self, client, auth_headers, test_user_data):
+        """Test a key works as X-API-Key and as a Bearer token"""
+        key = create_key(client, auth_headers)["key"]
+        
+        by_header = client.get("/api/auth/me", headers={"X-API-Key": key})
+        by_bearer = client.get("/api/auth/me", headers={"Authorization": f"Bearer {key}"})
+        
+        assert by_header.status_code == 200
+        assert by_header.json()["username"] == test_user_data["username"]
+        assert by_bearer.status_code == 200
+    
+    def test_secret_stored_hashed(self, client, auth_headers, db_session):
+        """Test only the prefix and a keyed hash of the secret are stored"""
+        created = create_key(client, auth_headers)
+        
+        stored = db_session.query(ApiKey).one()
+        assert created["key"].startswith(f"esk_{stored.prefix}_")
+        assert stored.secret_hash not in created["key"]
+        assert len(stored.secret_hash) == 64
+    
+    def test_wrong_secret_rejected(self, client, auth_headers):
+        """Test a key with the right prefix but a wrong secret is rejected"""
+        key = create_key(client, auth_headers)["key"]
+        tampered = key[:-4] + ("aaaa" if not key.endswith("aaaa") else "bbbb")
+        
+        response = client.get("/api/auth/me", headers={"X-API-Key": tampered})
+        
+        assert response.status_code == 401
+    
+    def test_read_scope_cannot_write(self, client, auth_headers):
+        """Test a read-only key gets 403 on writes and a write key succeeds"""
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        read_key = create_key(client, auth_headers)["key"]
+        write_key = create_key(client, auth_headers, scopes=("read", "write"))["key"]
+        
+        denied = client.post("/api/documents/upload", headers={"X-API-Key": read_key}, files=files)
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        allowed = client.post("/api/documents/upload", headers={"X-API-Key": write_key}, files=files)
+        
+        assert denied.status_code == 403
+        assert allowed.status_code == 201
+    
+    def test_revoked_key_rejected(self, client, auth_headers):
+        """Test a revoked key stops working"""
+        created = create_key(client, auth_headers)
+        
+        client.delete(f"/api/keys/{created['id']}", headers=auth_headers)
+        response = client.get("/api/auth/me", headers={"X-API-Key": created["key"]})
+        
+        assert response.status_code == 401
+    
+    def test_keys_cannot_manage_keys(self, client, auth_headers):
+        """Test key management requires a user login"""
+        key = create_key(client, auth_headers, scopes=("read", "write"))["key"]
+        
+        response = client.post("/api/keys/", headers={"X-API-Key": key}, json={"name": "child"})
+        
+        assert response.status_code == 403
+
+
+class TestApiKeyUsage:
+    """Test usage counters aggregated in memory"""
+    
+    def test_usage_flushed_in_batches(self, client, auth_headers, db_session):
+        """Test requests only count in memory until a flush adds them up"""
+        created = create_key(client, auth_headers)
+        for _ in range(3):
+            client.get("/api/auth/me", headers={"X-API-Key": created["key"]})
+        
+        stored = db_session.query(ApiKey).one()
+        assert stored.usage_count == 0
+        assert api_key_usage.pending(stored.id) == 3
+        
+        listed = client.get("/api/keys/", headers=auth_headers).json()
+        
+        assert listed[0]["usage_count"] == 3
+        assert listed[0]["last_used_at"] is not None
+        assert api_key_usage.pending(stored.id) == 0
@@ -0,0 +1,106 @@
+"""
+Tests for the Audit Log
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+from app.models import AuditEvent
+from app.utils.audit import AuditLog
+from tests.conftest import TestingSessionLocal
+from tests.test_signed_documents import make_png_bytes, make_signature_payload
+
+
+class TestAuditRoutes:
+    """Test audit records left by document operations"""
+    
+    def test_actions_are_recorded(self, client, auth_headers):
+        """Test upload, apply, download and delete each leave one event"""
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        signed_id = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={"document_id": document_id, "signature_id": signature_id}
+        ).json()["id"]
+        client.get(f"/api/signed/{signed_id}/download", headers=auth_headers)
+        client.delete(f"/api/documents/{document_id}", headers=auth_headers)
+        
+        response = client.get(f"/api/audit/?document_id={document_id}", headers=auth_headers)
+        
+        assert response.status_code == 200
+        actions = [event["action"] for event in response.json()]
+        assert actions == ["document.delete", "signed.download", "signed.apply", "document.upload"]
+        assert response.json()[1]["signed_document_id"] == signed_id
+    
+    def test_filters(self, client, auth_headers, test_pdf_content):
+        """Test action and time range filters"""
+        for name in ("a.pdf", "b.pdf"):
+            files = {"file": (name, BytesIO(test_pdf_content), "application/pdf")}
+            client.post("/api/documents/upload", headers=auth_headers, files=files)
+        future = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        
+        uploads = client.get("/api/audit/?action=document.upload", headers=auth_headers).json()
+        later = client.get("/api/audit/", headers=auth_headers, params={"since": future}).json()
+        
+        assert len(uploads) == 2
+        assert later == []
+    
+    def test_requires_auth(self, client):
+        """Test the audit trail is not public"""
+        assert client.get("/api/audit/").status_code == 401
+
+
+class TestAuditLog:
+    """Test batching of audit writes"""
+    
+    def test_events_written_in_one_batch(self, db_session):
+        """Test queued events are only written on flush"""
+        log = AuditLog(batch_size=100, flush_interval=60, max_queue=1000, session_factory=TestingSessionLocal)
+        for i in range(3):
+            log.record("document.upload", 1, document_id=i)
+        
+        assert db_session.query(AuditEvent).count() == 0
+        assert log.flush() == 3
+        assert db_session.query(AuditEvent).count() == 3
+        assert log.pending == 0
+    
+    def test_failed_flush_requeues(self, db_session):
+        """Test events survive a failed write"""
+        log = AuditLog(batch_size=100, flush_interval=60, max_queue=2, session_factory=TestingSessionLocal)
+        for i in range(3):
+            log.record("document.upload", 1, document_id=i)
+        assert log.pending == 2
+        
+        session = TestingSessionLocal()
+        session.execute = lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("database unavailable"))
+        with pytest.raises(RuntimeError):
+            log.flush(session)
+        session.close()
+        
+        assert log.pending == 2
+        assert log.flush() == 2
+    
+    def test_size_trigger_and_shutdown_flush(self, db_session):
+        """Test a full batch wakes the flusher and cancellation flushes the rest"""
+        log = AuditLog(batch_size=2, flush_interval=60, max_queue=1000, session_factory=TestingSessionLocal)
+        
+        async def scenario():
+            task = asyncio.create_task(log.run_flusher())
+            await asyncio.sleep(0)
+            log.record("document.upload", 1)
+            log.record("document.upload", 1)
+            await asyncio.sleep(0.05)
+            written_by_trigger = db_session.query(AuditEvent).count()
+            log.record("document.delete", 1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return written_by_trigger
+        
+        assert asyncio.run(scenario()) == 2
+        assert db_session.query(AuditEvent).count() == 3
@@ -157,8 +157,203 @@ class TestAuthLogout:
         assert response.status_code == 200
         assert "message" in response.json()
     
+    def test_logout_revokes_token(self, client, auth_headers, test_user_data):
+        """Test the token is rejected after logout while new logins work"""
+        client.post("/api/auth/logout", headers=auth_headers)
+        
+        assert client.get("/api/auth/me", headers=auth_headers).status_code == 401
+        
+        login = client.post("/api/auth/login", json={
+            "username": test_user_data["username"],
+            "password": test_user_data["password"]
+        })
+        new_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        assert client.get("/api/auth/me", headers=new_headers).status_code == 200
+    
+    def test_denylist_not_served(self, client, auth_headers):
+        """Test the revoked token file lives outside the public uploads directory"""
+        from pathlib import Path
+        from app.utils.token_denylist import token_denylist
+        
+        client.post("/api/auth/logout", headers=auth_headers)
+        
+        assert Path(token_denylist.path).exists()
+        assert Path("uploads").resolve() not in Path(token_denylist.path).resolve().parents
+        assert client.get("/uploads/token_denylist.bin").status_code == 404
+    
     def test_logout_no_token(self, client):
         """Test logout without token"""
         response = client.post("/api/auth/logout")
         
         assert response.status_code == 401
+
+
+class TestAuthRefresh:
+    """Test refresh token rotation"""
+    
+    def login(self, client, test_user_data):
+        client.post("/api/auth/register", json=test_user_data)
+        response = client.post("/api/auth/login", json={
+            "username": test_user_data["username"],
+            "password": test_user_data["password"]
+        })
+        return response.json()
+    
+    def test_refresh_rotates_tokens(self, client, test_user_data, monkeypatch):
+        """Test refresh returns a working access token without checking the password"""
+        tokens = self.login(client, test_user_data)
+        assert tokens["refresh_token"]
+        assert tokens["expires_in"] > 0
+        
+        def no_bcrypt(*args):
+            raise AssertionError("bcrypt called during refresh")
+        monkeypatch.setattr("bcrypt.checkpw", no_bcrypt)
+        
+        response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        
+        assert response.status_code == 200
+        refreshed = response.json()
+        assert refreshed["refresh_token"] != tokens["refresh_token"]
+        headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+        me = client.get("/api/auth/me", headers=headers)
+        assert me.json()["username"] == test_user_data["username"]
+    
+    def test_reuse_revokes_family(self, client, test_user_data):
+        """Test replaying a rotated refresh token revokes its replacement too"""
+        tokens = self.login(client, test_user_data)
+        rotated = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+        
+        replay = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert replay.status_code == 401
+        
+        response = client.post("/api/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+        assert response.status_code == 401
+    
+    def test_refresh_invalid_token(self, client):
+        """Test unknown refresh tokens are rejected"""
+        response = client.post("/api/auth/refresh", json={"refresh_token": "not-a-token"})
+        
+        assert response.status_code == 401
+    
+    def test_refresh_tokens_stored_hashed(self, client, db_session, test_user_data):
+        """Test only a keyed hash of the refresh token is stored"""
+        from app.models import RefreshToken
+        tokens = self.login(client, test_user_data)
+        
+        stored = db_session.query(RefreshToken).one()
+        assert stored.token_hash != tokens["refresh_token"]
+        assert len(stored.token_hash) == 64
+    
+    def test_logout_revokes_refresh_token(self, client, test_user_data):
+        """Test logout with a refresh token in the body revokes it"""
+        tokens = self.login(client, test_user_data)
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        
+        client.post("/api/auth/logout", headers=headers, json={"refresh_token": tokens["refresh_token"]})
+        
+        response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == 401
+
+
+class TestAuthBulkRegistration:
+    """Test bulk user provisioning"""
+    
+    @pytest.fixture(autouse=True)
+    def provisioning_account(self, monkeypatch, test_user_data):
+        """Allow the test user to provision accounts"""
+        from app.routes import auth as auth_routes
+        monkeypatch.setattr(auth_routes.settings, "bulk_register_usernames", [test_user_data["username"]])
+    
+    def make_users(self, count, start=0):
+        return [
+            {"username": f"member{i}", "email": f"member{i}@example.com", "password": f"password{i}"}
+            for i in range(start, start + count)
+        ]
+    
+    def test_bulk_register_success(self, client, auth_headers):
+        """Test all users are created in order and can log in"""
+        users = self.make_users(3)
+        
+        response = client.post("/api/auth/register/bulk", headers=auth_headers, json={"users": users})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 3
+        assert data["failed"] == 0
+        assert [result["user"]["username"] for result in data["results"]] == ["member0", "member1", "member2"]
+        login = client.post("/api/auth/login", json={"username": "member2", "password": "password2"})
+        assert login.status_code == 200
+    
+    def test_bulk_register_reports_conflicts(self, client, auth_headers, test_user_data):
+        """Test clashes with existing users and within the batch fail individually"""
+        users = self.make_users(2)
+        users.append({**self.make_users(1, start=5)[0], "username": test_user_data["username"]})
+        users.append({**self.make_users(1, start=6)[0], "email": "member0@example.com"})
+        
+        response = client.post("/api/auth/register/bulk", headers=auth_headers, json={"users": users})
+        
+        data = response.json()
+        assert data["created"] == 2
+        assert data["failed"] == 2
+        assert [result["success"] for result in data["results"]] == [True, True, False, False]
+        assert data["results"][2]["error"] == "Username already registered"
+        assert data["results"][3]["error"] == "Email already registered"
+    
+    def test_bulk_register_requires_provisioning_account(self, client, auth_headers, monkeypatch):
+        """Test ordinary accounts cannot provision users"""
+        from app.routes import auth as auth_routes
+        monkeypatch.setattr(auth_routes.settings, "bulk_register_usernames", [])
+        
+        response = client.post("/api/auth/register/bulk", headers=auth_headers, json={"users": self.make_users(1)})
+        
+        assert response.status_code == 403
+        assert client.post("/api/auth/login", json={"username": "member0", "password": "password0"}).status_code == 401
+    
+    def test_bulk_register_limit(self, client, auth_headers, monkeypatch):
+        """Test batches over the configured limit are rejected"""
+        from app.routes import auth as auth_routes
+        monkeypatch.setattr(auth_routes.settings, "max_bulk_register_users", 2)
+        
+        response = client.post("/api/auth/register/bulk", headers=auth_headers, json={"users": self.make_users(3)})
+        
+        assert response.status_code == 400
+    
+    def test_bulk_register_requires_auth(self, client):
+        """Test bulk provisioning is not open to anonymous callers"""
+        response = client.post("/api/auth/register/bulk", json={"users": self.make_users(1)})
+        
+        assert response.status_code == 401
+
+
+class TestAuthRateLimiting:
+    """Test login throttling by the rate-limit middleware"""
+    
+    def test_login_throttled_per_username(self, client, test_user, monkeypatch):
+        """Test repeated logins for one username get 429 before bcrypt runs"""
+        from app.utils.rate_limit import rate_limiter
+        monkeypatch.setitem(rate_limiter.limits, "username", (1 / 60, 3))
+        checks = []
+        import bcrypt
+        checkpw = bcrypt.checkpw
+        monkeypatch.setattr("bcrypt.checkpw", lambda *args: checks.append(1) or checkpw(*args))
+        
+        statuses = [
+            client.post("/api/auth/login", json={"username": "testuser", "password": "wrong"}).status_code
+            for _ in range(5)
+        ]
+        
+        assert statuses == [401, 401, 401, 429, 429]
+        assert len(checks) == 3
+        response = client.post("/api/auth/login", json={"username": "TestUser", "password": "wrong"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+    
+    def test_ip_limit_applies_to_api_routes(self, client, auth_headers, monkeypatch):
+        """Test the per-IP bucket limits any /api route but not /health"""
+        from app.utils.rate_limit import rate_limiter
+        monkeypatch.setitem(rate_limiter.limits, "ip", (1 / 60, 2))
+        
+        statuses = [client.get("/api/auth/me", headers=auth_headers).status_code for _ in range(3)]
+        
+        assert statuses == [200, 200, 429]
+        assert client.get("/health").status_code == 200
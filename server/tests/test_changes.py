@@ -0,0 +1,136 @@
+"""
+Tests for the Change Feed
+"""
+import asyncio
+import time
+from io import BytesIO
+
+from app.utils.change_feed import ChangeNotifier
+from tests.test_signed_documents import make_png_bytes, make_signature_payload
+
+
+def upload_png(client, auth_headers, name="page.png"):
+    files = {"file": (name, BytesIO(make_png_bytes()), "image/png")}
+    return client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+
+
+class TestChangeFeed:
+    """Test incremental sync through /api/changes"""
+    
+    def test_inserts_and_deletes_recorded(self, client, auth_headers):
+        """Test changes after `since` are returned with current state, deletes without"""
+        document_id = upload_png(client, auth_headers)
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        
+        first = client.get("/api/changes", headers=auth_headers).json()
+        
+        assert [(c["entity"], c["entity_id"], c["operation"]) for c in first["changes"]] == [
+            ("document", document_id, "insert"),
+            ("signature", signature_id, "insert"),
+        ]
+        assert first["changes"][0]["data"]["id"] == document_id
+        assert first["has_more"] is False
+        
+        client.delete(f"/api/documents/{document_id}", headers=auth_headers)
+        second = client.get(f"/api/changes?since={first['next_since']}", headers=auth_headers).json()
+        
+        assert [(c["entity"], c["operation"], c["data"]) for c in second["changes"]] == [("document", "delete", None)]
+        assert second["next_since"] > first["next_since"]
+    
+    def test_signing_updates_document(self, client, auth_headers):
+        """Test applying a signature records the new version and the document update"""
+        document_id = upload_png(client, auth_headers)
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        since = client.get("/api/changes", headers=auth_headers).json()["next_since"]
+        
+        client.post("/api/signed/apply", headers=auth_headers, json={"document_id": document_id, "signature_id": signature_id})
+        changes = client.get(f"/api/changes?since={since}", headers=auth_headers).json()["changes"]
+        
+        by_entity = {c["entity"]: c for c in changes}
+        assert by_entity["signed_document"]["operation"] == "insert"
+        assert by_entity["document"]["operation"] == "update"
+        assert by_entity["document"]["data"]["is_signed"] is True
+    
+    def test_bulk_upload_recorded(self, client, auth_headers):
+        """Test documents from a bulk insert appear in the feed"""
+        files = [("files", (f"page{i}.png", BytesIO(make_png_bytes()), "image/png")) for i in range(3)]
+        client.post("/api/documents/upload/bulk", headers=auth_headers, files=files)
+        
+        changes = client.get("/api/changes", headers=auth_headers).json()["changes"]
+        
+        assert [c["operation"] for c in changes] == ["insert"] * 3
+    
+    def test_pagination_and_isolation(self, client, auth_headers):
+        """Test `limit` pages through changes and other users' changes are hidden"""
+        for i in range(3):
+            upload_png(client, auth_headers, f"page{i}.png")
+        client.post("/api/auth/register", json={"username": "other", "email": "other@example.com", "password": "password123"})
+        token = client.post("/api/auth/login", json={"username": "other", "password": "password123"}).json()["access_token"]
+        
+        page = client.get("/api/changes?limit=2", headers=auth_headers).json()
+        rest = client.get(f"/api/changes?limit=2&since={page['next_since']}", headers=auth_headers).json()
+        other = client.get("/api/changes", headers={"Authorization": f"Bearer {token}"}).json()
+        
+        assert len(page["changes"]) == 2 and page["has_more"] is True
+        assert len(rest["changes"]) == 1
+        assert other["changes"] == []
+    
+    def test_long_poll_times_out_empty(self, client, auth_headers):
+        """Test a long poll with nothing new returns empty after the wait"""
+        start = time.monotonic()
+        
+        response = client.get("/api/changes?wait=0.2", headers=auth_headers).json()
+        
+        assert response["changes"] == []
+        assert response["next_since"] == 0
+        assert time.monotonic() - start >= 0.2
+    
+    def test_recent_entries_held_back_until_settled(self, client, auth_headers, monkeypatch):
+        """Test changes inside the settle window are not returned and next_since does not pass them"""
+        from app.routes import changes
+        first = upload_png(client, auth_headers, "first.png")
+        monkeypatch.setattr(changes, "SETTLE_SECONDS", 0.3)
+        
+        early = client.get("/api/changes", headers=auth_headers).json()
+        time.sleep(0.3)
+        settled = client.get(f"/api/changes?since={early['next_since']}", headers=auth_headers).json()
+        
+        assert early["changes"] == [] and early["next_since"] == 0
+        assert [c["entity_id"] for c in settled["changes"]] == [first]
+    
+    def test_long_poll_releases_connection(self, client, auth_headers, db_session, monkeypatch):
+        """Test a waiting long poll holds no database connection"""
+        from app.routes import changes
+        held = []
+        
+        async def wait(timeout):
+            held.append(db_session.in_transaction())
+            await asyncio.sleep(0.01)
+            return False
+        monkeypatch.setattr(changes.change_notifier, "wait", wait)
+        
+        response = client.get("/api/changes?wait=0.05", headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert held and not any(held)
+
+
+class TestChangeNotifier:
+    """Test long-poll wake-ups"""
+    
+    def test_notify_wakes_waiter(self):
+        """Test a waiter returns as soon as a commit is announced"""
+        notifier = ChangeNotifier()
+        
+        async def run():
+            waiter = asyncio.ensure_future(notifier.wait(5))
+            await asyncio.sleep(0.01)
+            notifier.notify()
+            return await asyncio.wait_for(waiter, 1)
+        
+        assert asyncio.run(run()) is True
+        assert asyncio.run(notifier.wait(0.01)) is False
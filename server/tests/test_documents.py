@@ -2,14 +2,18 @@
 Tests for Document Routes
 """
 import pytest
+import zipfile
 from io import BytesIO
+from PIL import Image
+
+from tests.conftest import make_pdf_bytes, make_oversized_png
 
 class TestDocumentUpload:
     """Test document upload"""
     
-    def test_upload_document_success(self, client, auth_headers):
+    def test_upload_document_success(self, client, auth_headers, test_pdf_content):
         """Test successful document upload"""
-        file_content = b"Test PDF content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         
         response = client.post(
@@ -26,9 +30,9 @@ class TestDocumentUpload:
         assert "id" in data
         assert "file_path" in data
     
-    def test_upload_document_no_auth(self, client):
+    def test_upload_document_no_auth(self, client, test_pdf_content):
         """Test upload without authentication"""
-        file_content = b"Test PDF content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         
         response = client.post("/api/documents/upload", files=files)
@@ -66,6 +70,144 @@ class TestDocumentUpload:
         assert data["file_type"] == ".png"
 
 
+class TestUploadContentValidation:
+    """Test content sniffing at upload time"""
+    
+    def test_upload_records_pdf_geometry(self, client, auth_headers):
+        """Test PDF page count and page size are stored"""
+        files = {"file": ("multi.pdf", BytesIO(make_pdf_bytes(pages=3, width=595, height=842)), "application/pdf")}
+        
+        response = client.post("/api/documents/upload", headers=auth_headers, files=files)
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["mime_type"] == "application/pdf"
+        assert data["page_count"] == 3
+        assert (data["width"], data["height"]) == (595, 842)
+    
+    def test_upload_records_image_dimensions(self, client, auth_headers):
+        """Test image dimensions are read from the header"""
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new("RGB", (320, 240), "white").save(buffer, "JPEG")
+        files = {"file": ("scan.jpeg", BytesIO(buffer.getvalue()), "image/jpeg")}
+        
+        response = client.post("/api/documents/upload", headers=auth_headers, files=files)
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["mime_type"] == "image/jpeg"
+        assert (data["width"], data["height"]) == (320, 240)
+    
+    def test_upload_rejects_mislabeled_file(self, client, auth_headers, test_pdf_content):
+        """Test a PDF renamed to .png is rejected"""
+        files = {"file": ("scan.png", BytesIO(test_pdf_content), "image/png")}
+        
+        response = client.post("/api/documents/upload", headers=auth_headers, files=files)
+        
+        assert response.status_code == 400
+        assert "does not match its extension" in response.json()["detail"]
+    
+    def test_upload_rejects_corrupt_pdf(self, client, auth_headers):
+        """Test a file with a PDF header but no page tree is rejected"""
+        files = {"file": ("broken.pdf", BytesIO(b"%PDF-1.4\ngarbage"), "application/pdf")}
+        
+        response = client.post("/api/documents/upload", headers=auth_headers, files=files)
+        
+        assert response.status_code == 400
+        assert "Invalid file" in response.json()["detail"]
+    
+    def test_upload_rejects_decompression_bomb(self, client, auth_headers):
+        """Test images declaring huge dimensions are rejected from the header"""
+        files = {"file": ("bomb.png", BytesIO(make_oversized_png(60000, 60000)), "image/png")}
+        
+        response = client.post("/api/documents/upload", headers=auth_headers, files=files)
+        
+        assert response.status_code == 400
+        assert "exceeds the limit" in response.json()["detail"]
+    
+    def test_bulk_upload_rejects_unrecognized_content(self, client, auth_headers):
+        """Test content validation applies to each file of a bulk upload"""
+        files = [("files", ("fake.pdf", BytesIO(b"Test content"), "application/pdf"))]
+        
+        response = client.post("/api/documents/upload/bulk", headers=auth_headers, files=files)
+        
+        data = response.json()
+        assert data["uploaded"] == 0
+        assert "Unrecognized file content" in data["results"][0]["error"]
+
+
+class TestBulkUpload:
+    """Test multi-file and archive uploads"""
+    
+    def test_bulk_upload_mixed_results(self, client, auth_headers, test_pdf_content):
+        """Test bulk upload reports a result per file in order"""
+        files = [
+            ("files", ("a.pdf", BytesIO(test_pdf_content), "application/pdf")),
+            ("files", ("notes.txt", BytesIO(b"Test content"), "text/plain")),
+            ("files", ("b.pdf", BytesIO(test_pdf_content), "application/pdf")),
+        ]
+        
+        response = client.post("/api/documents/upload/bulk", headers=auth_headers, files=files)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["uploaded"] == 2
+        assert data["failed"] == 1
+        assert [r["filename"] for r in data["results"]] == ["a.pdf", "notes.txt", "b.pdf"]
+        assert data["results"][0]["document"]["file_size"] == len(test_pdf_content)
+        assert "File type not allowed" in data["results"][1]["error"]
+        
+        list_response = client.get("/api/documents/", headers=auth_headers)
+        assert len(list_response.json()) == 2
+    
+    def test_archive_upload(self, client, auth_headers, test_pdf_content):
+        """Test ZIP archive entries are stored as documents"""
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("scans/one.pdf", test_pdf_content)
+            zf.writestr("scans/two.pdf", test_pdf_content)
+            zf.writestr("scans/readme.txt", b"ignored")
+            zf.writestr("__MACOSX/._one.pdf", b"junk")
+        archive.seek(0)
+        files = {"file": ("scans.zip", archive, "application/zip")}
+        
+        response = client.post("/api/documents/upload/archive", headers=auth_headers, files=files)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["uploaded"] == 2
+        assert data["failed"] == 1
+        assert {r["filename"] for r in data["results"] if r["success"]} == {"one.pdf", "two.pdf"}
+    
+    def test_archive_upload_invalid_zip(self, client, auth_headers):
+        """Test corrupt archives are rejected"""
+        files = {"file": ("scans.zip", BytesIO(b"not a zip"), "application/zip")}
+        
+        response = client.post("/api/documents/upload/archive", headers=auth_headers, files=files)
+        
+        assert response.status_code == 400
+        assert "Invalid ZIP archive" in response.json()["detail"]
+    
+    def test_archive_upload_rejects_zip_bomb(self, client, auth_headers, monkeypatch):
+        """Test an archive whose entries expand past the total extraction cap is refused"""
+        monkeypatch.setattr("app.routes.documents.settings.max_archive_extracted_size", 2 * 1024 * 1024)
+        page = BytesIO()
+        Image.new("RGB", (10, 10), "white").save(page, "PNG")
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i in range(3):
+                zf.writestr(f"scan{i}.png", page.getvalue() + bytes(1024 * 1024))
+        archive.seek(0)
+        files = {"file": ("scans.zip", archive, "application/zip")}
+        
+        response = client.post("/api/documents/upload/archive", headers=auth_headers, files=files)
+        
+        assert response.status_code == 400
+        assert "Archive too large" in response.json()["detail"]
+        assert client.get("/api/documents/", headers=auth_headers).json() == []
+
+
 class TestDocumentList:
     """Test listing documents"""
     
@@ -76,11 +218,11 @@ class TestDocumentList:
         assert response.status_code == 200
         assert response.json() == []
     
-    def test_list_documents_with_uploads(self, client, auth_headers):
+    def test_list_documents_with_uploads(self, client, auth_headers, test_pdf_content):
         """Test listing documents after uploading"""
         # Upload two documents
         for i in range(2):
-            file_content = f"Test content {i}".encode()
+            file_content = test_pdf_content
             files = {"file": (f"test{i}.pdf", BytesIO(file_content), "application/pdf")}
             client.post("/api/documents/upload", headers=auth_headers, files=files)
         
@@ -101,10 +243,10 @@ class TestDocumentList:
 class TestDocumentGet:
     """Test getting single document"""
     
-    def test_get_document_success(self, client, auth_headers):
+    def test_get_document_success(self, client, auth_headers, test_pdf_content):
         """Test getting document by ID"""
         # Upload a document first
-        file_content = b"Test content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         upload_response = client.post(
             "/api/documents/upload",
@@ -138,10 +280,10 @@ class TestDocumentGet:
 class TestDocumentDelete:
     """Test deleting documents"""
     
-    def test_delete_document_success(self, client, auth_headers):
+    def test_delete_document_success(self, client, auth_headers, test_pdf_content):
         """Test successful document deletion"""
         # Upload a document first
-        file_content = b"Test content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         upload_response = client.post(
             "/api/documents/upload",
@@ -171,3 +313,33 @@ class TestDocumentDelete:
         response = client.delete("/api/documents/1")
         
         assert response.status_code == 401
+
+
+class TestLoadShedding:
+    """Test heavy requests are refused while the worker is overloaded"""
+    
+    def test_overload_sheds_uploads_not_reads(self, client, auth_headers, monkeypatch):
+        """Test uploads get 503 with Retry-After while listing still answers"""
+        from app.utils.load_shedding import load_monitor
+        monkeypatch.setattr(load_monitor, "max_queue_depth", -1)
+        monkeypatch.setattr("app.utils.load_shedding.settings.load_shed_defer_seconds", 0.05)
+        
+        files = {"file": ("test.pdf", BytesIO(make_pdf_bytes()), "application/pdf")}
+        upload = client.post("/api/documents/upload", headers=auth_headers, files=files)
+        listing = client.get("/api/documents/", headers=auth_headers)
+        
+        assert upload.status_code == 503
+        assert upload.headers["Retry-After"] == "2"
+        assert listing.status_code == 200
+        assert client.get("/health").status_code == 200
+    
+    def test_deferred_request_runs_when_load_clears(self, client, auth_headers, monkeypatch):
+        """Test a heavy request waits out a short overload instead of failing"""
+        from app.utils.load_shedding import load_monitor
+        monkeypatch.setattr(load_monitor, "lag_ms", load_monitor.max_lag_ms * 10)
+        monkeypatch.setattr(load_monitor, "alpha", 1.0)
+        
+        files = {"file": ("test.pdf", BytesIO(make_pdf_bytes()), "application/pdf")}
+        upload = client.post("/api/documents/upload", headers=auth_headers, files=files)
+        
+        assert upload.status_code == 201
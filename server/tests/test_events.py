@@ -0,0 +1,212 @@
+"""
+Tests for Progress Events
+"""
+import asyncio
+import json
+import threading
+from io import BytesIO
+
+from app.utils.events import EventBus, event_bus
+from tests.test_signed_documents import make_png_bytes, make_signature_payload
+
+
+def parse_frames(frames):
+    """Decode encoded events into (event, data) pairs"""
+    events = []
+    for frame in frames:
+        for block in frame.decode().strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.split("\n") if not line.startswith(":"))
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def subscribe(client, user_id):
+    """Open a subscription on the test client's event loop"""
+    async def run():
+        return event_bus.subscribe(user_id)
+    return client.portal.call(run)
+
+
+def drain(client, subscription):
+    """Collect the events delivered so far, then close the subscription"""
+    async def run():
+        await asyncio.sleep(0.01)
+        event_bus.unsubscribe(subscription)
+        return parse_frames(subscription.drain())
+    return client.portal.call(run)
+
+
+class TestEventBus:
+    """Test fan-out, isolation and slow-consumer eviction"""
+
+    def test_fan_out_per_user(self):
+        """Test every stream of a user gets the event and other users get nothing"""
+        bus = EventBus(max_buffer=8)
+
+        async def run():
+            first, second, other = bus.subscribe(1), bus.subscribe(1), bus.subscribe(2)
+            bus.publish(1, "upload.completed", {"document_ids": [5]})
+            return [parse_frames(subscription.drain()) for subscription in (first, second, other)]
+
+        first, second, other = asyncio.run(run())
+
+        assert first == second == [("upload.completed", {"document_ids": [5]})]
+        assert other == []
+
+    def test_publish_from_worker_thread(self):
+        """Test events published off the loop are delivered on the subscriber's loop"""
+        bus = EventBus(max_buffer=8)
+
+        async def run():
+            subscription = bus.subscribe(1)
+            await asyncio.to_thread(bus.publish, 1, "render.progress", {"rendered": 1})
+            assert await subscription.wait(1) is True
+            return parse_frames(subscription.drain())
+
+        assert asyncio.run(run()) == [("render.progress", {"rendered": 1})]
+
+    def test_slow_consumer_evicted(self):
+        """Test a full buffer is replaced by a single evicted event and unsubscribed"""
+        bus = EventBus(max_buffer=2)
+
+        async def run():
+            slow, fast = bus.subscribe(1), bus.subscribe(1)
+            for i in range(2):
+                bus.publish(1, "render.progress", {"rendered": i})
+                fast.drain()
+            bus.publish(1, "render.progress", {"rendered": 2})
+            return slow, parse_frames(fast.drain())
+
+        slow, fast_events = asyncio.run(run())
+
+        assert slow.evicted is True
+        assert parse_frames(slow.drain()) == [("evicted", {"reason": "slow consumer"})]
+        assert fast_events == [("render.progress", {"rendered": 2})]
+        assert bus.streams_for(1) == 1
+
+    def test_unsubscribe(self):
+        """Test closed streams stop receiving events"""
+        bus = EventBus(max_buffer=8)
+
+        async def run():
+            subscription = bus.subscribe(1)
+            bus.unsubscribe(subscription)
+            bus.publish(1, "document.deleted", {"document_id": 1})
+            return subscription.drain()
+
+        assert asyncio.run(run()) == []
+        assert bus.subscriber_count == 0
+
+
+class TestProgressEvents:
+    """Test routes publish upload, render and deletion events"""
+
+    def test_bulk_upload_progress(self, client, test_user, auth_headers):
+        """Test a progress event per stored file and one completion event"""
+        subscription = subscribe(client, test_user["user"]["id"])
+        files = [("files", (f"page{i}.png", BytesIO(make_png_bytes()), "image/png")) for i in range(2)]
+        files.append(("files", ("notes.txt", BytesIO(b"text"), "text/plain")))
+
+        response = client.post("/api/documents/upload/bulk", headers=auth_headers, files=files)
+        events = drain(client, subscription)
+
+        progress = [data for event, data in events if event == "upload.progress"]
+        assert [data["stored"] for data in progress] == [1, 2]
+        assert {data["filename"] for data in progress} == {"page0.png", "page1.png"}
+        assert all(data["total"] == 2 and data["success"] for data in progress)
+        assert events[-1] == ("upload.completed", {
+            "uploaded": 2,
+            "failed": 1,
+            "document_ids": [result["document"]["id"] for result in response.json()["results"][:2]]
+        })
+
+    def test_apply_many_progress(self, client, test_user, auth_headers):
+        """Test signing many documents reports each rendered page"""
+        document_ids = [
+            client.post(
+                "/api/documents/upload", headers=auth_headers,
+                files={"file": (f"page{i}.png", BytesIO(make_png_bytes()), "image/png")}
+            ).json()["id"]
+            for i in range(3)
+        ]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        subscription = subscribe(client, test_user["user"]["id"])
+
+        response = client.post(
+            "/api/signed/apply-many", headers=auth_headers,
+            json={"document_ids": document_ids, "signature_id": signature_id}
+        )
+        events = drain(client, subscription)
+
+        assert response.status_code == 201
+        assert [event for event, _ in events] == [
+            "render.started", "render.progress", "render.progress", "render.progress", "render.completed"
+        ]
+        assert [data["rendered"] for event, data in events if event == "render.progress"] == [1, 2, 3]
+        assert events[-1][1]["signed_document_ids"] == [signed["id"] for signed in response.json()]
+
+
+class TestEventStream:
+    """Test the server-sent event endpoint"""
+
+    def test_requires_authentication(self, client):
+        """Test the stream is refused without credentials"""
+        response = client.get("/api/events/stream")
+
+        assert response.status_code == 401
+
+    def test_stream_limit_per_user(self, client, test_user, monkeypatch):
+        """Test opening more streams than allowed is refused"""
+        from app.routes import events
+        monkeypatch.setattr(events.settings, "events_max_streams_per_user", 0)
+
+        response = client.get(f"/api/events/stream?access_token={test_user['token']}")
+
+        assert response.status_code == 429
+
+    def test_streams_deletion(self, client, test_user, auth_headers):
+        """Test an EventSource-style client receives events until it disconnects"""
+        from app.main import app
+
+        document_id = client.post(
+            "/api/documents/upload", headers=auth_headers,
+            files={"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        ).json()["id"]
+
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        received = []
+        deleted = threading.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.to_thread(deleted.wait, 5)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            received.append(message)
+            body = message.get("body", b"")
+            if b"event: ready" in body:
+                # Another request from the same user while the stream is open
+                threading.Thread(target=client.delete, args=(f"/api/documents/{document_id}",), kwargs={"headers": auth_headers}).start()
+            if b"document.deleted" in body:
+                deleted.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/api/events/stream", "raw_path": b"/api/events/stream",
+            "query_string": f"access_token={test_user['token']}".encode(), "root_path": "",
+            "client": ("testclient", 50000), "server": ("testserver", 80), "headers": []
+        }
+
+        client.portal.call(app, scope, receive, send)
+
+        start = received[0]
+        assert start["status"] == 200
+        assert (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+        events = parse_frames([message.get("body", b"") for message in received[1:]])
+        assert events == [("ready", {}), ("document.deleted", {"document_id": document_id})]
+        assert event_bus.streams_for(test_user["user"]["id"]) == 0
@@ -7,7 +7,7 @@ from io import BytesIO
 class TestFullWorkflow:
     """Test complete user workflow from registration to signed document"""
     
-    def test_complete_signature_workflow(self, client):
+    def test_complete_signature_workflow(self, client, test_pdf_content):
         """Test the entire workflow: register, login, upload, sign, download"""
         
         # Step 1: Register a new user
@@ -29,7 +29,7 @@ class TestFullWorkflow:
         headers = {"Authorization": f"Bearer {token}"}
         
         # Step 3: Upload a document
-        file_content = b"Test document content"
+        file_content = test_pdf_content
         files = {"file": ("contract.pdf", BytesIO(file_content), "application/pdf")}
         upload_response = client.post(
             "/api/documents/upload",
@@ -89,7 +89,7 @@ class TestFullWorkflow:
         me_response = client.get("/api/auth/me", headers=headers)
         assert me_response.json()["username"] == user_data["username"]
     
-    def test_multiple_signatures_workflow(self, client):
+    def test_multiple_signatures_workflow(self, client, test_pdf_content):
         """Test applying multiple signatures to the same document"""
         
         # Register and login
@@ -103,7 +103,7 @@ class TestFullWorkflow:
         headers = {"Authorization": f"Bearer {token}"}
         
         # Upload document
-        files = {"file": ("doc.pdf", BytesIO(b"content"), "application/pdf")}
+        files = {"file": ("doc.pdf", BytesIO(test_pdf_content), "application/pdf")}
         doc_response = client.post("/api/documents/upload", headers=headers, files=files)
         document_id = doc_response.json()["id"]
         
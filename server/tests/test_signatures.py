@@ -60,6 +60,171 @@ class TestSignatureCreate:
         assert response.status_code == 401
 
 
+class TestTypedSignatures:
+    """Test server-side rendering of typed signatures"""
+    
+    def test_create_typed_from_text(self, client, auth_headers):
+        """Test text is rendered to a stored PNG"""
+        from PIL import Image
+        
+        response = client.post(
+            "/api/signatures/create",
+            headers=auth_headers,
+            json={"signature_type": "typed", "text": "Jane Doe"}
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["typed_text"] == "Jane Doe"
+        assert data["font_name"] == "default"
+        image = Image.open(data["signature_data"])
+        assert image.mode == "RGBA"
+        assert image.getbbox() is not None
+    
+    def test_rendering_is_reproducible_and_scalable(self, client, auth_headers):
+        """Test re-rendering gives identical bytes and larger sizes give larger images"""
+        from io import BytesIO
+        from PIL import Image
+        
+        signature_id = client.post(
+            "/api/signatures/create",
+            headers=auth_headers,
+            json={"signature_type": "typed", "text": "Jane Doe"}
+        ).json()["id"]
+        
+        first = client.get(f"/api/signatures/{signature_id}/image", headers=auth_headers)
+        second = client.get(f"/api/signatures/{signature_id}/image", headers=auth_headers)
+        large = client.get(f"/api/signatures/{signature_id}/image?size=256", headers=auth_headers)
+        
+        assert first.status_code == 200
+        assert first.content == second.content
+        assert Image.open(BytesIO(large.content)).width > Image.open(BytesIO(first.content)).width * 3
+    
+    def test_stamped_at_document_resolution(self, client, auth_headers, tmp_path, monkeypatch):
+        """Test typed signatures are re-rendered larger on high DPI pages instead of upscaling the stored raster"""
+        from io import BytesIO
+        from PIL import Image, ImageChops
+        from app.routes import signed_documents
+        from app.utils.render_cache import RenderCache
+        
+        monkeypatch.setattr(signed_documents, "render_cache", RenderCache(str(tmp_path), 10 ** 8))
+        signature_id = client.post(
+            "/api/signatures/create",
+            headers=auth_headers,
+            json={"signature_type": "typed", "text": "Jane Doe"}
+        ).json()["id"]
+        
+        def ink_width(dpi):
+            page = Image.new("RGB", (2000, 800), "white")
+            buffer = BytesIO()
+            page.save(buffer, "PNG", dpi=(dpi, dpi))
+            files = {"file": (f"scan{dpi}.png", BytesIO(buffer.getvalue()), "image/png")}
+            document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+            signed = client.post(
+                "/api/signed/apply", headers=auth_headers,
+                json={"document_id": document_id, "signature_id": signature_id, "lazy": False}
+            ).json()
+            download = client.get(f"/api/signed/{signed['id']}/download", headers=auth_headers)
+            signed_page = Image.open(BytesIO(download.content)).convert("RGB")
+            left, _, right, _ = ImageChops.difference(signed_page, page).getbbox()
+            return right - left
+        
+        base, high = ink_width(72), ink_width(300)
+        
+        assert base <= 200
+        assert high > 200
+        assert high >= base * 3
+    
+    def test_stamp_size_capped_on_extreme_dpi(self, client, auth_headers, db_session, tmp_path, monkeypatch):
+        """Test a huge declared resolution renders a stamp no wider than the page instead of failing"""
+        from io import BytesIO
+        from PIL import Image, ImageChops
+        from app.models import Document
+        from app.routes import signed_documents
+        from app.utils.render_cache import RenderCache
+        
+        monkeypatch.setattr(signed_documents, "render_cache", RenderCache(str(tmp_path), 10 ** 8))
+        signature_id = client.post(
+            "/api/signatures/create",
+            headers=auth_headers,
+            json={"signature_type": "typed", "text": "Jane Doe"}
+        ).json()["id"]
+        page = Image.new("RGB", (1000, 400), "white")
+        buffer = BytesIO()
+        page.save(buffer, "PNG", dpi=(1200, 1200))
+        
+        for dpi in (1200, 10 ** 8):
+            files = {"file": ("scan.png", BytesIO(buffer.getvalue()), "image/png")}
+            document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+            # Stored values from before resolutions were checked at upload
+            db_session.query(Document).filter(Document.id == document_id).update({"dpi": dpi})
+            db_session.commit()
+            
+            response = client.post(
+                "/api/signed/apply", headers=auth_headers,
+                json={"document_id": document_id, "signature_id": signature_id}
+            )
+            
+            assert response.status_code == 201
+            download = client.get(f"/api/signed/{response.json()['id']}/download", headers=auth_headers)
+            signed_page = Image.open(BytesIO(download.content)).convert("RGB")
+            left, _, right, _ = ImageChops.difference(signed_page, page).getbbox()
+            assert 200 < right - left <= 1000
+    
+    def test_unrenderable_typed_signature_rejected(self, client, auth_headers, db_session):
+        """Test a typed signature that can no longer be rendered is refused with 400"""
+        from io import BytesIO
+        from app.models import Signature
+        from tests.test_signed_documents import make_png_bytes
+        
+        signature_id = client.post(
+            "/api/signatures/create",
+            headers=auth_headers,
+            json={"signature_type": "typed", "text": "Jane Doe"}
+        ).json()["id"]
+        # Its font was removed from FONTS_DIR
+        db_session.query(Signature).filter(Signature.id == signature_id).update({"font_name": "removed"})
+        db_session.commit()
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        
+        response = client.post(
+            "/api/signed/apply", headers=auth_headers,
+            json={"document_id": document_id, "signature_id": signature_id}
+        )
+        
+        assert response.status_code == 400
+        assert "Unknown font" in response.json()["detail"]
+    
+    def test_unknown_font_rejected(self, client, auth_headers):
+        """Test fonts outside the configured set are refused"""
+        response = client.post(
+            "/api/signatures/create",
+            headers=auth_headers,
+            json={"signature_type": "typed", "text": "Jane Doe", "font": "../../etc/passwd"}
+        )
+        
+        assert response.status_code == 400
+        assert "Unknown font" in response.json()["detail"]
+    
+    def test_text_requires_typed_type(self, client, auth_headers):
+        """Test drawn signatures cannot be created from text"""
+        response = client.post(
+            "/api/signatures/create",
+            headers=auth_headers,
+            json={"signature_type": "drawn", "text": "Jane Doe"}
+        )
+        
+        assert response.status_code == 400
+    
+    def test_list_fonts(self, client, auth_headers):
+        """Test the built-in font is always offered"""
+        response = client.get("/api/signatures/fonts", headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert "default" in response.json()
+
+
 class TestSignatureList:
     """Test listing signatures"""
     
@@ -1,16 +1,34 @@
 """
 Tests for Signed Document Routes
 """
+import asyncio
 import pytest
 from io import BytesIO
 
+from tests.conftest import make_pdf_bytes
+
+
+def make_png_bytes(size=(400, 300), color="white", mode="RGB"):
+    """Build an in-memory PNG image"""
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_signature_payload(color=(255, 0, 0, 255)):
+    """Signature create payload with a solid 10x10 stamp"""
+    import base64
+    stamp = make_png_bytes((10, 10), color, "RGBA")
+    return {"signature_data": base64.b64encode(stamp).decode(), "signature_type": "drawn"}
+
 class TestApplySignature:
     """Test applying signature to document"""
     
-    def test_apply_signature_success(self, client, auth_headers, test_signature_data):
+    def test_apply_signature_success(self, client, auth_headers, test_signature_data, test_pdf_content):
         """Test successfully applying signature to document"""
         # Upload a document
-        file_content = b"Test PDF content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         doc_response = client.post(
             "/api/documents/upload",
@@ -75,10 +93,10 @@ class TestApplySignature:
         assert response.status_code == 404
         assert "Document not found" in response.json()["detail"]
     
-    def test_apply_signature_invalid_signature(self, client, auth_headers):
+    def test_apply_signature_invalid_signature(self, client, auth_headers, test_pdf_content):
         """Test applying non-existent signature to document"""
         # Upload a document
-        file_content = b"Test PDF content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         doc_response = client.post(
             "/api/documents/upload",
@@ -116,13 +134,561 @@ class TestApplySignature:
         assert response.status_code == 401
 
 
+class TestSignaturePlacement:
+    """Test page-aware placement validated against stored geometry"""
+    
+    def _upload_and_sign_setup(self, client, auth_headers, test_signature_data):
+        files = {"file": ("multi.pdf", BytesIO(make_pdf_bytes(pages=2, width=600, height=800)), "application/pdf")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=test_signature_data
+        ).json()["id"]
+        return document_id, signature_id
+    
+    def test_apply_with_normalized_coordinates(self, client, auth_headers, test_signature_data):
+        """Test normalized coordinates are converted using the page size"""
+        document_id, signature_id = self._upload_and_sign_setup(client, auth_headers, test_signature_data)
+        
+        response = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={"document_id": document_id, "signature_id": signature_id, "page": 2, "x": 0.5, "y": 0.25}
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["signature_page"] == 2
+        assert data["signature_position_x"] == 300
+        assert data["signature_position_y"] == 200
+    
+    def test_apply_page_out_of_range(self, client, auth_headers, test_signature_data):
+        """Test a page past the end of the document is rejected"""
+        document_id, signature_id = self._upload_and_sign_setup(client, auth_headers, test_signature_data)
+        
+        response = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={"document_id": document_id, "signature_id": signature_id, "page": 3}
+        )
+        
+        assert response.status_code == 400
+        assert "out of range" in response.json()["detail"]
+    
+    def test_apply_position_outside_page(self, client, auth_headers, test_signature_data):
+        """Test pixel positions beyond the page size are rejected"""
+        document_id, signature_id = self._upload_and_sign_setup(client, auth_headers, test_signature_data)
+        
+        response = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={
+                "document_id": document_id,
+                "signature_id": signature_id,
+                "signature_position_x": 700,
+                "signature_position_y": 10
+            }
+        )
+        
+        assert response.status_code == 400
+        assert "outside page" in response.json()["detail"]
+
+
+class TestApplySignatureBatch:
+    """Test applying several signatures in one render"""
+    
+    def test_apply_batch_single_output(self, client, auth_headers):
+        """Test all placements land in one signed file"""
+        from PIL import Image
+        
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        
+        response = client.post(
+            "/api/signed/apply-batch",
+            headers=auth_headers,
+            json={
+                "document_id": document_id,
+                "placements": [
+                    {"signature_id": signature_id, "signature_position_x": 10, "signature_position_y": 10},
+                    {"signature_id": signature_id, "x": 0.5, "y": 0.5},
+                ]
+            }
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert len(data) == 2
+        assert data[0]["signed_file_path"] == data[1]["signed_file_path"]
+        
+        signed = Image.open(data[0]["signed_file_path"]).convert("RGB")
+        assert signed.getpixel((15, 15)) == (255, 0, 0)
+        assert signed.getpixel((205, 155)) == (255, 0, 0)
+        assert signed.getpixel((100, 100)) == (255, 255, 255)
+    
+    def test_apply_batch_unknown_signature(self, client, auth_headers, test_pdf_content):
+        """Test a batch referencing a missing signature is rejected"""
+        files = {"file": ("test.pdf", BytesIO(test_pdf_content), "application/pdf")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        
+        response = client.post(
+            "/api/signed/apply-batch",
+            headers=auth_headers,
+            json={"document_id": document_id, "placements": [{"signature_id": 99999}]}
+        )
+        
+        assert response.status_code == 404
+
+
+class TestIncrementalSigning:
+    """Test signing on top of the latest signed version"""
+    
+    def _apply(self, client, auth_headers, document_id, signature_id, x, y, incremental=True):
+        response = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={
+                "document_id": document_id,
+                "signature_id": signature_id,
+                "signature_position_x": x,
+                "signature_position_y": y,
+                "incremental": incremental
+            }
+        )
+        assert response.status_code == 201
+        return response.json()
+    
+    def test_incremental_image_keeps_previous_stamps(self, client, auth_headers):
+        """Test a second signer's overlay is composited onto the first version"""
+        from PIL import Image
+        
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        red = client.post("/api/signatures/create", headers=auth_headers, json=make_signature_payload()).json()["id"]
+        blue = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload((0, 0, 255, 255))
+        ).json()["id"]
+        
+        first = self._apply(client, auth_headers, document_id, red, 10, 10)
+        second = self._apply(client, auth_headers, document_id, blue, 100, 100)
+        third = self._apply(client, auth_headers, document_id, red, 200, 200)
+        
+        assert first["storage_kind"] == "full"
+        assert first["parent_id"] is None
+        assert second["storage_kind"] == "overlay"
+        assert second["parent_id"] == first["id"]
+        assert third["parent_id"] == second["id"]
+        
+        response = client.get(f"/api/signed/{third['id']}/download", headers=auth_headers)
+        
+        assert response.status_code == 200
+        signed = Image.open(BytesIO(response.content)).convert("RGB")
+        assert signed.getpixel((15, 15)) == (255, 0, 0)
+        assert signed.getpixel((105, 105)) == (0, 0, 255)
+        assert signed.getpixel((205, 205)) == (255, 0, 0)
+        assert signed.getpixel((50, 50)) == (255, 255, 255)
+    
+    def test_incremental_pdf_reuses_parent_file(self, client, auth_headers, test_signature_data, test_pdf_content):
+        """Test PDF versions share the parent's bytes instead of copying"""
+        files = {"file": ("test.pdf", BytesIO(test_pdf_content), "application/pdf")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=test_signature_data
+        ).json()["id"]
+        
+        first = self._apply(client, auth_headers, document_id, signature_id, 10, 10)
+        second = self._apply(client, auth_headers, document_id, signature_id, 50, 50)
+        
+        assert second["storage_kind"] == "shared"
+        assert second["signed_file_path"] == first["signed_file_path"]
+    
+    def test_deleting_parent_signature_flattens_children(self, client, auth_headers, tmp_path, monkeypatch):
+        """Test versions built on a deleted signature's version still download"""
+        from PIL import Image
+        from app.routes import signed_documents
+        from app.utils.render_cache import RenderCache
+        
+        monkeypatch.setattr(signed_documents, "render_cache", RenderCache(str(tmp_path), 10 ** 8))
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        red = client.post("/api/signatures/create", headers=auth_headers, json=make_signature_payload()).json()["id"]
+        blue = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload((0, 0, 255, 255))
+        ).json()["id"]
+        self._apply(client, auth_headers, document_id, red, 10, 10)
+        second = self._apply(client, auth_headers, document_id, blue, 100, 100)
+        
+        assert client.delete(f"/api/signatures/{red}", headers=auth_headers).status_code == 200
+        
+        version = client.get(f"/api/signed/{second['id']}", headers=auth_headers).json()
+        assert version["storage_kind"] == "full"
+        assert version["parent_id"] is None
+        response = client.get(f"/api/signed/{second['id']}/download", headers=auth_headers)
+        assert response.status_code == 200
+        signed = Image.open(BytesIO(response.content)).convert("RGB")
+        assert signed.getpixel((15, 15)) == (255, 0, 0)
+        assert signed.getpixel((105, 105)) == (0, 0, 255)
+    
+    def test_reused_version_id_not_served_stale_render(self, client, auth_headers, tmp_path, monkeypatch):
+        """Test a new version that gets a deleted version's id is rendered afresh"""
+        from PIL import Image
+        from app.routes import signed_documents
+        from app.utils.render_cache import RenderCache
+        
+        cache = RenderCache(str(tmp_path), 10 ** 8)
+        monkeypatch.setattr(signed_documents, "render_cache", cache)
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        red = client.post("/api/signatures/create", headers=auth_headers, json=make_signature_payload()).json()["id"]
+        blue = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload((0, 0, 255, 255))
+        ).json()["id"]
+        green = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload((0, 255, 0, 255))
+        ).json()["id"]
+        self._apply(client, auth_headers, document_id, red, 10, 10)
+        deleted = self._apply(client, auth_headers, document_id, blue, 100, 100)
+        assert client.get(f"/api/signed/{deleted['id']}/download", headers=auth_headers).status_code == 200
+        cached = list(tmp_path.iterdir())
+        
+        client.delete(f"/api/signatures/{blue}", headers=auth_headers)
+        replacement = self._apply(client, auth_headers, document_id, green, 200, 200)
+        response = client.get(f"/api/signed/{replacement['id']}/download", headers=auth_headers)
+        
+        assert replacement["id"] == deleted["id"]
+        assert not any(path.exists() for path in cached)
+        signed = Image.open(BytesIO(response.content)).convert("RGB")
+        assert signed.getpixel((105, 105)) == (255, 255, 255)
+        assert signed.getpixel((205, 205)) == (0, 255, 0)
+    
+    def test_missing_parent_is_gone(self, client, auth_headers, db_session, tmp_path, monkeypatch):
+        """Test a version whose parent row disappeared answers 410, not 500"""
+        from app.models import SignedDocument
+        from app.routes import signed_documents
+        from app.utils.render_cache import RenderCache
+        
+        # Nothing rendered by earlier tests under the same version ids
+        monkeypatch.setattr(signed_documents, "render_cache", RenderCache(str(tmp_path), 10 ** 8))
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        first = self._apply(client, auth_headers, document_id, signature_id, 10, 10)
+        second = self._apply(client, auth_headers, document_id, signature_id, 100, 100)
+        db_session.query(SignedDocument).filter(SignedDocument.id == first["id"]).delete()
+        db_session.commit()
+        
+        response = client.get(f"/api/signed/{second['id']}/download", headers=auth_headers)
+        
+        assert response.status_code == 410
+
+
+class TestLazyRendering:
+    """Test recipe-only versions rendered on first download"""
+    
+    def test_lazy_version_rendered_on_download(self, client, auth_headers):
+        """Test no file is written until the version is downloaded"""
+        import os
+        from PIL import Image
+        
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        
+        response = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={
+                "document_id": document_id,
+                "signature_id": signature_id,
+                "signature_position_x": 20,
+                "signature_position_y": 30,
+                "lazy": True
+            }
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["storage_kind"] == "recipe"
+        if os.path.exists(data["signed_file_path"]):
+            os.remove(data["signed_file_path"])
+        
+        download = client.get(f"/api/signed/{data['id']}/download", headers=auth_headers)
+        
+        assert download.status_code == 200
+        assert os.path.exists(data["signed_file_path"])
+        signed = Image.open(BytesIO(download.content)).convert("RGB")
+        assert signed.getpixel((25, 35)) == (255, 0, 0)
+    
+    def test_renders_not_publicly_served(self, client, auth_headers):
+        """Test rendered files live outside the public uploads directory"""
+        from pathlib import Path
+        
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        data = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={"document_id": document_id, "signature_id": signature_id, "lazy": True}
+        ).json()
+        
+        assert client.get(f"/api/signed/{data['id']}/download", headers=auth_headers).status_code == 200
+        
+        rendered = Path(data["signed_file_path"]).resolve()
+        assert rendered.exists()
+        assert Path("uploads").resolve() not in rendered.parents
+        assert client.get(f"/uploads/render_cache/{rendered.name}").status_code == 404
+    
+    def test_download_survives_concurrent_eviction(self, client, auth_headers, tmp_path, monkeypatch):
+        """Test a render being served is not evicted by another render stored meanwhile"""
+        from PIL import Image
+        from app.routes import signed_documents
+        from app.utils.render_cache import RenderCache
+        
+        cache = RenderCache(str(tmp_path), max_bytes=1)
+        monkeypatch.setattr(signed_documents, "render_cache", cache)
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        data = client.post(
+            "/api/signed/apply",
+            headers=auth_headers,
+            json={"document_id": document_id, "signature_id": signature_id, "lazy": True}
+        ).json()
+        
+        # Another request fills the cache between rendering and sending the file
+        monkeypatch.setattr(
+            signed_documents.audit_log, "record",
+            lambda *args, **kwargs: cache.put(cache.path_for("other", ".png"), b"x" * 10)
+        )
+        download = client.get(f"/api/signed/{data['id']}/download", headers=auth_headers)
+        
+        assert download.status_code == 200
+        assert Image.open(BytesIO(download.content)).convert("RGB").getpixel((5, 5)) == (255, 0, 0)
+        assert cache.pinned == 0
+        assert cache.get(data["signed_file_path"]) is None
+
+
+class TestRenderReuse:
+    """Test render memoization and idempotent retries"""
+    
+    def _setup(self, client, auth_headers):
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        return {"document_id": document_id, "signature_id": signature_id, "signature_position_x": 5, "signature_position_y": 5}
+    
+    def test_identical_apply_reuses_render(self, client, auth_headers):
+        """Test re-applying the same signature at the same spot reuses the blob"""
+        payload = self._setup(client, auth_headers)
+        
+        first = client.post("/api/signed/apply", headers=auth_headers, json=payload).json()
+        second = client.post("/api/signed/apply", headers=auth_headers, json=payload).json()
+        
+        assert first["id"] != second["id"]
+        assert first["signed_file_path"] == second["signed_file_path"]
+    
+    def test_idempotency_key_returns_original(self, client, auth_headers):
+        """Test a retried apply returns the original signed document"""
+        payload = self._setup(client, auth_headers)
+        headers = {**auth_headers, "Idempotency-Key": "retry-1"}
+        
+        first = client.post("/api/signed/apply", headers=headers, json=payload)
+        second = client.post("/api/signed/apply", headers=headers, json=payload)
+        
+        assert first.status_code == second.status_code == 201
+        assert first.json()["id"] == second.json()["id"]
+        versions = client.get(f"/api/signed/document/{payload['document_id']}/list", headers=auth_headers)
+        assert len(versions.json()) == 1
+    
+    def test_idempotency_key_reused_with_different_request(self, client, auth_headers):
+        """Test reusing a key for a different request is rejected"""
+        payload = self._setup(client, auth_headers)
+        headers = {**auth_headers, "Idempotency-Key": "retry-2"}
+        
+        client.post("/api/signed/apply", headers=headers, json=payload)
+        response = client.post("/api/signed/apply", headers=headers, json={**payload, "signature_position_x": 50})
+        
+        assert response.status_code == 409
+    
+    def test_idempotent_upload(self, client, auth_headers, test_pdf_content):
+        """Test a retried upload returns the original document"""
+        headers = {**auth_headers, "Idempotency-Key": "upload-1"}
+        
+        first = client.post("/api/documents/upload", headers=headers, files={"file": ("a.pdf", BytesIO(test_pdf_content), "application/pdf")})
+        second = client.post("/api/documents/upload", headers=headers, files={"file": ("a.pdf", BytesIO(test_pdf_content), "application/pdf")})
+        
+        assert first.json()["id"] == second.json()["id"]
+        assert len(client.get("/api/documents/", headers=auth_headers).json()) == 1
+    
+    def test_idempotent_upload_after_delete(self, client, auth_headers, test_pdf_content):
+        """Test a key whose document was deleted stores a new one and then returns it"""
+        headers = {**auth_headers, "Idempotency-Key": "upload-2"}
+        files = lambda: {"file": ("a.pdf", BytesIO(test_pdf_content), "application/pdf")}
+        
+        first = client.post("/api/documents/upload", headers=headers, files=files()).json()
+        client.delete(f"/api/documents/{first['id']}", headers=auth_headers)
+        second = client.post("/api/documents/upload", headers=headers, files=files())
+        third = client.post("/api/documents/upload", headers=headers, files=files())
+        
+        assert second.status_code == 201
+        assert client.get(f"/api/documents/{second.json()['id']}", headers=auth_headers).status_code == 200
+        assert third.json()["id"] == second.json()["id"]
+    
+    def test_idempotent_upload_race(self, client, auth_headers, test_pdf_content, monkeypatch):
+        """Test a request losing the race for a key returns the winner's document and keeps no file"""
+        import os
+        from app.routes import documents
+        
+        headers = {**auth_headers, "Idempotency-Key": "upload-3"}
+        files = lambda: {"file": ("a.pdf", BytesIO(test_pdf_content), "application/pdf")}
+        winner = client.post("/api/documents/upload", headers=headers, files=files()).json()
+        
+        # The second request looks the key up before the first one has committed
+        find = documents.find_idempotent_result
+        lookups = []
+        def racing_find(*args):
+            lookups.append(args)
+            return None if len(lookups) == 1 else find(*args)
+        monkeypatch.setattr(documents, "find_idempotent_result", racing_find)
+        stored = set(os.listdir("uploads/documents"))
+        
+        response = client.post("/api/documents/upload", headers=headers, files=files())
+        
+        assert response.status_code == 201
+        assert response.json()["id"] == winner["id"]
+        assert set(os.listdir("uploads/documents")) == stored
+        assert len(client.get("/api/documents/", headers=auth_headers).json()) == 1
+    
+    def test_concurrent_idempotent_apply_keeps_shared_render(self, client, tmp_path, monkeypatch, test_user_data):
+        """Test two concurrent applies with one key share a render that the loser does not delete"""
+        import os
+        import httpx
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.main import app
+        from app.database import Base, get_db
+        
+        # A session per request on a file database, as in production
+        engine = create_engine(f"sqlite:///{tmp_path / 'race.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        def session_per_request():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+        monkeypatch.setitem(app.dependency_overrides, get_db, session_per_request)
+        
+        client.post("/api/auth/register", json=test_user_data)
+        token = client.post("/api/auth/login", json={
+            "username": test_user_data["username"], "password": test_user_data["password"]
+        }).json()["access_token"]
+        auth_headers = {"Authorization": f"Bearer {token}"}
+        payload = self._setup(client, auth_headers)
+        headers = {**auth_headers, "Idempotency-Key": "race-4"}
+        
+        async def apply_twice():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as async_client:
+                return await asyncio.gather(*(
+                    async_client.post("/api/signed/apply", headers=headers, json=payload) for _ in range(2)
+                ))
+        
+        first, second = client.portal.call(apply_twice)
+        
+        assert first.status_code == second.status_code == 201
+        assert first.json()["id"] == second.json()["id"]
+        assert os.path.exists(first.json()["signed_file_path"])
+        download = client.get(f"/api/signed/{first.json()['id']}/download", headers=auth_headers)
+        assert download.status_code == 200
+        engine.dispose()
+    
+    def test_idempotent_apply_after_delete(self, client, auth_headers, db_session):
+        """Test a key whose signed version no longer exists signs again and then returns it"""
+        from app.models import SignedDocument
+        payload = self._setup(client, auth_headers)
+        headers = {**auth_headers, "Idempotency-Key": "retry-3"}
+        
+        first = client.post("/api/signed/apply", headers=headers, json=payload).json()
+        db_session.query(SignedDocument).filter(SignedDocument.id == first["id"]).delete()
+        db_session.commit()
+        second = client.post("/api/signed/apply", headers=headers, json=payload)
+        third = client.post("/api/signed/apply", headers=headers, json=payload)
+        
+        assert second.status_code == 201
+        assert third.json()["id"] == second.json()["id"]
+
+
+class TestApplyToManyDocuments:
+    """Test stamping one signature onto many documents"""
+    
+    def _upload(self, client, auth_headers, content, filename="page.png", mime="image/png"):
+        files = {"file": (filename, BytesIO(content), mime)}
+        return client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+    
+    def test_apply_many_stamps_every_document(self, client, auth_headers, test_pdf_content):
+        """Test each document gets its own signed version in request order"""
+        from PIL import Image
+        document_ids = [self._upload(client, auth_headers, make_png_bytes()) for _ in range(3)]
+        document_ids.append(self._upload(client, auth_headers, test_pdf_content, "doc.pdf", "application/pdf"))
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        
+        response = client.post(
+            "/api/signed/apply-many",
+            headers=auth_headers,
+            json={"document_ids": document_ids, "signature_id": signature_id, "signature_position_x": 20, "signature_position_y": 30}
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert [item["document_id"] for item in data] == document_ids
+        assert len({item["signed_file_path"] for item in data}) == 4
+        signed = Image.open(data[0]["signed_file_path"]).convert("RGB")
+        assert signed.getpixel((25, 35)) == (255, 0, 0)
+        assert signed.getpixel((5, 5)) == (255, 255, 255)
+        assert client.get(f"/api/documents/{document_ids[1]}", headers=auth_headers).json()["is_signed"] is True
+    
+    def test_apply_many_unknown_document(self, client, auth_headers):
+        """Test nothing is signed when a document is missing"""
+        document_id = self._upload(client, auth_headers, make_png_bytes())
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        
+        response = client.post(
+            "/api/signed/apply-many",
+            headers=auth_headers,
+            json={"document_ids": [document_id, 99999], "signature_id": signature_id, "signature_position_x": 0, "signature_position_y": 0}
+        )
+        
+        assert response.status_code == 404
+        assert client.get(f"/api/signed/document/{document_id}/list", headers=auth_headers).json() == []
+
+
 class TestGetSignedDocument:
     """Test getting signed document details"""
     
-    def test_get_signed_document_success(self, client, auth_headers, test_signature_data):
+    def test_get_signed_document_success(self, client, auth_headers, test_signature_data, test_pdf_content):
         """Test getting signed document by ID"""
         # Upload document, create signature, and apply
-        file_content = b"Test content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         doc_response = client.post("/api/documents/upload", headers=auth_headers, files=files)
         document_id = doc_response.json()["id"]
@@ -168,10 +734,10 @@ class TestGetSignedDocument:
 class TestDownloadSignedDocument:
     """Test downloading signed document"""
     
-    def test_download_signed_document_success(self, client, auth_headers, test_signature_data):
+    def test_download_signed_document_success(self, client, auth_headers, test_signature_data, test_pdf_content):
         """Test downloading signed document"""
         # Upload document, create signature, and apply
-        file_content = b"Test content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         doc_response = client.post("/api/documents/upload", headers=auth_headers, files=files)
         document_id = doc_response.json()["id"]
@@ -213,10 +779,10 @@ class TestDownloadSignedDocument:
 class TestListSignedVersions:
     """Test listing signed versions of a document"""
     
-    def test_list_signed_versions_empty(self, client, auth_headers):
+    def test_list_signed_versions_empty(self, client, auth_headers, test_pdf_content):
         """Test listing signed versions when none exist"""
         # Upload a document
-        file_content = b"Test content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         doc_response = client.post("/api/documents/upload", headers=auth_headers, files=files)
         document_id = doc_response.json()["id"]
@@ -227,10 +793,10 @@ class TestListSignedVersions:
         assert response.status_code == 200
         assert response.json() == []
     
-    def test_list_signed_versions_with_data(self, client, auth_headers, test_signature_data):
+    def test_list_signed_versions_with_data(self, client, auth_headers, test_signature_data, test_pdf_content):
         """Test listing signed versions after creating some"""
         # Upload document
-        file_content = b"Test content"
+        file_content = test_pdf_content
         files = {"file": ("test.pdf", BytesIO(file_content), "application/pdf")}
         doc_response = client.post("/api/documents/upload", headers=auth_headers, files=files)
         document_id = doc_response.json()["id"]
@@ -270,3 +836,148 @@ class TestListSignedVersions:
         response = client.get("/api/signed/document/1/list")
         
         assert response.status_code == 401
+
+
+class TestInclusionProof:
+    """Test Merkle log anchoring and inclusion proofs"""
+    
+    def test_proof_after_anchoring(self, client, auth_headers, db_session):
+        """Test a signed version is provable once its batch is anchored"""
+        from app.utils.anchoring import anchor_pending
+        from app.utils.merkle_log import verify_inclusion
+        
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        signed = [
+            client.post(
+                "/api/signed/apply",
+                headers=auth_headers,
+                json={"document_id": document_id, "signature_id": signature_id, "signature_position_x": x, "signature_position_y": 5}
+            ).json()
+            for x in (5, 50, 100)
+        ]
+        
+        pending = client.get(f"/api/signed/{signed[1]['id']}/proof", headers=auth_headers)
+        assert pending.status_code == 409
+        
+        head = anchor_pending(db_session)
+        assert anchor_pending(db_session) is None
+        
+        response = client.get(f"/api/signed/{signed[1]['id']}/proof", headers=auth_headers)
+        
+        assert response.status_code == 200
+        proof = response.json()
+        assert proof["sha256"] == signed[1]["sha256"]
+        assert proof["tree_size"] == head.tree_size
+        assert verify_inclusion(
+            bytes.fromhex(proof["leaf_hash"]),
+            proof["leaf_index"],
+            proof["tree_size"],
+            [bytes.fromhex(node) for node in proof["audit_path"]],
+            bytes.fromhex(proof["root_hash"])
+        )
+    
+    def test_failed_commit_leaves_dropped(self, client, auth_headers, db_session, tmp_path, monkeypatch):
+        """Test leaves appended by a batch whose commit failed are not appended twice"""
+        import pytest
+        from app.models import SignedDocument
+        from app.utils.anchoring import anchor_pending
+        from app.utils.merkle_log import MerkleLog
+        
+        log = MerkleLog(str(tmp_path / "merkle_log"))
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        client.post("/api/signed/apply", headers=auth_headers, json={"document_id": document_id, "signature_id": signature_id})
+        
+        commit = db_session.commit
+        def failing_commit():
+            raise RuntimeError("database unavailable")
+        monkeypatch.setattr(db_session, "commit", failing_commit)
+        with pytest.raises(RuntimeError):
+            anchor_pending(db_session, log)
+        monkeypatch.setattr(db_session, "commit", commit)
+        
+        head = anchor_pending(db_session, log)
+        
+        assert head.tree_size == 1
+        assert log.size == 1
+        assert db_session.query(SignedDocument).one().merkle_leaf_index == 0
+    
+    def test_proof_not_found(self, client, auth_headers):
+        """Test proofs of unknown versions are 404"""
+        response = client.get("/api/signed/99999/proof", headers=auth_headers)
+        
+        assert response.status_code == 404
+
+
+class TestClientDisconnect:
+    """Test renders are abandoned when the client goes away"""
+    
+    def test_disconnect_discards_render(self, client, auth_headers, db_session, tmp_path, monkeypatch):
+        """Test a disconnect mid-render stores no row and deletes the written file"""
+        import json
+        import threading
+        import time
+        from app.main import app
+        from app.models import SignedDocument
+        from app.utils import metrics, signature_processor
+        
+        files = {"file": ("page.png", BytesIO(make_png_bytes()), "image/png")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        monkeypatch.setattr(signature_processor.settings, "upload_dir", str(tmp_path))
+        
+        # The render writes its file, then stalls until the client has gone
+        started, release = threading.Event(), threading.Event()
+        render = signature_processor._apply_signatures_to_image
+        def slow_render(*args):
+            path = render(*args)
+            started.set()
+            release.wait(5)
+            return path
+        monkeypatch.setattr(signature_processor, "_apply_signatures_to_image", slow_render)
+        
+        body = json.dumps({"document_id": document_id, "signature_id": signature_id}).encode()
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+        
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.to_thread(started.wait, 5)
+            return {"type": "http.disconnect"}
+        
+        async def send(message):
+            sent.append(message)
+        
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/api/signed/apply", "raw_path": b"/api/signed/apply",
+            "query_string": b"", "root_path": "", "client": ("testclient", 50000), "server": ("testserver", 80),
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"authorization", auth_headers["Authorization"].encode())
+            ]
+        }
+        cancelled_before = metrics.snapshot()["counters"].get("render.cancelled", 0)
+        
+        client.portal.call(app, scope, receive, send)
+        release.set()
+        
+        signed_dir = tmp_path / "signed_documents"
+        deadline = time.monotonic() + 5
+        while any(signed_dir.iterdir()) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        
+        assert sent[0]["status"] == 499
+        assert db_session.query(SignedDocument).count() == 0
+        assert not any(signed_dir.iterdir())
+        assert metrics.snapshot()["counters"]["render.cancelled"] == cancelled_before + 1
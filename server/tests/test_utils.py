@@ -2,13 +2,33 @@
 Tests for Utility Functions
 """
 import pytest
+import asyncio
+from io import BytesIO
+from PIL import Image
 from app.utils.auth import (
     verify_password,
     get_password_hash,
     create_access_token,
     verify_token
 )
-from app.utils.file_handler import validate_file_type
+import zipfile
+from app.utils.file_handler import validate_file_type, sniff_file_type, inspect_file, save_zip_entries, ArchiveTooLargeError
+from app.utils.render_cache import RenderCache
+from app.utils.single_flight import SingleFlight
+from app.utils import metrics
+from app.utils.signature_processor import (
+    composite_stamps,
+    encoder_settings,
+    validate_signature_data,
+    decode_signature_image,
+    BatchStamper
+)
+from app.utils.imaging import open_image, ImageTooLargeError, MemoryBudget
+from app.utils.token_denylist import TokenDenylist
+from app.utils.rate_limit import MemoryBucketStore, SqliteBucketStore
+from app.utils.load_shedding import LoadMonitor, is_heavy
+from app.utils.merkle_log import MerkleLog, leaf_hash, node_hash, verify_inclusion
+from tests.conftest import make_oversized_png
 from datetime import timedelta
 
 class TestAuthUtils:
@@ -63,3 +83,595 @@ class TestFileHandlerUtils:
         assert validate_file_type("document.docx") is False
         assert validate_file_type("document.exe") is False
         assert validate_file_type("document") is False
+    
+    def test_sniff_file_type(self):
+        """Test magic byte detection"""
+        assert sniff_file_type(b"%PDF-1.7\n") == ".pdf"
+        assert sniff_file_type(b"\x89PNG\r\n\x1a\n\x00\x00") == ".png"
+        assert sniff_file_type(b"\xff\xd8\xff\xe0\x00\x10JFIF") == ".jpg"
+        assert sniff_file_type(b"PK\x03\x04") is None
+    
+    def test_inspect_image_geometry(self):
+        """Test dimensions and DPI are read from image headers"""
+        for fmt, ext in (("PNG", ".png"), ("JPEG", ".jpg")):
+            buffer = BytesIO()
+            Image.new("RGB", (40, 30), "white").save(buffer, fmt, dpi=(300, 300))
+            buffer.seek(0)
+            
+            info = inspect_file(buffer, f"scan{ext}")
+            
+            assert info.page_sizes == [(40, 30)]
+            assert info.dpi == 300
+    
+    def test_implausible_dpi_ignored(self):
+        """Test corrupt resolutions fall back to the default instead of being stored"""
+        for fmt, ext, dpi in (("PNG", ".png", 100_000_000), ("JPEG", ".jpg", 65535), ("PNG", ".png", 1)):
+            buffer = BytesIO()
+            Image.new("RGB", (40, 30), "white").save(buffer, fmt, dpi=(dpi, dpi))
+            buffer.seek(0)
+            
+            info = inspect_file(buffer, f"scan{ext}")
+            
+            assert info.dpi == 72
+    
+    def test_zip_extraction_budget_enforced_while_streaming(self, tmp_path, monkeypatch):
+        """Test entries stop decompressing once the archive-wide budget is spent"""
+        from app.utils import file_handler
+        monkeypatch.setattr(file_handler.settings, "upload_dir", str(tmp_path))
+        monkeypatch.setattr(file_handler.settings, "bulk_upload_concurrency", 1)
+        monkeypatch.setattr(file_handler.settings, "max_archive_extracted_size", 2 * 1024 * 1024)
+        page = BytesIO()
+        Image.new("RGB", (10, 10), "white").save(page, "PNG")
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i in range(4):
+                zf.writestr(f"scan{i}.png", page.getvalue() + bytes(1024 * 1024))
+        
+        with zipfile.ZipFile(archive) as zf:
+            extracted = asyncio.run(save_zip_entries(zf, zf.infolist(), "documents"))
+        
+        outcomes = [outcome for _, outcome, _, _ in extracted]
+        assert not isinstance(outcomes[0], Exception)
+        assert all(isinstance(outcome, ArchiveTooLargeError) for outcome in outcomes[2:])
+        assert not any(path.exists() for _, outcome, path, _ in extracted if isinstance(outcome, Exception))
+
+
+class TestRenderCache:
+    """Test the LRU render cache"""
+    
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test files are evicted oldest access first once over quota"""
+        cache = RenderCache(str(tmp_path), max_bytes=250)
+        first = cache.put(cache.path_for("a", ".png"), b"x" * 100)
+        second = cache.put(cache.path_for("b", ".png"), b"x" * 100)
+        
+        assert cache.get(first) == first
+        cache.put(cache.path_for("c", ".png"), b"x" * 100)
+        
+        assert cache.get(second) is None
+        assert cache.get(first) == first
+        assert cache.total_bytes == 200
+    
+    def test_indexes_existing_files(self, tmp_path):
+        """Test files from a previous run count towards the quota"""
+        (tmp_path / "old.png").write_bytes(b"x" * 100)
+        cache = RenderCache(str(tmp_path), max_bytes=150)
+        
+        cache.put(cache.path_for("new", ".png"), b"x" * 100)
+        
+        assert not (tmp_path / "old.png").exists()
+        assert cache.total_bytes == 100
+    
+    def test_pinned_entries_not_evicted(self, tmp_path):
+        """Test pinned files outlive eviction and are dropped once released"""
+        cache = RenderCache(str(tmp_path), max_bytes=150)
+        first = cache.put(cache.path_for("a", ".png"), b"x" * 100, pin=True)
+        
+        cache.put(cache.path_for("b", ".png"), b"x" * 100)
+        
+        assert (tmp_path / "a.png").exists()
+        assert cache.total_bytes == 200
+        cache.release(first)
+        assert not (tmp_path / "a.png").exists()
+        assert cache.total_bytes == 100
+        assert cache.pinned == 0
+    
+    def test_discard_waits_for_readers(self, tmp_path):
+        """Test a discarded file is no longer returned and is deleted once unpinned"""
+        cache = RenderCache(str(tmp_path), max_bytes=1000)
+        path = cache.put(cache.path_for("a", ".png"), b"x" * 100, pin=True)
+        
+        cache.discard(path)
+        
+        assert cache.get(path) is None
+        assert (tmp_path / "a.png").exists()
+        cache.release(path)
+        assert not (tmp_path / "a.png").exists()
+        assert cache.total_bytes == 0
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent identical work"""
+    
+    def test_concurrent_calls_share_one_execution(self):
+        """Test callers with the same key get one shared result"""
+        flight = SingleFlight("test_flight")
+        calls = []
+        
+        async def render():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "rendered"
+        
+        async def run():
+            return await asyncio.gather(*(flight.do("same", render) for _ in range(5)))
+        
+        results = asyncio.run(run())
+        
+        assert results == ["rendered"] * 5
+        assert len(calls) == 1
+        assert flight.in_flight == 0
+        assert metrics.snapshot()["counters"]["test_flight.coalesced"] == 4
+    
+    def test_errors_propagate_to_all_callers(self):
+        """Test a failing computation raises for every waiter"""
+        flight = SingleFlight("test_flight_errors")
+        
+        async def render():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad input")
+        
+        async def run():
+            return await asyncio.gather(*(flight.do("key", render) for _ in range(3)), return_exceptions=True)
+        
+        results = asyncio.run(run())
+        
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.in_flight == 0
+
+    
+    def test_last_waiter_leaving_cancels_work(self):
+        """Test work continues while one caller waits and stops when none do"""
+        flight = SingleFlight("test_flight_cancel")
+        
+        async def render():
+            await asyncio.sleep(0.2)
+            return "rendered"
+        
+        async def run():
+            first = asyncio.ensure_future(flight.do("key", render))
+            second = asyncio.ensure_future(flight.do("key", render))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            assert await second == "rendered"
+            
+            third = asyncio.ensure_future(flight.do("other", render))
+            await asyncio.sleep(0.01)
+            third.cancel()
+            await asyncio.sleep(0.05)
+            return flight.in_flight
+        
+        assert asyncio.run(run()) == 0
+        assert metrics.snapshot()["counters"]["test_flight_cancel.abandoned"] == 1
+
+
+class TestCancellation:
+    """Test cancellable renders and disconnect detection"""
+    
+    def test_abandoned_thread_output_discarded(self, tmp_path):
+        """Test a cancelled render's file is deleted once its thread finishes"""
+        import threading
+        from app.utils.cancellation import to_thread_cancellable, discard_outputs, raise_if_cancelled
+        release = threading.Event()
+        output = tmp_path / "signed.png"
+        seen = []
+        
+        def render():
+            output.write_bytes(b"partial")
+            release.wait(5)
+            try:
+                raise_if_cancelled()
+            except Exception as e:
+                seen.append(e)
+            return str(output)
+        
+        async def run():
+            task = asyncio.ensure_future(to_thread_cancellable(render, discard=discard_outputs))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            release.set()
+            for _ in range(100):
+                if not output.exists():
+                    break
+                await asyncio.sleep(0.01)
+        
+        asyncio.run(run())
+        
+        assert not output.exists()
+        assert len(seen) == 1
+    
+    def test_disconnect_cancels_work(self):
+        """Test work is cancelled when the client disconnects first"""
+        from app.utils.cancellation import run_until_disconnect, ClientDisconnected
+        
+        class DisconnectingRequest:
+            async def receive(self):
+                await asyncio.sleep(0.01)
+                return {"type": "http.disconnect"}
+        
+        cancelled = []
+        
+        async def work():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        
+        async def run():
+            with pytest.raises(ClientDisconnected):
+                await run_until_disconnect(DisconnectingRequest(), work())
+        
+        asyncio.run(run())
+        
+        assert cancelled == [True]
+    
+    def test_result_returned_when_client_stays(self):
+        """Test completed work is returned while the client is connected"""
+        from app.utils.cancellation import run_until_disconnect
+        
+        class ConnectedRequest:
+            async def receive(self):
+                await asyncio.sleep(5)
+        
+        async def work():
+            return "done"
+        
+        assert asyncio.run(run_until_disconnect(ConnectedRequest(), work())) == "done"
+
+
+class TestRegionCompositing:
+    """Test region-local blending keeps the page's mode and encoding"""
+    
+    def test_blend_matches_alpha_paste(self, tmp_path):
+        """Test blended pixels match a full-page alpha paste"""
+        page_path = tmp_path / "page.png"
+        Image.new("RGB", (60, 40), (200, 200, 200)).save(page_path)
+        stamp = Image.new("RGBA", (20, 10), (255, 0, 0, 128))
+        
+        result = composite_stamps(str(page_path), [(stamp, 50, 35)])
+        
+        expected = Image.new("RGBA", (60, 40), (200, 200, 200, 255))
+        expected.paste(stamp, (50, 35), stamp)
+        assert result.mode == "RGB"
+        assert result.getpixel((55, 37)) == expected.convert("RGB").getpixel((55, 37))
+        assert result.getpixel((10, 10)) == (200, 200, 200)
+    
+    def test_grayscale_page_keeps_mode(self, tmp_path):
+        """Test grayscale scans are not promoted to RGBA"""
+        page_path = tmp_path / "page.png"
+        Image.new("L", (30, 30), 255).save(page_path)
+        
+        result = composite_stamps(str(page_path), [(Image.new("RGBA", (5, 5), (0, 0, 0, 255)), 0, 0)])
+        
+        assert result.mode == "L"
+        assert result.getpixel((2, 2)) == 0
+
+    def test_cmyk_page_blended_in_cmyk(self, tmp_path):
+        """Test CMYK pixels under transparent stamp areas are left exactly as they were"""
+        page_path = tmp_path / "page.jpg"
+        Image.new("CMYK", (30, 30), (10, 20, 30, 200)).save(page_path)
+        page = Image.open(page_path)
+        page.load()
+        stamp = Image.new("RGBA", (10, 10), (0, 0, 0, 0))
+        stamp.paste((0, 0, 0, 255), (0, 0, 5, 10))
+    
+        result = composite_stamps(str(page_path), [(stamp, 0, 0)])
+    
+        assert result.mode == "CMYK"
+        assert result.getpixel((7, 5)) == page.getpixel((7, 5))
+        assert result.getpixel((20, 20)) == page.getpixel((20, 20))
+        assert result.getpixel((2, 5)) == Image.new("RGB", (1, 1), "black").convert("CMYK").getpixel((0, 0))
+    
+    def test_jpeg_encoder_settings_preserved(self, tmp_path):
+        """Test JPEG quantization, subsampling and ICC profile survive re-encoding"""
+        from PIL import ImageCms
+        icc = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+        page_path = tmp_path / "page.jpg"
+        Image.new("RGB", (64, 64), "white").save(page_path, quality=60, subsampling=0, icc_profile=icc)
+        
+        result = composite_stamps(str(page_path), [(Image.new("RGBA", (8, 8), (0, 0, 255, 255)), 4, 4)])
+        out = BytesIO()
+        result.save(out, "JPEG", **encoder_settings(result))
+        out.seek(0)
+        
+        original = Image.open(page_path)
+        signed = Image.open(out)
+        from PIL import JpegImagePlugin
+        assert signed.quantization == original.quantization
+        assert JpegImagePlugin.get_sampling(signed) == JpegImagePlugin.get_sampling(original)
+        assert signed.info.get("icc_profile") == icc
+
+
+class TestBatchStamper:
+    """Test the vectorized batch stamping pipeline"""
+    
+    def _signature(self):
+        import base64
+        from PIL import ImageDraw
+        stamp = Image.new("RGBA", (60, 20), (0, 0, 0, 0))
+        ImageDraw.Draw(stamp).line((0, 19, 30, 0, 59, 19), fill=(10, 20, 200, 180), width=3)
+        buffer = BytesIO()
+        stamp.save(buffer, "PNG")
+        return base64.b64encode(buffer.getvalue()).decode()
+    
+    def test_matches_single_page_compositing(self, tmp_path):
+        """Test batch output is pixel-identical to composite_stamps, including clipping"""
+        signature_data = self._signature()
+        page_path = tmp_path / "page.png"
+        Image.new("RGB", (80, 50), (200, 180, 160)).save(page_path)
+        
+        stamper = BatchStamper(signature_data, 40, 35)
+        batch = stamper.stamp(Image.open(page_path).convert("RGB"))
+        single = composite_stamps(str(page_path), [(decode_signature_image(signature_data), 40, 35)])
+        
+        assert batch.tobytes() == single.tobytes()
+
+    def test_matches_single_page_compositing_per_mode(self, tmp_path):
+        """Test batch output matches composite_stamps for grayscale and CMYK pages"""
+        signature_data = self._signature()
+        stamper = BatchStamper(signature_data, 10, 20)
+        for mode, colour in (("L", 180), ("CMYK", (10, 20, 30, 40))):
+            page_path = tmp_path / f"page_{mode}.tif"
+            Image.new(mode, (80, 50), colour).save(page_path)
+        
+            batch = stamper.stamp(Image.open(page_path))
+            single = composite_stamps(str(page_path), [(decode_signature_image(signature_data), 10, 20)])
+        
+            assert batch.mode == mode
+            assert batch.tobytes() == single.tobytes()
+    
+    def test_stamp_files_keeps_order_and_reports_failures(self, tmp_path, monkeypatch):
+        """Test results follow input order with an exception for unreadable pages"""
+        from app.utils import signature_processor
+        monkeypatch.setattr(signature_processor.settings, "upload_dir", str(tmp_path))
+        paths = []
+        for i in range(5):
+            path = tmp_path / f"page{i}.png"
+            Image.new("RGB", (40, 40), "white").save(path)
+            paths.append(str(path))
+        paths.insert(2, str(tmp_path / "missing.png"))
+        
+        results = list(BatchStamper(self._signature(), 0, 0, workers=2).stamp_files(paths))
+        
+        assert len(results) == 6
+        assert isinstance(results[2], Exception)
+        assert all(isinstance(result, str) for i, result in enumerate(results) if i != 2)
+        assert len(set(results[:2] + results[3:])) == 5
+
+
+class TestMerkleLog:
+    """Test the append-only Merkle log"""
+    
+    def _reference_root(self, leaves):
+        if len(leaves) == 1:
+            return leaves[0]
+        k = 1 << ((len(leaves) - 1).bit_length() - 1)
+        return node_hash(self._reference_root(leaves[:k]), self._reference_root(leaves[k:]))
+    
+    def test_roots_and_proofs_for_every_size(self, tmp_path):
+        """Test tree heads match RFC 6962 and every proof verifies"""
+        log = MerkleLog(str(tmp_path))
+        entries = [str(i).encode() for i in range(21)]
+        log.append(entries[:5])
+        log.append(entries[5:])
+        leaves = [leaf_hash(entry) for entry in entries]
+        
+        for size in range(1, 22):
+            root = log.root(size)
+            assert root == self._reference_root(leaves[:size])
+            for index in range(size):
+                assert verify_inclusion(leaves[index], index, size, log.inclusion_proof(index, size), root)
+    
+    def test_proof_rejects_wrong_leaf(self, tmp_path):
+        """Test a proof does not verify another leaf"""
+        log = MerkleLog(str(tmp_path))
+        log.append([b"a", b"b", b"c"])
+        
+        proof = log.inclusion_proof(1, 3)
+        
+        assert not verify_inclusion(leaf_hash(b"x"), 1, 3, proof, log.root(3))
+    
+    def test_reopen_repairs_interrupted_append(self, tmp_path):
+        """Test torn records and lost interior nodes are rebuilt on open"""
+        import os
+        log = MerkleLog(str(tmp_path))
+        log.append([str(i).encode() for i in range(16)])
+        root = log.root(16)
+        os.truncate(tmp_path / "level_1.bin", 32 * 3 + 7)
+        os.remove(tmp_path / "level_3.bin")
+        
+        reopened = MerkleLog(str(tmp_path))
+        
+        assert reopened.root(16) == root
+        reopened.append([b"16"])
+        assert reopened.root(17) == self._reference_root([leaf_hash(str(i).encode()) for i in range(17)])
+    
+    def test_instances_share_directory(self, tmp_path):
+        """Test logs in several workers interleave appends without corrupting the tree"""
+        worker_a = MerkleLog(str(tmp_path))
+        worker_b = MerkleLog(str(tmp_path))
+        entries = [str(i).encode() for i in range(11)]
+        
+        assert worker_a.append(entries[:3]) == 0
+        assert worker_b.append(entries[3:8]) == 3
+        assert worker_a.append(entries[8:]) == 8
+        
+        expected = self._reference_root([leaf_hash(entry) for entry in entries])
+        assert worker_a.root(11) == worker_b.root(11) == expected
+    
+    def test_truncate_drops_unpublished_leaves(self, tmp_path):
+        """Test truncating removes leaves and the interior nodes covering them"""
+        log = MerkleLog(str(tmp_path))
+        log.append([str(i).encode() for i in range(13)])
+        
+        log.truncate(5)
+        log.append([b"x", b"y"])
+        
+        leaves = [leaf_hash(str(i).encode()) for i in range(5)] + [leaf_hash(b"x"), leaf_hash(b"y")]
+        assert log.size == 7
+        assert log.root(7) == self._reference_root(leaves)
+
+
+class TestTokenDenylist:
+    """Test the file-shared revoked token set"""
+    
+    def test_revocation_shared_between_workers(self, tmp_path):
+        """Test a revocation in one instance is seen by another reading the same file"""
+        import time
+        path = str(tmp_path / "denylist.bin")
+        worker_a = TokenDenylist(path, sync_interval=0)
+        worker_b = TokenDenylist(path, sync_interval=0)
+        
+        assert worker_b.is_revoked("token-1") is False
+        worker_a.revoke("token-1", int(time.time()) + 60)
+        
+        assert worker_a.is_revoked("token-1") is True
+        assert worker_b.is_revoked("token-1") is True
+        assert worker_b.is_revoked("token-2") is False
+        assert (tmp_path / "denylist.bin").stat().st_size == 24
+    
+    def test_expired_entries_ignored(self, tmp_path):
+        """Test revocations stop mattering once the token has expired"""
+        import time
+        denylist = TokenDenylist(str(tmp_path / "denylist.bin"), sync_interval=0)
+        
+        denylist.revoke("old", int(time.time()) - 1)
+        
+        assert denylist.is_revoked("old") is False
+    
+    def test_compaction_drops_expired(self, tmp_path):
+        """Test the file is rewritten once expired records dominate"""
+        import time
+        path = tmp_path / "denylist.bin"
+        denylist = TokenDenylist(str(path), use_bloom=False, sync_interval=0)
+        past = int(time.time()) - 1
+        for i in range(1100):
+            denylist.revoke(f"expired-{i}", past)
+        denylist.revoke("live", int(time.time()) + 60)
+        
+        assert path.stat().st_size < 1100 * 24
+        assert denylist.is_revoked("live") is True
+        assert TokenDenylist(str(path), sync_interval=0).is_revoked("live") is True
+
+
+class TestTokenBuckets:
+    """Test rate-limit token bucket stores"""
+    
+    def test_burst_then_refill(self):
+        """Test a bucket allows its burst, then waits for refill"""
+        store = MemoryBucketStore()
+        
+        assert [store.take("k", 1.0, 2, 100.0) for _ in range(2)] == [0.0, 0.0]
+        assert store.take("k", 1.0, 2, 100.0) == pytest.approx(1.0)
+        assert store.take("k", 1.0, 2, 100.5) == pytest.approx(0.5)
+        assert store.take("k", 1.0, 2, 101.0) == 0.0
+        assert store.take("other", 1.0, 2, 101.0) == 0.0
+    
+    def test_prune_drops_full_buckets(self):
+        """Test idle, refilled buckets are dropped when the store is full"""
+        store = MemoryBucketStore(max_buckets=2)
+        store.take("old", 1.0, 5, 0.0)
+        store.take("busy", 1.0, 5, 10.0)
+        store.take("busy", 1.0, 5, 10.0)
+        
+        store.take("new", 1.0, 5, 10.0)
+        
+        assert len(store) == 2
+        assert store.take("busy", 1.0, 5, 10.0) == 0.0
+    
+    def test_sqlite_store_shared(self, tmp_path):
+        """Test two stores on one file draw from the same bucket"""
+        path = str(tmp_path / "rate_limits.db")
+        worker_a = SqliteBucketStore(path)
+        worker_b = SqliteBucketStore(path)
+        
+        assert worker_a.take("k", 1.0, 2, 100.0) == 0.0
+        assert worker_b.take("k", 1.0, 2, 100.0) == 0.0
+        assert worker_a.take("k", 1.0, 2, 100.0) > 0
+        assert len(worker_b) == 1
+
+
+class TestLoadMonitor:
+    """Test route classification and overload detection"""
+    
+    def test_route_classification(self):
+        """Test renders, uploads and verification are heavy and reads are cheap"""
+        assert is_heavy("POST", "/api/documents/upload")
+        assert is_heavy("POST", "/api/signed/apply-many")
+        assert is_heavy("GET", "/api/signed/12/download")
+        assert not is_heavy("GET", "/api/documents/")
+        assert not is_heavy("GET", "/api/signed/12")
+        assert not is_heavy("GET", "/health")
+    
+    def test_lag_smoothing(self):
+        """Test one slow tick does not trip the lag threshold but sustained lag does"""
+        monitor = LoadMonitor(max_lag_ms=100, max_queue_depth=10, alpha=0.3)
+        
+        monitor.sample(200)
+        assert not monitor.overloaded()
+        
+        for _ in range(5):
+            monitor.sample(200)
+        assert monitor.overloaded()
+    
+    def test_queue_depth_threshold(self):
+        """Test heavy work in progress counts towards overload"""
+        monitor = LoadMonitor(max_lag_ms=100, max_queue_depth=1)
+        monitor.heavy_in_progress = 2
+        
+        assert monitor.overloaded()
+
+
+class TestGuardedDecoding:
+    """Test header checks and the render memory budget"""
+    
+    def test_open_image_rejects_oversized_header(self):
+        """Test a decompression bomb is refused before decoding"""
+        with pytest.raises(ImageTooLargeError):
+            open_image(make_oversized_png(30000, 30000), max_pixels=1_000_000)
+    
+    def test_open_image_jpeg_draft(self):
+        """Test JPEGs are decoded at a reduced scale when a draft size is given"""
+        buffer = BytesIO()
+        Image.new("RGB", (1600, 800), "white").save(buffer, "JPEG")
+        
+        image = open_image(buffer.getvalue(), draft_size=(200, 1))
+        
+        assert image.size == (200, 100)
+    
+    def test_validate_signature_rejects_bomb(self):
+        """Test signature validation refuses oversized headers"""
+        import base64
+        assert validate_signature_data(base64.b64encode(make_oversized_png(30000, 30000)).decode()) is False
+    
+    def test_memory_budget_serializes_large_reservations(self):
+        """Test reservations wait while the budget is exhausted"""
+        budget = MemoryBudget(100)
+        order = []
+        
+        async def render(name, nbytes):
+            async with budget.reserve(nbytes):
+                order.append(f"{name}-start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name}-end")
+        
+        async def main():
+            await asyncio.gather(render("a", 80), render("b", 80))
+        
+        asyncio.run(main())
+        
+        assert order == ["a-start", "a-end", "b-start", "b-end"]
+        assert budget.in_use == 0
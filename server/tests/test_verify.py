@@ -0,0 +1,178 @@
+"""
+Tests for Verification Routes
+"""
+import hashlib
+import pytest
+from io import BytesIO
+
+from tests.test_signed_documents import make_png_bytes, make_signature_payload
+
+
+def sign_png(client, auth_headers, lazy=False):
+    """Upload a PNG, sign it and return (original bytes, signed version)"""
+    original = make_png_bytes()
+    files = {"file": ("page.png", BytesIO(original), "image/png")}
+    document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+    signature_id = client.post(
+        "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+    ).json()["id"]
+    signed = client.post(
+        "/api/signed/apply",
+        headers=auth_headers,
+        json={
+            "document_id": document_id,
+            "signature_id": signature_id,
+            "signature_position_x": 10,
+            "signature_position_y": 10,
+            "lazy": lazy
+        }
+    ).json()
+    return original, signed
+
+
+class TestVerify:
+    """Test verifying files by content hash"""
+    
+    def _verify(self, client, content):
+        files = {"file": ("check.png", BytesIO(content), "image/png")}
+        return client.post("/api/verify", files=files)
+    
+    def test_signed_file_verified(self, client, auth_headers):
+        """Test a downloaded signed file matches its version and signer"""
+        _, signed = sign_png(client, auth_headers)
+        download = client.get(f"/api/signed/{signed['id']}/download", headers=auth_headers)
+        
+        response = self._verify(client, download.content)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["verified"] is True
+        assert data["sha256"] == hashlib.sha256(download.content).hexdigest() == signed["sha256"]
+        assert data["matches"][0]["signed_document_id"] == signed["id"]
+        assert data["matches"][0]["signer"] == "testuser"
+    
+    def test_original_file_not_verified(self, client, auth_headers):
+        """Test the unsigned original is recognised but not verified"""
+        original, _ = sign_png(client, auth_headers)
+        
+        data = self._verify(client, original).json()
+        
+        assert data["verified"] is False
+        assert data["is_original"] is True
+    
+    def test_unchanged_pdf_not_verified(self, client, auth_headers, test_pdf_content):
+        """Test a version whose bytes equal its unsigned original does not verify it"""
+        files = {"file": ("a.pdf", BytesIO(test_pdf_content), "application/pdf")}
+        document_id = client.post("/api/documents/upload", headers=auth_headers, files=files).json()["id"]
+        signature_id = client.post(
+            "/api/signatures/create", headers=auth_headers, json=make_signature_payload()
+        ).json()["id"]
+        signed = client.post(
+            "/api/signed/apply", headers=auth_headers,
+            json={"document_id": document_id, "signature_id": signature_id}
+        ).json()
+        assert signed["sha256"] == hashlib.sha256(test_pdf_content).hexdigest()
+        
+        data = self._verify(client, test_pdf_content).json()
+        
+        assert data["verified"] is False
+        assert data["is_original"] is True
+        assert data["matches"] == []
+    
+    def test_file_too_large(self, client, monkeypatch):
+        """Test hashing stops once the upload exceeds the size limit"""
+        from app.routes import verify
+        monkeypatch.setattr(verify.settings, "max_upload_size", 16)
+        
+        response = self._verify(client, b"x" * 17)
+        
+        assert response.status_code == 400
+        assert "too large" in response.json()["detail"]
+    
+    def test_unknown_file(self, client):
+        """Test verification needs no login and reports unknown files"""
+        data = self._verify(client, b"something else").json()
+        
+        assert data["verified"] is False
+        assert data["is_original"] is False
+        assert data["matches"] == []
+    
+    def test_lazy_version_hashed_on_first_render(self, client, auth_headers):
+        """Test recipe versions become verifiable once rendered"""
+        _, signed = sign_png(client, auth_headers, lazy=True)
+        assert signed["sha256"] is None
+        
+        download = client.get(f"/api/signed/{signed['id']}/download", headers=auth_headers)
+        data = self._verify(client, download.content).json()
+        
+        assert data["verified"] is True
+        assert data["matches"][0]["signed_document_id"] == signed["id"]
+    
+    def test_bulk_upload_records_hash(self, client, auth_headers, test_pdf_content):
+        """Test hashes are computed while bulk uploads are streamed to disk"""
+        files = [("files", ("a.pdf", BytesIO(test_pdf_content), "application/pdf"))]
+        
+        data = client.post("/api/documents/upload/bulk", headers=auth_headers, files=files).json()
+        
+        assert data["results"][0]["document"]["sha256"] == hashlib.sha256(test_pdf_content).hexdigest()
+
+
+class TestCryptographicSignatures:
+    """Test Ed25519 signatures over signed file hashes"""
+    
+    def test_signed_version_carries_signature(self, client, auth_headers):
+        """Test signing attaches a detached signature verifiable with the public key"""
+        from app.utils.crypto_signing import verify_document_hash
+        _, signed = sign_png(client, auth_headers)
+        
+        key = client.get(f"/api/verify/keys/{signed['signing_key_id']}").json()
+        
+        assert key["signer"] == "testuser"
+        assert key["algorithm"] == "Ed25519"
+        assert verify_document_hash(key["public_key"], signed["sha256"], signed["crypto_signature"])
+    
+    def test_verify_file_checks_signature(self, client, auth_headers):
+        """Test file verification reports the signature as valid"""
+        _, signed = sign_png(client, auth_headers)
+        download = client.get(f"/api/signed/{signed['id']}/download", headers=auth_headers)
+        
+        data = client.post("/api/verify", files={"file": ("a.png", BytesIO(download.content), "image/png")}).json()
+        
+        assert data["matches"][0]["signature_valid"] is True
+        assert data["matches"][0]["signing_key_id"] == signed["signing_key_id"]
+    
+    def test_batch_verification(self, client, auth_headers):
+        """Test a batch reports valid, tampered and unknown-key items"""
+        _, first = sign_png(client, auth_headers)
+        _, second = sign_png(client, auth_headers)
+        assert first["signing_key_id"] == second["signing_key_id"]
+        items = [
+            {"sha256": first["sha256"], "signature": first["crypto_signature"], "key_id": first["signing_key_id"]},
+            {"sha256": second["sha256"], "signature": second["crypto_signature"], "key_id": second["signing_key_id"]},
+            {"sha256": "0" * 64, "signature": first["crypto_signature"], "key_id": first["signing_key_id"]},
+            {"sha256": first["sha256"], "signature": first["crypto_signature"], "key_id": 99999},
+            {"sha256": first["sha256"], "signature": "not base64!", "key_id": first["signing_key_id"]},
+        ]
+        
+        response = client.post("/api/verify/signatures", json={"items": items})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["valid"], data["invalid"]) == (2, 3)
+        assert [result["valid"] for result in data["results"]] == [True, True, False, False, False]
+        assert data["results"][0]["signer"] == "testuser"
+        assert data["results"][3]["signer"] is None
+    
+    def test_lazy_version_signed_on_first_render(self, client, auth_headers):
+        """Test recipe versions are signed once their hash is known"""
+        _, signed = sign_png(client, auth_headers, lazy=True)
+        assert signed["crypto_signature"] is None
+        
+        client.get(f"/api/signed/{signed['id']}/download", headers=auth_headers)
+        details = client.get(f"/api/signed/{signed['id']}", headers=auth_headers).json()
+        
+        assert details["crypto_signature"] is not None
+    
+    def test_unknown_key(self, client):
+        """Test unknown key ids are 404"""
+        assert client.get("/api/verify/keys/99999").status_code == 404